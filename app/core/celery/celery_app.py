@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_init, worker_process_shutdown
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
@@ -15,6 +16,23 @@ celery_app.conf.update(
     task_acks_late=True,
 )
 
+@worker_init.connect
+def start_worker_metrics_server(**kwargs):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from app.shared.observability.metrics import clear_multiprocess_dir
+        clear_multiprocess_dir()
+
+    port = os.getenv("CELERY_METRICS_PORT")
+    if port:
+        from app.shared.observability.metrics import start_metrics_server
+        start_metrics_server(int(port))
+
+@worker_process_shutdown.connect
+def mark_worker_process_dead(pid=None, **kwargs):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid or os.getpid())
+
 celery_app.autodiscover_tasks([
     "app.core.celery",
 ])
\ No newline at end of file
@@ -27,7 +27,8 @@ def celery_task(self, *, task_id: str, task_type: str, db_name: str, params: dic
         runner = handler(
             task_id=task_id,
             db=db,
-            result_type=spec.result_type
+            result_type=spec.result_type,
+            task_type=AsyncTaskType(task_type)
         )
         loop.run_until_complete(runner.run(params))
     except Exception as error:
@@ -2,6 +2,15 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 import os
 
+from app.shared.observability.metrics import MongoMetricsListener
+from app.shared.observability.server_timing import SERVER_TIMING_ENABLED, MongoTimingListener
+from app.shared.observability.slow_queries import (
+    MONGO_SLOW_QUERY_EXPLAIN,
+    MONGO_SLOW_QUERY_MS,
+    SlowQueryExplainer,
+    SlowQueryListener
+)
+
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
@@ -21,10 +30,21 @@ class MongoConnection:
                 minPoolSize=10,
                 maxIdleTimeMS=30000,
                 serverSelectionTimeoutMS=5000,
-                port=27017
+                port=27017,
+                event_listeners=cls._event_listeners()
             )
         return cls._client
 
+    @classmethod
+    def _event_listeners(cls) -> list:
+        listeners = [MongoMetricsListener()]
+        if SERVER_TIMING_ENABLED:
+            listeners.append(MongoTimingListener())
+        if MONGO_SLOW_QUERY_MS > 0:
+            explainer = SlowQueryExplainer(MONGO_URI) if MONGO_SLOW_QUERY_EXPLAIN else None
+            listeners.append(SlowQueryListener(MONGO_SLOW_QUERY_MS, explainer))
+        return listeners
+
     @classmethod
     def get_database(cls, db_name: str):
         client = cls.get_client()
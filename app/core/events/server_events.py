@@ -1,4 +1,9 @@
+import asyncio
 from fastapi import FastAPI
+from app.core.http_client import HttpClient
+from app.core.redis import RedisConnection
+from app.shared.mongo_indexes import ensure_all_tenant_indexes
+from app.shared.handle_decorator import RouteFlagTable
 
 def startup_events(app: FastAPI):
     @app.on_event("startup")
@@ -17,4 +22,32 @@ def startup_events(app: FastAPI):
             if hasattr(route, "endpoint"):
                 endpoint_func = route.endpoint
                 if getattr(endpoint_func, "no_tenant_required", False):
-                    app.state.no_tenant_required_endpoints.add(endpoint_func)
\ No newline at end of file
+                    app.state.no_tenant_required_endpoints.add(endpoint_func)
+
+    @app.on_event("startup")
+    async def build_route_flags():
+        app.state.route_flags = RouteFlagTable(app.routes)
+
+    @app.on_event("startup")
+    async def open_http_client():
+        HttpClient.get_client()
+
+    @app.on_event("startup")
+    async def provision_tenant_indexes():
+        # runs in background so startup and requests never wait for index builds
+        app.state.index_provisioning = asyncio.create_task(ensure_all_tenant_indexes())
+
+def shutdown_events(app: FastAPI):
+    @app.on_event("shutdown")
+    async def close_http_client():
+        await HttpClient.close()
+
+    @app.on_event("shutdown")
+    async def stop_index_provisioning():
+        task = getattr(app.state, "index_provisioning", None)
+        if task and not task.done():
+            task.cancel()
+
+    @app.on_event("shutdown")
+    async def close_redis_client():
+        await RedisConnection.close()
@@ -0,0 +1,41 @@
+import httpx
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_POOL_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_DEFAULT_TIMEOUT = float(os.getenv("HTTP_DEFAULT_TIMEOUT", "10"))
+
+
+class HttpClient:
+    _client: httpx.AsyncClient | None = None
+
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        if cls._client is None or cls._client.is_closed:
+            cls._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=HTTP_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=HTTP_POOL_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(
+                    HTTP_DEFAULT_TIMEOUT,
+                    connect=HTTP_CONNECT_TIMEOUT
+                ),
+            )
+        return cls._client
+
+    @classmethod
+    async def close(cls) -> None:
+        if cls._client is not None and not cls._client.is_closed:
+            await cls._client.aclose()
+        cls._client = None
+
+    @staticmethod
+    def timeout(seconds: float) -> httpx.Timeout:
+        return httpx.Timeout(seconds, connect=min(seconds, HTTP_CONNECT_TIMEOUT))
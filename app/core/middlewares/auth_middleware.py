@@ -1,32 +1,48 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request, HTTPException
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
 from starlette.status import HTTP_401_UNAUTHORIZED
+from app.core.exceptions import raise_error
 from app.modules.auth.auth_service import AuthService
 from app.shared.handle_decorator import handle_decorator
+from app.shared.observability.server_timing import timed
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if request.method == "OPTIONS":
-            return await call_next(request)
+PUBLIC_DOCS_PATHS = ("/docs", "/redoc", "/openapi.json")
 
-        if request.url.path.startswith(("/docs", "/redoc", "/openapi.json")):
-            return await call_next(request)
-        
+class AuthMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+
+        if scope["path"].startswith(PUBLIC_DOCS_PATHS):
+            return await self.app(scope, receive, send)
+
+        request = Request(scope)
         if handle_decorator("no_auth", request):
-            return await call_next(request)
+            return await self.app(scope, receive, send)
 
         auth_header = request.headers.get("Authorization")
         if not auth_header or not auth_header.startswith("Bearer "):
-            raise HTTPException(
+            response = raise_error(
                 status_code=HTTP_401_UNAUTHORIZED,
-                detail="Token not provided."
+                detail="Token not provided.",
+                error_code="HTTP_ERROR"
             )
+            return await response(scope, receive, send)
 
         token = auth_header.split("Bearer ")[1].strip()
-        if not await AuthService().validate_token(token):
-            raise HTTPException(
+        with timed("auth"):
+            is_valid = await AuthService().validate_token(token)
+
+        if not is_valid:
+            response = raise_error(
                 status_code=HTTP_401_UNAUTHORIZED,
-                detail="Invalid token."
+                detail="Invalid token.",
+                error_code="HTTP_ERROR"
             )
+            return await response(scope, receive, send)
 
-        return await call_next(request)
\ No newline at end of file
+        scope.setdefault("state", {})["token"] = token
+        return await self.app(scope, receive, send)
@@ -1,53 +1,62 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import HTTPException, Request
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
 from app.core.database import MongoConnection
+from app.core.exceptions import raise_error
+from app.core.middlewares.auth_middleware import PUBLIC_DOCS_PATHS
+from app.modules.tenant.tenant_registry import tenant_registry
 from app.shared.handle_decorator import handle_decorator
-from app.shared.mongo_indexes import create_indexes
-from app.main import INITIALIZED_TENANTS
+from app.shared.observability.server_timing import timed
 
-class TenantMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if request.method == "OPTIONS":
-            return await call_next(request)
+class TenantMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-        if request.url.path.startswith(("/docs", "/redoc", "/openapi.json")):
-            return await call_next(request)
-        
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+
+        if scope["path"].startswith(PUBLIC_DOCS_PATHS):
+            return await self.app(scope, receive, send)
+
+        request = Request(scope)
         if handle_decorator("no_tenant_required", request):
-            return await call_next(request)
+            return await self.app(scope, receive, send)
 
         tenant_name = request.headers.get("tenant")
-        
+
         if not tenant_name:
-            raise HTTPException(
+            response = raise_error(
                 status_code=400,
-                detail="Header 'tenant' é obrigatório"
+                detail="Header 'tenant' é obrigatório",
+                error_code="HTTP_ERROR"
             )
+            return await response(scope, receive, send)
 
         if not tenant_name.replace("_", "").replace("-", "").isalnum():
-            raise HTTPException(
+            response = raise_error(
                 status_code=400,
-                detail="Nome do tenant inválido"
+                detail="Nome do tenant inválido",
+                error_code="HTTP_ERROR"
             )
+            return await response(scope, receive, send)
 
         db_name = tenant_name
 
-        client = MongoConnection.get_client()
-
-        existing_dbs = await client.list_database_names()
+        with timed("tenant"):
+            tenant = await tenant_registry.get(db_name)
 
-        if db_name not in existing_dbs:
-            raise HTTPException(
+        if tenant is None:
+            response = raise_error(
                 status_code=404,
-                detail=f"Tenant '{tenant_name}' não encontrado"
+                detail=f"Tenant '{tenant_name}' não encontrado",
+                error_code="HTTP_ERROR"
             )
-  
-        db = client.get_database(db_name)
+            return await response(scope, receive, send)
 
-        if tenant_name not in INITIALIZED_TENANTS:
-            await create_indexes(db)
-            INITIALIZED_TENANTS.add(tenant_name)
+        db = MongoConnection.get_client().get_database(db_name)
 
-        request.state.db = db
+        state = scope.setdefault("state", {})
+        state["db"] = db
+        state["tenant"] = tenant
 
-        return await call_next(request)
\ No newline at end of file
+        return await self.app(scope, receive, send)
@@ -0,0 +1,26 @@
+import redis.asyncio as redis
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+class RedisConnection:
+    _client: redis.Redis | None = None
+
+    @classmethod
+    def get_client(cls) -> redis.Redis:
+        if cls._client is None:
+            cls._client = redis.from_url(
+                REDIS_URL,
+                socket_connect_timeout=2,
+                socket_timeout=2,
+            )
+        return cls._client
+
+    @classmethod
+    async def close(cls) -> None:
+        if cls._client is not None:
+            await cls._client.aclose()
+        cls._client = None
@@ -1,20 +1,29 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.exceptions import RequestValidationError
-from app.core.events.server_events import startup_events
+from app.core.events.server_events import startup_events, shutdown_events
 from app.core.exceptions import http_exception_handler
 from dotenv import load_dotenv
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
+from app.shared.observability.server_timing import (
+    SERVER_TIMING_ENABLED,
+    ServerTimingMiddleware,
+    TimedJSONResponse
+)
+from app.shared.observability.metrics import PrometheusMiddleware
 
 load_dotenv()
 
 
-app = FastAPI(title="FastAPI + MongoDB")
+app = FastAPI(
+    title="FastAPI + MongoDB",
+    default_response_class=TimedJSONResponse if SERVER_TIMING_ENABLED else JSONResponse
+)
 app.state.public_endpoints = set()
 app.state.no_tenant_required_endpoints = set()
-INITIALIZED_TENANTS = set()
 
 # events
-# shutdown_events(app)
+shutdown_events(app)
 startup_events(app)
 
 # exception
@@ -43,6 +52,11 @@ app.add_middleware(
 app.add_middleware(AuthMiddleware)
 app.add_middleware(TenantMiddleware)
 
+app.add_middleware(PrometheusMiddleware)
+
+if SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
 # routes
 from app.modules.item.item_routes import router as item_router
 from app.modules.auth.auth_routes import router as auth_router
@@ -51,6 +65,7 @@ from app.modules.tenant.tenant_routes import router as tenant_router
 from app.modules.report.report_routes import router as report_router
 from app.modules.task.task_routes import router as task_router
 from app.modules.upload_control.upload_control_routes import router as upload_control_router
+from app.modules.metrics.metrics_routes import router as metrics_router
 
 
 app.include_router(tenant_router)
@@ -60,16 +75,18 @@ app.include_router(auth_router)
 app.include_router(report_router)
 app.include_router(task_router)
 app.include_router(upload_control_router)
+app.include_router(metrics_router)
 
 
 def create_test_app():
     app = FastAPI()
-    app.add_middleware(TenantMiddleware)
     app.add_middleware(AuthMiddleware)
+    app.add_middleware(TenantMiddleware)
     app.include_router(tenant_router)
     app.include_router(data_load_router)
     app.include_router(item_router)
     app.include_router(auth_router)
     app.include_router(task_router)
     app.include_router(upload_control_router)
+    app.include_router(metrics_router)
     return app
\ No newline at end of file
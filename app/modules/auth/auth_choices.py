@@ -0,0 +1,5 @@
+from enum import Enum
+
+class TokenVerificationMode(str, Enum):
+    REMOTE = "REMOTE"
+    LOCAL = "LOCAL"
@@ -3,49 +3,74 @@ from fastapi import HTTPException, status
 from dotenv import load_dotenv
 import os
 
-load_dotenv()  
+from app.core.http_client import HttpClient
+from app.modules.auth.auth_choices import TokenVerificationMode
+from app.modules.auth.auth_token_cache import token_validation_cache
+from app.modules.auth.auth_token_verifier import local_token_verifier
 
-class AuthService:          
+load_dotenv()
+
+class AuthService:
     def __init__(self):
         self.auth_provide_url = os.getenv("LEGACY_AUTH_PROVIDE_URL")
         self.auth_validate_url = os.getenv("LEGACY_AUTH_VALIDATE_URL")
+        self.authenticate_timeout = float(os.getenv("LEGACY_AUTH_PROVIDE_TIMEOUT", "10"))
+        self.validate_timeout = float(os.getenv("LEGACY_AUTH_VALIDATE_TIMEOUT", "3"))
+        self.verification_mode = TokenVerificationMode(
+            os.getenv("AUTH_TOKEN_VERIFICATION_MODE", TokenVerificationMode.REMOTE.value).upper()
+        )
 
     async def authenticate(self, username: str, password: str) -> str:
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    self.auth_provide_url,
-                    json={"username": username, "password": password},
-                    timeout=60
-                )
-                response.raise_for_status()
-                data = response.json()
-                token = data.get("token")
-                if not token:
-                    raise HTTPException(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="Token not returned by the authentication server."
-                    )
-                return token
-            except httpx.HTTPStatusError as e:
-                raise HTTPException(
-                    status_code=e.response.status_code,
-                    detail=f"Authentication server error: {e.response.text}"
-                )
-            except httpx.RequestError as e:
+        client = HttpClient.get_client()
+        try:
+            response = await client.post(
+                self.auth_provide_url,
+                json={"username": username, "password": password},
+                timeout=HttpClient.timeout(self.authenticate_timeout)
+            )
+            response.raise_for_status()
+            data = response.json()
+            token = data.get("token")
+            if not token:
                 raise HTTPException(
-                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                    detail=f"Error connecting to the authentication server: {str(e)}"
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Token not returned by the authentication server."
                 )
+            return token
+        except httpx.HTTPStatusError as e:
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"Authentication server error: {e.response.text}"
+            )
+        except httpx.RequestError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Error connecting to the authentication server: {str(e)}"
+            )
 
     async def validate_token(self, token: str) -> bool:
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    self.auth_validate_url,
-                    json={"token": token},
-                    timeout=60
-                )
-                return response.status_code == 200
-            except Exception:
-                return False
+        cached = token_validation_cache.get(token)
+        if cached is not None:
+            return cached
+
+        if self.verification_mode == TokenVerificationMode.LOCAL:
+            is_valid = local_token_verifier.verify(token)
+            if is_valid is not None:
+                token_validation_cache.set(token, is_valid)
+                return is_valid
+
+        client = HttpClient.get_client()
+        try:
+            response = await client.post(
+                self.auth_validate_url,
+                json={"token": token},
+                timeout=HttpClient.timeout(self.validate_timeout)
+            )
+        except Exception:
+            return False
+
+        is_valid = response.status_code == 200
+        # only definitive answers are cached, server errors are retried on the next request
+        if is_valid or response.status_code < 500:
+            token_validation_cache.set(token, is_valid)
+        return is_valid
@@ -0,0 +1,73 @@
+import base64
+import hashlib
+import json
+import os
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from app.shared.cache.ttl_cache import TTLCache
+
+load_dotenv()
+
+
+class TokenValidationCache:
+    """
+        Caches the outcome of bearer token validations.
+
+        Tokens are never stored in clear, entries are keyed by their SHA-256 digest.
+        Valid tokens are kept for at most `ttl` seconds and never beyond their JWT
+        `exp` claim; rejected tokens are kept for the shorter `negative_ttl` window
+        so a burst of requests with a bad token does not hit the legacy server.
+    """
+
+    def __init__(
+        self,
+        max_size: int = int(os.getenv("AUTH_TOKEN_CACHE_MAX_SIZE", "10000")),
+        ttl: float = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "300")),
+        negative_ttl: float = float(os.getenv("AUTH_TOKEN_CACHE_NEGATIVE_TTL", "10")),
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._cache: TTLCache[bool] = TTLCache(max_size=max_size, default_ttl=ttl)
+
+    @staticmethod
+    def token_key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def token_expiration(token: str) -> Optional[float]:
+        """Reads the unverified `exp` claim, returns None when it is absent or unreadable."""
+        try:
+            payload_segment = token.split(".")[1]
+            padded = payload_segment + "=" * (-len(payload_segment) % 4)
+            claims = json.loads(base64.urlsafe_b64decode(padded))
+            exp = claims.get("exp")
+            return float(exp) if exp is not None else None
+        except Exception:
+            return None
+
+    def get(self, token: str) -> Optional[bool]:
+        return self._cache.get(self.token_key(token))
+
+    def set(self, token: str, is_valid: bool) -> None:
+        if not is_valid:
+            self._cache.set(self.token_key(token), False, ttl=self.negative_ttl)
+            return
+
+        ttl = self.ttl
+        expiration = self.token_expiration(token)
+        if expiration is not None:
+            ttl = min(ttl, expiration - time.time())
+
+        self._cache.set(self.token_key(token), True, ttl=ttl)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+token_validation_cache = TokenValidationCache()
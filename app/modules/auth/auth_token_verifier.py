@@ -0,0 +1,111 @@
+import json
+import os
+from typing import Iterable, Optional
+
+import jwt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HMAC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+
+
+class LocalTokenVerifier:
+    """
+        Verifies bearer tokens without calling the legacy manager.
+
+        `verify` returns True or False when the token can be judged locally
+        (signature, `exp`/`nbf` and revocation checks) and None when it cannot,
+        e.g. an opaque legacy token or an algorithm or signing key that is not
+        configured, so the caller can fall back to the legacy verify endpoint.
+        Revoked `jti`s come from AUTH_JWT_REVOKED_JTIS, shared by every process.
+    """
+
+    def __init__(
+        self,
+        secret: Optional[str] = None,
+        public_key: Optional[str] = None,
+        jwks: Optional[dict] = None,
+        algorithms: Iterable[str] = ("HS256",),
+        revoked_jtis: Iterable[str] = (),
+        leeway: float = 0,
+    ):
+        self.secret = secret
+        self.public_key = public_key
+        self.jwks = jwt.PyJWKSet.from_dict(jwks) if jwks else None
+        self.algorithms = set(algorithms)
+        self.revoked_jtis = set(revoked_jtis)
+        self.leeway = leeway
+
+    @classmethod
+    def from_env(cls) -> "LocalTokenVerifier":
+        jwks = None
+        jwks_file = os.getenv("AUTH_JWT_JWKS_FILE")
+        if jwks_file:
+            with open(jwks_file) as file:
+                jwks = json.load(file)
+
+        return cls(
+            secret=os.getenv("AUTH_JWT_SECRET") or None,
+            public_key=os.getenv("AUTH_JWT_PUBLIC_KEY") or None,
+            jwks=jwks,
+            algorithms=_split_env("AUTH_JWT_ALGORITHMS", "HS256"),
+            revoked_jtis=_split_env("AUTH_JWT_REVOKED_JTIS", ""),
+            leeway=float(os.getenv("AUTH_JWT_LEEWAY", "0")),
+        )
+
+    def verify(self, token: str) -> Optional[bool]:
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.DecodeError:
+            # not a JWT, opaque tokens are left to the legacy server
+            return None
+
+        algorithm = header.get("alg")
+        if algorithm not in self.algorithms:
+            return None
+
+        key = self._resolve_key(algorithm, header.get("kid"))
+        if key is None:
+            return None
+
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm],
+                leeway=self.leeway,
+                options={"require": ["exp"], "verify_aud": False},
+            )
+        except jwt.MissingRequiredClaimError:
+            return None
+        except jwt.InvalidTokenError:
+            return False
+
+        if claims.get("jti") in self.revoked_jtis:
+            return False
+
+        return True
+
+    def _resolve_key(self, algorithm: str, kid: Optional[str]):
+        if algorithm in HMAC_ALGORITHMS:
+            return self.secret
+
+        if self.jwks:
+            if kid:
+                try:
+                    return self.jwks[kid].key
+                except KeyError:
+                    return None
+            if len(self.jwks.keys) == 1:
+                return self.jwks.keys[0].key
+            return None
+
+        return self.public_key
+
+
+def _split_env(name: str, default: str) -> list[str]:
+    return [value.strip() for value in os.getenv(name, default).split(",") if value.strip()]
+
+
+local_token_verifier = LocalTokenVerifier.from_env()
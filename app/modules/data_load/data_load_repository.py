@@ -1,89 +1,448 @@
+import asyncio
+import functools
+import os
+import tempfile
+from collections import Counter, defaultdict
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple
+import anyio
 from bson import ObjectId
+from dotenv import load_dotenv
 from fastapi import Query, Request, UploadFile
-import pandas as pd
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from pymongo import UpdateOne
-from app.services.excel_services import build_nodes_from_df
-from app.shared.storage.s3.objects import storage_s3_retrieve_objects_url
+from pymongo.errors import BulkWriteError
+from starlette.concurrency import iterate_in_threadpool
+from app.shared.database.children_count import CHILDREN_COUNT_FIELD, children_total, refresh_children_count
+from app.shared.database.inventory_stats import InventoryStatsDelta, reconcile_inventory_stats
+from app.shared.database.pagination import KEYSET_SORT, keyset_page
+from app.shared.database.tree_snapshot import bump_tree_version
+from app.services.excel_services import build_nodes_from_df, excel_row_count, hierarchy_levels, iter_excel_chunks
+from app.shared.storage.s3.objects import storage_s3_download_object
+from app.shared.storage.s3.presign import presign_service
+from app.shared.files.images import PHOTO_DERIVATIVES_FIELD, photo_keys_for_size
+from app.shared.files.photo_size_choices import PhotoSizeChoice
+
+load_dotenv()
+
+DATA_LOAD_CHUNK_ROWS = int(os.getenv("DATA_LOAD_CHUNK_ROWS", "5000"))
+DATA_LOAD_BATCH_SIZE = int(os.getenv("DATA_LOAD_BATCH_SIZE", "1000"))
+DATA_LOAD_RESOLVE_BATCH_SIZE = int(os.getenv("DATA_LOAD_RESOLVE_BATCH_SIZE", "500"))
+DATA_LOAD_CONCURRENCY = int(os.getenv("DATA_LOAD_CONCURRENCY", "4"))
+DATA_LOAD_MAX_REPORTED_WRITE_ERRORS = 20
+DATA_LOAD_PAGE_SIZE = 100
+
+STORED_NODE_PROJECTION = {"reference": 1, "parent_id": 1, "content_hash": 1, "node_type": 1, "is_app_created": 1}
+
+# marks rows whose parent is not stored, so their deeper levels are not looked up
+UNRESOLVED = object()
+
+
+def upsert_operation(doc: dict) -> UpdateOne:
+    return UpdateOne(
+        {"reference": doc["reference"], "parent_id": doc["parent_id"]},
+        {
+            "$set": {k: v for k, v in doc.items() if k not in ["_id", "checked"]},
+            "$setOnInsert": {"_id": doc["_id"], "checked": doc["checked"], CHILDREN_COUNT_FIELD: 0}
+        },
+        upsert=True
+    )
+
+
+def is_truthy(value) -> bool:
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def parse_extra_fields(extra_fields: str) -> List[str]:
+    return [
+        f.strip() for f in (extra_fields or "").split(",") if f.strip()
+    ]
 
 
 class DataLoadRepository:
     async def create_many(self, request: Request):
         form = await request.form()
         file: UploadFile = form.get("file")
-        extra_fields: str = form.get("extra_fields", "")
-    
-        extra_fields_list = [
-            f.strip() for f in extra_fields.split(",") if f.strip()
-        ]
-    
-        df = pd.read_excel(file.file)
-        
-        nodes = {}
-        
-        if request.state.db is not None:
-            existingInfo = await request.state.db.inventory_items.find({},{"reference": 1, "parent_id": 1}).to_list(None)
-            for doc in existingInfo:
-                nodes[(doc["reference"], doc["parent_id"])] = doc["_id"]
-    
-        documents = build_nodes_from_df(
-            df,
-            delimiter_column="delimiter",
-            extra_fields=extra_fields_list,
-            nodes = nodes,
-        )
-    
-        if not documents:
-            return {"message": "Nenhum item para inserir"}
-    
+        extra_fields_list = parse_extra_fields(form.get("extra_fields", ""))
+        dry_run = is_truthy(form.get("dry_run"))
+
+        inserted = 0
+        modified = 0
+        diff = Counter()
+        new_parents = set()
+        stats = InventoryStatsDelta()
+        operations = []
+        flushed = False
+
+        async def flush(batch):
+            nonlocal inserted, modified, flushed
+            # set before the write, part of a failed batch may have landed
+            flushed = True
+            result = await request.state.db.inventory_items.bulk_write(batch)
+            inserted += result.upserted_count
+            modified += result.modified_count
+
         try:
-            operations = [
-                UpdateOne(
-                    {"reference": doc["reference"], "parent_id": doc["parent_id"]},
-                    {
-                        "$set": {k: v for k, v in doc.items() if k not in ["_id", "checked"]},
-                        "$setOnInsert": {"_id": doc["_id"], "checked": doc["checked"]}
-                    },
-                    upsert=True
-                )
-                for doc in documents
-            ]
+            async for _, chunk_operations in self.iter_upserts(
+                request.state.db, file.file, extra_fields_list, diff, new_parents, stats
+            ):
+                if dry_run:
+                    continue
+                for operation in chunk_operations:
+                    operations.append(operation)
+                    if len(operations) >= DATA_LOAD_BATCH_SIZE:
+                        await flush(operations)
+                        operations = []
+
+            if dry_run:
+                return {
+                    "message": "Simulação concluída, nenhum item foi gravado",
+                    **await self.diff_counts(request.state.db, diff)
+                }
 
-            result = await request.state.db.inventory_items.bulk_write(operations)
+            if not (diff["new"] or diff["changed"] or diff["unchanged"]):
+                return {"message": "Nenhum item para inserir"}
+
+            if operations:
+                await flush(operations)
+            await refresh_children_count(request.state.db.inventory_items, new_parents)
+            if stats.requires_reconcile:
+                await reconcile_inventory_stats(request.state.db)
+            else:
+                await stats.apply(request.state.db)
             
             return {
                 "message": "Itens atualizados/inseridos com sucesso!",
-                "inserted": result.upserted_count,
-                "modified": result.modified_count
+                "inserted": inserted,
+                "modified": modified,
+                "unchanged": diff["unchanged"]
             }
         except Exception as e:
             return {
                 "message": "Erro ao inserir itens",
-                "error": str(e)
+                "error": str(e),
+                "inserted": inserted,
+                "modified": modified
             }
-    
+        finally:
+            if flushed:
+                await bump_tree_version(request.state.db)
+
+    async def iter_upserts(
+        self,
+        db,
+        file: BinaryIO,
+        extra_fields: List[str],
+        diff: Optional[Counter] = None,
+        new_parents: Optional[set] = None,
+        stats: Optional[InventoryStatsDelta] = None,
+    ) -> AsyncIterator[Tuple[int, List[UpdateOne]]]:
+        """
+            Streams the workbook and yields, per chunk, its row count and the upserts of
+            its new or changed nodes.
+
+            Stored nodes are compared through their `content_hash` and skipped when equal.
+            `diff` counts every node of the sheet once as new, changed or unchanged (and
+            under `app_created` the stored ones created by the app), `new_parents`
+            collects the parents that gain children and `stats` the dashboard counters
+            of the new nodes. A changed `node_type` moves assets in a way the delta
+            cannot follow, `stats` is then marked for a reconciliation.
+        """
+        if diff is None:
+            diff = Counter()
+        nodes = {}
+        stored_nodes = {}
+        seen = set()
+        # reading and building chunks is CPU work, it runs in threads to keep the event loop free
+        async for df in iterate_in_threadpool(iter_excel_chunks(file, DATA_LOAD_CHUNK_ROWS)):
+            await self.resolve_existing_nodes(db, df, "delimiter", nodes, stored_nodes)
+            documents = await anyio.to_thread.run_sync(functools.partial(
+                build_nodes_from_df,
+                df,
+                delimiter_column="delimiter",
+                extra_fields=extra_fields,
+                nodes = nodes,
+                include_existing=True,
+            ))
+
+            operations = []
+            for doc in documents:
+                # nodes shared by several chunks are built again in each one
+                if doc["_id"] in seen:
+                    continue
+                seen.add(doc["_id"])
+
+                stored = stored_nodes.get(doc["_id"])
+                if stored is None:
+                    diff["new"] += 1
+                    if new_parents is not None and doc["parent_id"] is not None:
+                        new_parents.add(doc["parent_id"])
+                    if stats is not None:
+                        stats.add_node(doc)
+                    operations.append(upsert_operation(doc))
+                    continue
+
+                if stored.get("is_app_created"):
+                    diff["app_created"] += 1
+                if stored.get("content_hash") == doc["content_hash"]:
+                    diff["unchanged"] += 1
+                    continue
+
+                diff["changed"] += 1
+                if stats is not None and stored.get("node_type") != doc["node_type"]:
+                    stats.requires_reconcile = True
+                operations.append(upsert_operation(doc))
+
+            yield len(df), operations
+
+    async def diff_counts(self, db, diff: Counter) -> Dict[str, int]:
+        """
+            Completes the diff of an import with the stored nodes the sheet does not
+            mention. Nodes created by the app are not expected in it and are left out.
+        """
+        stored = await db.inventory_items.count_documents({"is_app_created": {"$ne": True}})
+        mentioned = diff["changed"] + diff["unchanged"] - diff["app_created"]
+        return {
+            "new": diff["new"],
+            "changed": diff["changed"],
+            "unchanged": diff["unchanged"],
+            "missing": max(stored - mentioned, 0),
+        }
+
+    async def resolve_existing_nodes(
+        self,
+        db,
+        df,
+        delimiter_column: str,
+        nodes: dict,
+        stored_nodes: Optional[dict] = None
+    ):
+        """
+            Adds to `nodes` the already stored nodes that the rows of `df` refer to,
+            and the stored documents (by `_id`) to `stored_nodes` when given.
+
+            Walks the hierarchy one level at a time and only asks for the (reference,
+            parent_id) keys that are not known yet; children of a node that does not
+            exist cannot exist either, so they are not looked up.
+        """
+        level_columns, _, references, depths = await anyio.to_thread.run_sync(hierarchy_levels, df, delimiter_column)
+        row_depths = depths.tolist()
+        row_parents = [None] * len(row_depths)
+
+        for level in range(len(level_columns)):
+            rows = [
+                row for row, depth in enumerate(row_depths)
+                if depth > level and row_parents[row] is not UNRESOLVED
+            ]
+            if not rows:
+                break
+
+            keys = {(references[row, level], row_parents[row]) for row in rows}
+            await self.find_nodes(db, [key for key in keys if key not in nodes], nodes, stored_nodes)
+
+            for row in rows:
+                row_parents[row] = nodes.get((references[row, level], row_parents[row]), UNRESOLVED)
+
+    async def find_nodes(self, db, keys: list, nodes: dict, stored_nodes: Optional[dict] = None):
+        """Looks up (reference, parent_id) keys in batched `$or` queries served by the (parent_id, reference) index."""
+        for start in range(0, len(keys), DATA_LOAD_RESOLVE_BATCH_SIZE):
+            references_by_parent = defaultdict(list)
+            for reference, parent_id in keys[start:start + DATA_LOAD_RESOLVE_BATCH_SIZE]:
+                references_by_parent[parent_id].append(reference)
+
+            query = {
+                "$or": [
+                    {"parent_id": parent_id, "reference": {"$in": references}}
+                    for parent_id, references in references_by_parent.items()
+                ]
+            }
+            async for doc in db.inventory_items.find(query, STORED_NODE_PROJECTION):
+                nodes[(doc["reference"], doc["parent_id"])] = doc["_id"]
+                if stored_nodes is not None:
+                    stored_nodes[doc["_id"]] = doc
+
     async def get_items(    
         self,
         request: Request,
-        parent_id: str | None = Query(default=None)
+        parent_id: str | None = Query(default=None),
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        photo_size: PhotoSizeChoice = PhotoSizeChoice.ORIGINAL
     ):
+        """
+            Children of `parent_id` (roots when empty). Without `limit` every child is
+            returned as a list; with it, one keyset page and the `next` token. Photos
+            are signed in `photo_size`, originals where no derivative exists yet.
+        """
         db = request.state.db
     
         query = {"parent_id": None}
         if parent_id:
             query = {"parent_id": ObjectId(parent_id)}
-    
-        cursor = db.inventory_items.find(
-            query, {}
-        ).sort("reference", 1)
-    
-        items = []
+
+        next_cursor = None
+        if limit is None and not cursor:
+            items = await db.inventory_items.find(
+                query, {}
+            ).sort(KEYSET_SORT).to_list(None)
+        else:
+            items, next_cursor = await keyset_page(
+                db.inventory_items, query, limit or DATA_LOAD_PAGE_SIZE, cursor=cursor
+            )
+
+        # every photo key of the page is signed in one batch
+        photos = {}
+        for doc in items:
+            if 'photos' in doc:
+                keys = photo_keys_for_size(doc, photo_size)
+                # a single key keeps being returned as a single URL
+                photos[doc["_id"]] = keys[0] if isinstance(doc['photos'], str) and keys else keys
+        urls = await presign_service.sign_many(
+            [key for value in photos.values() for key in presign_service.keys_of(value)]
+        )
         
-        async for doc in cursor:
+        for doc in items:
             if 'photos' in doc:
-                doc['photos'] = await storage_s3_retrieve_objects_url(doc.get('photos', None))
+                doc['photos'] = presign_service.pick(urls, photos[doc["_id"]])
+            doc.pop(PHOTO_DERIVATIVES_FIELD, None)
             doc["_id"] = str(doc["_id"])
             if doc.get("parent_id"):
                 doc["parent_id"] = str(doc["parent_id"])
-            items.append(doc)
+
+        if limit is None and not cursor:
+            return items
     
-        return items
\ No newline at end of file
+        return {
+            "items": items,
+            "total": await children_total(db.inventory_items, query["parent_id"]),
+            "limit": limit or DATA_LOAD_PAGE_SIZE,
+            "has_more": next_cursor is not None,
+            "next": next_cursor
+        }
+
+class InventoryExcelImport:
+    """
+        Imports a workbook staged in S3 in the background.
+
+        Upserts are sent in DATA_LOAD_BATCH_SIZE batches with `ordered=False`, at most
+        DATA_LOAD_CONCURRENCY of them in flight. A failing batch does not stop the load,
+        its error is kept in `errors` and reported with the progress. With `dry_run`
+        nothing is written and the result holds the diff counts.
+    """
+
+    def __init__(
+        self,
+        database: AsyncIOMotorDatabase,
+        batch_size: int = DATA_LOAD_BATCH_SIZE,
+        concurrency: int = DATA_LOAD_CONCURRENCY,
+    ):
+        self.db = database
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.inserted = 0
+        self.modified = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._pending = set()
+        self._batches = 0
+
+    async def perform_import(
+        self,
+        source_key: str,
+        extra_fields: List[str],
+        on_progress: Optional[Callable[[int, Optional[int], List[Dict[str, Any]]], Awaitable[None]]] = None,
+        dry_run: bool = False,
+    ) -> Dict[str, Any]:
+        repository = DataLoadRepository()
+        diff = Counter()
+        new_parents = set()
+        stats = InventoryStatsDelta()
+
+        with tempfile.TemporaryFile() as file:
+            await anyio.to_thread.run_sync(storage_s3_download_object, source_key, file)
+            file.seek(0)
+            total_rows = await anyio.to_thread.run_sync(excel_row_count, file)
+            file.seek(0)
+
+            processed_rows = 0
+            operations = []
+            try:
+                async for rows, chunk_operations in repository.iter_upserts(
+                    self.db, file, extra_fields, diff, new_parents, stats
+                ):
+                    for operation in [] if dry_run else chunk_operations:
+                        operations.append(operation)
+                        if len(operations) >= self.batch_size:
+                            await self._submit(operations)
+                            operations = []
+
+                    processed_rows += rows
+                    if on_progress:
+                        await on_progress(processed_rows, total_rows, self.errors)
+
+                if operations:
+                    await self._submit(operations)
+            finally:
+                # batches already sent are always awaited, even when reading the sheet fails
+                if self._pending:
+                    await asyncio.wait(self._pending)
+                if self._batches:
+                    await bump_tree_version(self.db)
+
+            if on_progress:
+                await on_progress(processed_rows, total_rows, self.errors)
+
+        if dry_run:
+            return {
+                "rows": processed_rows,
+                "dry_run": True,
+                **await repository.diff_counts(self.db, diff),
+            }
+
+        # after every batch landed, so parents created by this import are counted too
+        await refresh_children_count(self.db.inventory_items, new_parents)
+        if self.errors or stats.requires_reconcile:
+            # the delta assumes every upsert landed and no node changed type, recount instead
+            await reconcile_inventory_stats(self.db)
+        else:
+            await stats.apply(self.db)
+
+        return {
+            "rows": processed_rows,
+            "inserted": self.inserted,
+            "modified": self.modified,
+            "unchanged": diff["unchanged"],
+            "failed_batches": len(self.errors),
+        }
+
+    async def _submit(self, operations: List[UpdateOne]) -> None:
+        while len(self._pending) >= self.concurrency:
+            _, self._pending = await asyncio.wait(self._pending, return_when=asyncio.FIRST_COMPLETED)
+
+        self._batches += 1
+        self._pending.add(asyncio.create_task(self._write(self._batches, operations)))
+
+    async def _write(self, batch: int, operations: List[UpdateOne]) -> None:
+        try:
+            result = await self.db.inventory_items.bulk_write(operations, ordered=False)
+            self.inserted += result.upserted_count
+            self.modified += result.modified_count
+        except BulkWriteError as error:
+            details = error.details
+            self.inserted += details.get("nUpserted", 0)
+            self.modified += details.get("nModified", 0)
+            write_errors = details.get("writeErrors", [])
+            self.errors.append({
+                "batch": batch,
+                "operations": len(operations),
+                "failed": len(write_errors),
+                "write_errors": [
+                    {"index": item.get("index"), "code": item.get("code"), "message": item.get("errmsg")}
+                    for item in write_errors[:DATA_LOAD_MAX_REPORTED_WRITE_ERRORS]
+                ],
+            })
+        except Exception as error:
+            self.errors.append({
+                "batch": batch,
+                "operations": len(operations),
+                "failed": len(operations),
+                "error": str(error),
+            })
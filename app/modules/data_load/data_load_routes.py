@@ -1,7 +1,14 @@
-from fastapi import APIRouter, Query, Request
+import anyio
+from fastapi import APIRouter, File, Form, HTTPException, Query, Request, UploadFile, status
 
 from app.core.decorators.auth_decorator import no_auth
-from .data_load_repository import DataLoadRepository
+from app.modules.task.task_choices import AsyncTaskType
+from app.modules.task.task_repository import AsyncTaskRepository
+from app.modules.task.task_schemas import AsyncTaskCreateResponse
+from app.modules.task.task_storage_paths import TaskStoragePaths
+from app.shared.files.photo_size_choices import PhotoSizeChoice
+from app.shared.storage.s3.objects import generate_s3_storage_object_key, storage_s3_save_object
+from .data_load_repository import DataLoadRepository, parse_extra_fields
 
 router = APIRouter(prefix="/load", tags=["DataLoad"])
 repository = DataLoadRepository()
@@ -10,6 +17,46 @@ repository = DataLoadRepository()
 async def data_load(request: Request):
     return await repository.create_many(request)
 
+@router.post(
+    "/upload_excel/async",
+    response_model=AsyncTaskCreateResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def data_load_async(
+    request: Request,
+    file: UploadFile = File(...),
+    extra_fields: str = Form(default=""),
+    dry_run: bool = Form(default=False)
+) -> AsyncTaskCreateResponse:
+    db = request.state.db
+    source_key = generate_s3_storage_object_key(
+        prefix=TaskStoragePaths(db.name).inputs,
+        file=file
+    )
+
+    try:
+        await anyio.to_thread.run_sync(storage_s3_save_object, file, source_key)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro ao armazenar o arquivo")
+
+    return await AsyncTaskRepository(db).create(
+        task_type=AsyncTaskType.IMPORT_INVENTORY_EXCEL,
+        params={
+            "source_key": source_key,
+            "extra_fields": parse_extra_fields(extra_fields),
+            "dry_run": dry_run
+        }
+    )
+
 @router.get("")
-async def get_items(request: Request, parent_id: str | None = Query(default=None)):
-    return await repository.get_items(request, parent_id)
\ No newline at end of file
+async def get_items(
+    request: Request,
+    parent_id: str | None = Query(default=None),
+    limit: int | None = Query(default=None, ge=1, le=1000, description="Pagina o resultado quando informado."),
+    cursor: str | None = Query(default=None, description="Token `next` retornado pela página anterior."),
+    photo_size: PhotoSizeChoice = Query(default=PhotoSizeChoice.ORIGINAL, description="Tamanho das fotos retornadas.")
+):
+    try:
+        return await repository.get_items(request, parent_id, limit=limit, cursor=cursor, photo_size=photo_size)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
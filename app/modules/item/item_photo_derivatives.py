@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.shared.files.images import (
+    PHOTO_DERIVATIVES_FIELD,
+    photo_derivative_key,
+    render_photo_derivatives,
+)
+from app.shared.files.photo_size_choices import PhotoSizeChoice
+from app.shared.storage.s3.objects import storage_s3_download_object, storage_s3_save_bytes
+from app.shared.storage.s3.presign import presign_service
+
+load_dotenv()
+
+PHOTO_DERIVATIVE_WORKERS = int(os.getenv("PHOTO_DERIVATIVE_WORKERS", "2"))
+# items whose photos are rendered together by the backfill
+PHOTO_DERIVATIVE_BATCH_SIZE = 20
+
+logger = logging.getLogger("app.photo_derivatives")
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def derivatives_executor() -> Optional[ProcessPoolExecutor]:
+    """
+        Process pool shared by the renders of this process. Celery prefork workers are
+        daemonic and cannot start children, there the default thread pool is used.
+    """
+    global _executor
+    if multiprocessing.current_process().daemon:
+        return None
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=PHOTO_DERIVATIVE_WORKERS)
+    return _executor
+
+
+class ItemPhotoDerivatives:
+    """
+        Builds the THUMBNAIL and PREVIEW derivatives of item photos. Each one is stored
+        next to its original and the keys are pushed to `photo_derivatives` as
+        {"ORIGINAL": key, "THUMBNAIL": key, "PREVIEW": key}.
+    """
+
+    def __init__(self, database: AsyncIOMotorDatabase, concurrency: int = PHOTO_DERIVATIVE_WORKERS):
+        self.db = database
+        self._collection = self.db["inventory_items"]
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def build(self, key: str, data: Optional[bytes] = None) -> Optional[Dict[str, str]]:
+        async with self._semaphore:
+            try:
+                if data is None:
+                    buffer = BytesIO()
+                    await asyncio.to_thread(storage_s3_download_object, key, buffer)
+                    data = buffer.getvalue()
+
+                rendered = await asyncio.get_running_loop().run_in_executor(
+                    derivatives_executor(), render_photo_derivatives, data
+                )
+
+                entry = {PhotoSizeChoice.ORIGINAL.value: key}
+                for size, content in rendered.items():
+                    derivative_key = photo_derivative_key(key, PhotoSizeChoice(size))
+                    await asyncio.to_thread(storage_s3_save_bytes, content, derivative_key, "image/jpeg")
+                    entry[size] = derivative_key
+            except Exception as error:
+                # an unreadable photo keeps being served as its original
+                logger.warning("Could not build derivatives of %s: %s", key, error)
+                return None
+
+        # a previous URL for the same key may point to an older render
+        presign_service.invalidate([value for size, value in entry.items() if size != PhotoSizeChoice.ORIGINAL.value])
+        return entry
+
+    async def build_for_item(
+        self,
+        item_id: ObjectId,
+        keys: List[str],
+        contents: Optional[List[Optional[bytes]]] = None
+    ) -> int:
+        """Renders `keys` (from `contents` when the bytes are at hand) and records them on the item."""
+        contents = contents or [None] * len(keys)
+        entries = await asyncio.gather(*[
+            self.build(key, data) for key, data in zip(keys, contents)
+        ])
+        entries = [entry for entry in entries if entry]
+        if entries:
+            await self._collection.update_one(
+                {"_id": item_id},
+                {"$push": {PHOTO_DERIVATIVES_FIELD: {"$each": entries}}}
+            )
+        return len(entries)
+
+    async def backfill(
+        self,
+        item_ids: Optional[List[str]] = None,
+        on_progress: Optional[Callable[[int, int], Awaitable[Any]]] = None
+    ) -> Dict[str, int]:
+        """Builds the derivatives missing for existing photos, of every item or of `item_ids`."""
+        query: Dict[str, Any] = {"photos": {"$exists": True, "$ne": []}}
+        if item_ids:
+            query["_id"] = {"$in": [ObjectId(item_id) for item_id in item_ids]}
+
+        total_items = await self._collection.count_documents(query)
+        processed_items = 0
+        built = 0
+        batch = []
+
+        async def flush(batch):
+            results = await asyncio.gather(*[
+                self.build_for_item(item_id, keys) for item_id, keys in batch
+            ])
+            return sum(results)
+
+        async for item in self._collection.find(query, {"photos": 1, PHOTO_DERIVATIVES_FIELD: 1}):
+            processed_items += 1
+            done = {
+                entry.get(PhotoSizeChoice.ORIGINAL.value)
+                for entry in item.get(PHOTO_DERIVATIVES_FIELD) or []
+            }
+            missing = [key for key in presign_service.keys_of(item.get("photos")) if key not in done]
+            if missing:
+                batch.append((item["_id"], missing))
+
+            if len(batch) >= PHOTO_DERIVATIVE_BATCH_SIZE:
+                built += await flush(batch)
+                batch = []
+                if on_progress:
+                    await on_progress(processed_items, total_items)
+
+        if batch:
+            built += await flush(batch)
+        if on_progress:
+            await on_progress(processed_items, total_items)
+
+        return {"items": processed_items, "photos": built}
@@ -1,26 +1,74 @@
 import datetime
 from bson import ObjectId
-from fastapi import HTTPException, Request
-from app.shared.storage.s3.objects import generate_s3_storage_object_key, storage_s3_save_object, storage_s3_retrieve_objects_url
+from fastapi import BackgroundTasks, HTTPException, Request
+from app.shared.storage.s3.objects import generate_s3_storage_object_key, storage_s3_save_object
+from app.shared.storage.s3.presign import presign_service
+from app.shared.storage.s3.streaming_upload import StreamingFormUpload
+from app.shared.database.ancestors import ANCESTORS_FIELD, ROOT_ID_FIELD, child_ancestors, child_root_id, root_ids_ready
+from app.shared.database.children_count import CHILDREN_COUNT_FIELD, increment_children_count
+from app.shared.database.inventory_stats import InventoryStatsDelta, apply_stats_delta
+from app.shared.database.tree_snapshot import bump_tree_version
 from app.modules.item.item_storage_paths import ItemStoragePaths
+from app.modules.item.item_photo_derivatives import ItemPhotoDerivatives
+from app.modules.item.item_subtree_delete import ItemSubtreeDelete
+from app.modules.item.item_subtree_move import ItemSubtreeMove
+from app.shared.files.images import PHOTO_DERIVATIVES_FIELD
+from app.shared.observability.server_timing import timed
 from starlette.datastructures import UploadFile
 import asyncio
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
 import json
 
 
 class ItemRepository:
-    async def check_item(self, request: Request):
+    @staticmethod
+    def photos_prefix_for(client_name: str, new_item_id: ObjectId):
+        """
+            Storage prefix of the photos in a check form: the checked item when `item_id`
+            precedes the photos, the item being created when `reference` does. Otherwise
+            it is only known once the whole form is read.
+        """
+        def prefix_for(fields: Dict[str, str], complete: bool) -> Optional[str]:
+            item_id = fields.get("item_id")
+            if item_id and ObjectId.is_valid(item_id):
+                return ItemStoragePaths(client_name=client_name, item_id=ObjectId(item_id)).images
+            if complete or (fields.get("reference") and not item_id):
+                return ItemStoragePaths(client_name=client_name, item_id=new_item_id).images
+            return None
+        return prefix_for
+
+    async def check_item(self, request: Request, background_tasks: Optional[BackgroundTasks] = None):
         db: AsyncIOMotorDatabase = request.state.db
-        form = await request.form()
+        new_item_id = ObjectId()
+        upload = StreamingFormUpload("photos", self.photos_prefix_for(db.name, new_item_id))
+        form, photos_data = await upload.parse(request)
 
-        item_id: str = form.get("item_id")
-        
-        if not item_id:
-            return await self.create_item(request, form)
-        
-        item = await db.inventory_items.find_one({"_id": ObjectId(item_id)})
+        try:
+            item_id: str = form.get("item_id")
+            if not item_id:
+                result = await self.create_item(request, form, new_item_id, photos_data)
+            elif not ObjectId.is_valid(item_id):
+                raise HTTPException(400, "ObjectId inválido")
+            else:
+                result = await self.update_checked_item(db, form, ObjectId(item_id), photos_data)
+        except BaseException:
+            # photos of a rejected check are not kept
+            await upload.discard()
+            raise
+
+        # derivatives are rendered after the response is sent, in this process: a crash loses
+        # them and readers serve the original until the BUILD_PHOTO_DERIVATIVES backfill task
+        # (POST /item/photos/derivatives) renders the photos still missing them
+        if background_tasks is not None and photos_data:
+            background_tasks.add_task(
+                ItemPhotoDerivatives(db).build_for_item, ObjectId(result["id"]), photos_data
+            )
+        return result
+
+    async def update_checked_item(self, db: AsyncIOMotorDatabase, form, item_id: ObjectId, photos_data: List[str]):
+        item = await db.inventory_items.find_one({"_id": item_id})
         
         if not item:
             raise HTTPException(404, "Item não encontrado")
@@ -28,19 +76,11 @@ class ItemRepository:
         # if item.get("checked"):
         #     raise HTTPException(400, "Item já inventariado")
 
-        photos = form.getlist("photos") if "photos" in form else []
-        base_item_photo_path = (
-            ItemStoragePaths(
-                client_name=request.state.db.name,
-                item_id=ObjectId(item_id)
-            ).images
-        )
-        photos_data = await self.perform_save_item_photos(photos, base_item_photo_path)
-       
         doc = {
             "checked": True,
             "checked_at": datetime.datetime.utcnow(),
             "photos": photos_data,
+            PHOTO_DERIVATIVES_FIELD: [],
         }
 
         asset_data_str = form.get("asset_data")
@@ -51,39 +91,60 @@ class ItemRepository:
             except json.JSONDecodeError:
                 pass
 
+        # the check lands where the item is counted now, a move then carries it along
+        if item.get("node_type") == "ASSET" and item.get("checked") is not True:
+            await db.inventory_items.update_one(
+                {"_id": item_id},
+                {"$set": {"checked": True, "checked_at": doc["checked_at"]}})
+            stats = InventoryStatsDelta()
+            stats.add_asset(item.get("path"), False, -1)
+            stats.add_asset(item.get("path"), True, 1)
+            await stats.apply(db)
+
         new_parent_id_str = form.get("parent_id")
-        new_path = item["path"]
+        mover = ItemSubtreeMove(db)
+        moved = item
         if new_parent_id_str:
-            new_parent_id = ObjectId(new_parent_id_str)
-            
-            if new_parent_id != item.get("parent_id"):
-                new_parent = await db.inventory_items.find_one({"_id": new_parent_id})
-                if not new_parent:
-                    raise HTTPException(400, "Item pai não encontrado")
-                
-                new_level = new_parent.get("level", 0) + 1
-                new_path = new_parent.get("path", []) + [item["reference"]]
-                
-                doc["parent_id"] = new_parent_id
-                doc["level"] = new_level
-                doc["path"] = new_path
+            # descendants follow the item, their paths and levels are rewritten too
+            moved = await mover.move(item_id, ObjectId(new_parent_id_str))
+        new_path = moved["path"]
 
         await db.inventory_items.update_one(
-            {"_id": ObjectId(item_id)},
+            {"_id": item_id},
             {"$set": doc})
+        await mover.commit()
 
         return {
-            "id": item_id,
-            "parent_id": str(doc.get("parent_id", item.get("parent_id"))),
+            "id": str(item_id),
+            "parent_id": str(moved.get("parent_id")),
             "checked": True,
             "checked_at": datetime.datetime.utcnow(),
-            "photos": await storage_s3_retrieve_objects_url(photos_data),
+            "photos": await presign_service.resolve(photos_data),
             "reference": item["reference"],
             "asset_data": doc.get("asset_data", item.get("asset_data")),
             "path": new_path
         }
     
-    async def create_item(self, request: Request, form):
+    @staticmethod
+    async def _find_root_node(db: AsyncIOMotorDatabase, parent_item: Dict) -> Dict:
+        """Root of the tree of `parent_item` for tenants whose nodes do not carry `root_id` yet."""
+        root_reference = parent_item.get("path", [])[0] if parent_item.get("path") else None
+        
+        if root_reference:
+            root_node = await db.inventory_items.find_one({
+                "reference": root_reference,
+                "parent_id": None
+            })
+        else:
+            root_node = parent_item
+            while root_node and root_node.get("parent_id") is not None:
+                root_node = await db.inventory_items.find_one({"_id": root_node["parent_id"]})
+        
+        if not root_node:
+            raise HTTPException(500, "Não foi possível encontrar a localização raiz")
+        return root_node
+
+    async def create_item(self, request: Request, form, item_id: ObjectId, photos_data: List[str]):
         db: AsyncIOMotorDatabase = request.state.db
         
         reference = form.get("reference")
@@ -100,25 +161,15 @@ class ItemRepository:
         if not parent_item:
             raise HTTPException(400, "Item pai não encontrado")
         
-        root_reference = parent_item.get("path", [])[0] if parent_item.get("path") else None
-        
-        if root_reference:
-            root_node = await db.inventory_items.find_one({
-                "reference": root_reference,
-                "parent_id": None
-            })
+        root_id = child_root_id(parent_item) if await root_ids_ready(db) else None
+        if root_id is not None:
+            duplicate_query = {"reference": reference, ROOT_ID_FIELD: root_id}
         else:
-            root_node = parent_item
-            while root_node and root_node.get("parent_id") is not None:
-                root_node = await db.inventory_items.find_one({"_id": root_node["parent_id"]})
-        
-        if not root_node:
-            raise HTTPException(500, "Não foi possível encontrar a localização raiz")
+            root_node = await self._find_root_node(db, parent_item)
+            root_id = root_node["_id"]
+            duplicate_query = {"reference": reference, "path.0": root_node["reference"]}
         
-        existing_item = await db.inventory_items.find_one({
-            "reference": reference,
-            "path.0": root_node["reference"]
-        })
+        existing_item = await db.inventory_items.find_one(duplicate_query, {"_id": 1})
         
         if existing_item:
             raise HTTPException(
@@ -129,17 +180,6 @@ class ItemRepository:
         level = parent_item.get("level", 0) + 1
         path = parent_item.get("path", []) + [reference]
         
-        item_id = ObjectId()
-        
-        photos = form.getlist("photos") if "photos" in form else []
-        photos_data = []
-        if photos:
-            base_item_photo_path = ItemStoragePaths(
-                client_name=db.name,
-                item_id=item_id
-            ).images
-            photos_data = await self.perform_save_item_photos(photos, base_item_photo_path)
-        
         asset_data = None
         asset_data_str = form.get("asset_data")
         if asset_data_str:
@@ -158,13 +198,28 @@ class ItemRepository:
             "checked": True,
             "checked_at": datetime.datetime.utcnow(),
             "path": path,
+            ANCESTORS_FIELD: child_ancestors(parent_item),
+            ROOT_ID_FIELD: root_id,
+            "is_app_created": True,
             "photos": photos_data,
+            PHOTO_DERIVATIVES_FIELD: [],
+            CHILDREN_COUNT_FIELD: 0,
         }
         
         if asset_data:
             doc["asset_data"] = asset_data
         
-        await db.inventory_items.insert_one(doc)
+        try:
+            await db.inventory_items.insert_one(doc)
+        except DuplicateKeyError:
+            # a concurrent create of the same reference won the unique (root_id, reference) index
+            raise HTTPException(
+                400,
+                f"Já existe um item com a referência '{reference}' nesta árvore"
+            )
+        await bump_tree_version(db)
+        await increment_children_count(db.inventory_items, parent_id, 1)
+        await apply_stats_delta(db, [doc])
         
         return {
             "id": str(item_id),
@@ -172,51 +227,38 @@ class ItemRepository:
             "reference": reference,
             "checked": True,
             "checked_at": datetime.datetime.utcnow(),
-            "photos": await storage_s3_retrieve_objects_url(photos_data),
+            "photos": await presign_service.resolve(photos_data),
             "asset_data": asset_data,
             "path": path,
             "level": level
         }
     
 
-    async def destroy_cascade(self, db: AsyncIOMotorDatabase, object_id: ObjectId):
-        pipeline = [
-            {"$match": {"_id": object_id}},
-            {
-                "$graphLookup": {
-                    "from": "inventory_items",
-                    "startWith": "$_id",
-                    "connectFromField": "_id",
-                    "connectToField": "parent_id",
-                    "as": "descendants"
-                }
-            },
-            {
-                "$project": {
-                    "items": {
-                        "$concatArrays": [["$$ROOT"], "$descendants"]
-                    }
-                }
-            },
-            {"$unwind": "$items"},
-            {
-                "$project": {
-                    "_id": "$items._id",
-                    "reference": "$items.reference",
-                    "path": "$items.path",
-                    "node_type": "$items.node_type"
-                }
-            }
-        ]
-
-        cursor = db.inventory_items.aggregate(pipeline)
-        docs = await cursor.to_list(length=None)
-        ids_to_delete = [doc["_id"] for doc in docs]
-        result = await db.inventory_items.delete_many({
-            "_id": {"$in": ids_to_delete}
-        })
-
-        return result.deleted_count
+    async def move_items(self, db: AsyncIOMotorDatabase, moves: List[Tuple[ObjectId, ObjectId]]) -> List[dict]:
+        """Moves each (item_id, parent_id) with its subtree; counters are adjusted even when a later move fails."""
+        mover = ItemSubtreeMove(db)
+        moved = []
+        try:
+            for item_id, parent_id in moves:
+                item = await mover.move(item_id, parent_id)
+                moved.append({
+                    "id": str(item["_id"]),
+                    "parent_id": str(item["parent_id"]) if item.get("parent_id") else None,
+                    "reference": item.get("reference"),
+                    "path": item.get("path"),
+                    "level": item.get("level"),
+                })
+        finally:
+            await mover.commit()
+        return moved
+
+    async def destroy_cascade(self, db: AsyncIOMotorDatabase, object_id: ObjectId) -> Tuple[int, List[ObjectId]]:
+        """
+            Deletes the item and its descendants while the request waits, up to about
+            SUBTREE_DELETE_INLINE_LIMIT nodes. Returns the deleted count and the ids of
+            the items still to delete, themselves included.
+        """
+        return await ItemSubtreeDelete(db).delete(object_id)
 
     async def perform_save_item_photos(self, photos: List[UploadFile], base_item_photo_path: str) -> List[str]:
         if not photos:
@@ -230,6 +272,7 @@ class ItemRepository:
             return relative_save_path
 
         async_loop = asyncio.get_running_loop()
-        tasks = [async_loop.run_in_executor(None, upload_task, photo) for photo in photos]
-        results = await asyncio.gather(*tasks)
+        with timed("s3"):
+            tasks = [async_loop.run_in_executor(None, upload_task, photo) for photo in photos]
+            results = await asyncio.gather(*tasks)
         return [result for result in results if result]
\ No newline at end of file
@@ -1,29 +1,101 @@
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, status
 from app.core.decorators.auth_decorator import no_auth
 from app.modules.item.item_repository import ItemRepository
+from app.modules.item.item_schemas import BuildPhotoDerivativesRequest, MoveItemRequest, MoveItemsRequest
+from app.modules.task.task_choices import AsyncTaskType
+from app.modules.task.task_repository import AsyncTaskRepository
+from app.modules.task.task_schemas import AsyncTaskCreateResponse
+from app.shared.storage.s3.cleanup import drain_storage_cleanup
 
 router = APIRouter(prefix="/item", tags=["Item"])
 repository = ItemRepository()
 
 @router.post("")
-async def create(request: Request):
-    return await repository.check_item(request)
+async def create(request: Request, background_tasks: BackgroundTasks):
+    return await repository.check_item(request, background_tasks)
+
+@router.post(
+    "/photos/derivatives",
+    response_model=AsyncTaskCreateResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def build_photo_derivatives(
+    request: Request,
+    payload: BuildPhotoDerivativesRequest
+) -> AsyncTaskCreateResponse:
+    if payload.item_ids and not all(ObjectId.is_valid(item_id) for item_id in payload.item_ids):
+        raise HTTPException(status_code=400, detail="ObjectId inválido")
+
+    repository = AsyncTaskRepository(request.state.db)
+    return await repository.create(
+        task_type=AsyncTaskType.BUILD_PHOTO_DERIVATIVES,
+        params={"item_ids": payload.item_ids}
+    )
+
+@router.post(
+    "/ancestors/backfill",
+    response_model=AsyncTaskCreateResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def backfill_ancestors(request: Request) -> AsyncTaskCreateResponse:
+    repository = AsyncTaskRepository(request.state.db)
+    return await repository.create(
+        task_type=AsyncTaskType.BACKFILL_TREE_ANCESTORS,
+        params={}
+    )
+
+@router.post("/move")
+async def move_many(request: Request, payload: MoveItemsRequest):
+    """Moves are applied in order, counters are adjusted once for the whole batch."""
+    moves = [(move.item_id, move.parent_id) for move in payload.moves]
+    if not all(ObjectId.is_valid(item_id) and ObjectId.is_valid(parent_id) for item_id, parent_id in moves):
+        raise HTTPException(status_code=400, detail="ObjectId inválido")
+
+    return await repository.move_items(
+        request.state.db,
+        [(ObjectId(item_id), ObjectId(parent_id)) for item_id, parent_id in moves]
+    )
+
+@router.post("/{object_id}/move")
+async def move(object_id: str, request: Request, payload: MoveItemRequest):
+    if not ObjectId.is_valid(object_id) or not ObjectId.is_valid(payload.parent_id):
+        raise HTTPException(status_code=400, detail="ObjectId inválido")
+
+    moved = await repository.move_items(
+        request.state.db,
+        [(ObjectId(object_id), ObjectId(payload.parent_id))]
+    )
+    return moved[0]
 
 @router.delete("/{object_id}")
 async def destroy(
     object_id: str,
     request: Request,
+    background_tasks: BackgroundTasks,
 ):
     if not ObjectId.is_valid(object_id):
         raise HTTPException(status_code=400, detail="ObjectId inválido")
 
-    deleted_count = await repository.destroy_cascade(
+    deleted_count, pending_item_ids = await repository.destroy_cascade(
         request.state.db,
         ObjectId(object_id)
     )
 
+    if pending_item_ids:
+        # the rest of a large subtree, the item included, is deleted by the task, which also removes the photos
+        async_task = await AsyncTaskRepository(request.state.db).create(
+            task_type=AsyncTaskType.DELETE_ITEM_SUBTREE,
+            params={"item_ids": [str(item_id) for item_id in pending_item_ids]}
+        )
+        return {
+            "status": "in_progress",
+            "deleted_count": deleted_count,
+            "task_id": async_task.id
+        }
+
+    background_tasks.add_task(drain_storage_cleanup, request.state.db)
     return {
         "status": "ok",
         "deleted_count": deleted_count
-    }
\ No newline at end of file
+    }
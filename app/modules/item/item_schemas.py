@@ -0,0 +1,19 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class BuildPhotoDerivativesRequest(BaseModel):
+    item_ids: Optional[List[str]] = None
+
+
+class MoveItemRequest(BaseModel):
+    parent_id: str
+
+
+class ItemMove(BaseModel):
+    item_id: str
+    parent_id: str
+
+
+class MoveItemsRequest(BaseModel):
+    moves: List[ItemMove]
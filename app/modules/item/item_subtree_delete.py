@@ -0,0 +1,171 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.shared.database.ancestors import ancestors_ready, subtree_query
+from app.shared.database.children_count import increment_children_count
+from app.shared.database.inventory_stats import apply_stats_delta
+from app.shared.database.tree_snapshot import bump_tree_version
+from app.shared.files.images import PHOTO_DERIVATIVES_FIELD
+from app.shared.storage.s3.cleanup import queue_storage_cleanup
+from app.shared.storage.s3.presign import presign_service
+
+load_dotenv()
+
+SUBTREE_DELETE_BATCH_SIZE = int(os.getenv("SUBTREE_DELETE_BATCH_SIZE", "1000"))
+# nodes deleted while the request waits, larger subtrees continue as an async task
+SUBTREE_DELETE_INLINE_LIMIT = int(os.getenv("SUBTREE_DELETE_INLINE_LIMIT", "5000"))
+
+SUBTREE_DELETE_PROJECTION = {
+    "_id": 1,
+    "parent_id": 1,
+    "path": 1,
+    "node_type": 1,
+    "checked": 1,
+    "photos": 1,
+    PHOTO_DERIVATIVES_FIELD: 1,
+}
+
+
+def photo_storage_keys(doc: Dict[str, Any]) -> List[str]:
+    """Originals and derivatives stored for an item."""
+    keys = presign_service.keys_of(doc.get("photos"))
+    for entry in doc.get(PHOTO_DERIVATIVES_FIELD) or []:
+        keys.extend(value for value in entry.values() if value)
+    return list(dict.fromkeys(keys))
+
+
+class ItemSubtreeDelete:
+    """
+        Deletes a node and its descendants in SUBTREE_DELETE_BATCH_SIZE batches, the
+        node itself last, so whatever is left stays reachable from the ids of the
+        subtree roots, the whole state needed to resume.
+
+        Once the tenant has `ancestors`, batches are read from the ancestors index.
+        Otherwise the ids of the subtree are read level by level over the parent_id
+        index and the levels are deleted from the deepest up; a walk that goes past
+        the limit stops and leaves the whole subtree to the caller. Counters are
+        adjusted per batch, the tree version is bumped once per call and the photo
+        keys are queued in `storage_cleanup` for batched DeleteObjects.
+    """
+
+    def __init__(self, database: AsyncIOMotorDatabase, batch_size: int = SUBTREE_DELETE_BATCH_SIZE):
+        self.db = database
+        self._collection = self.db["inventory_items"]
+        self.batch_size = batch_size
+        self.photos_queued = 0
+
+    async def _delete_documents(self, docs: List[Dict[str, Any]]) -> int:
+        if not docs:
+            return 0
+
+        # keys are queued first, a crash afterwards leaves objects to delete, never orphans
+        self.photos_queued += await queue_storage_cleanup(
+            self.db, [key for doc in docs for key in photo_storage_keys(doc)]
+        )
+        result = await self._collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+        await apply_stats_delta(self.db, docs, -1)
+        return result.deleted_count
+
+    async def delete(self, object_id: ObjectId, limit: Optional[int] = SUBTREE_DELETE_INLINE_LIMIT) -> Tuple[int, List[ObjectId]]:
+        """
+            Deletes `object_id` and its descendants, stopping after about `limit` nodes.
+            Returns the deleted count and, when the subtree is not gone, `[object_id]`:
+            the node is kept until a later call deletes the rest of it.
+        """
+        root = await self._collection.find_one({"_id": object_id}, SUBTREE_DELETE_PROJECTION)
+        if not root:
+            return 0, []
+
+        deleted, pending = await self._delete_descendants([object_id], limit)
+
+        if not pending and await self._delete_documents([root]):
+            deleted += 1
+            await increment_children_count(self._collection, root.get("parent_id"), -1)
+
+        if deleted:
+            await bump_tree_version(self.db)
+        return deleted, pending
+
+    async def delete_descendants(
+        self,
+        parent_ids: List[ObjectId],
+        limit: Optional[int] = None
+    ) -> Tuple[int, List[ObjectId]]:
+        """
+            Deletes every descendant of `parent_ids`. With `limit`, stops after the batch
+            that reaches it and returns the ids whose descendants remain.
+        """
+        deleted, pending = await self._delete_descendants(parent_ids, limit)
+        if deleted:
+            await bump_tree_version(self.db)
+        return deleted, pending
+
+    async def _delete_descendants(
+        self,
+        parent_ids: List[ObjectId],
+        limit: Optional[int] = None
+    ) -> Tuple[int, List[ObjectId]]:
+        if await ancestors_ready(self.db):
+            return await self._delete_by_ancestors(parent_ids, limit)
+
+        levels = await self._subtree_levels(parent_ids, limit)
+        if levels is None:
+            return 0, list(parent_ids)
+
+        deleted = 0
+        for level in reversed(levels):
+            for start in range(0, len(level), self.batch_size):
+                docs = await self._collection.find(
+                    {"_id": {"$in": level[start:start + self.batch_size]}},
+                    SUBTREE_DELETE_PROJECTION
+                ).to_list(None)
+                deleted += await self._delete_documents(docs)
+
+        return deleted, []
+
+    async def _subtree_levels(self, parent_ids: List[ObjectId], limit: Optional[int] = None) -> Optional[List[List[ObjectId]]]:
+        """
+            Ids of the descendants of `parent_ids`, one list per level, the children first.
+            None once more than `limit` ids are read, the walk stops there.
+        """
+        levels = []
+        found = 0
+        parents = list(parent_ids)
+
+        while parents:
+            children = []
+            for start in range(0, len(parents), self.batch_size):
+                async for doc in self._collection.find(
+                    {"parent_id": {"$in": parents[start:start + self.batch_size]}},
+                    {"_id": 1}
+                ).batch_size(self.batch_size):
+                    children.append(doc["_id"])
+                    found += 1
+                    if limit is not None and found > limit:
+                        return None
+
+            if children:
+                levels.append(children)
+            parents = children
+
+        return levels
+
+    async def _delete_by_ancestors(
+        self,
+        parent_ids: List[ObjectId],
+        limit: Optional[int] = None
+    ) -> Tuple[int, List[ObjectId]]:
+        deleted = 0
+        query = subtree_query(parent_ids, include_roots=False)
+
+        while limit is None or deleted < limit:
+            docs = await self._collection.find(query, SUBTREE_DELETE_PROJECTION).limit(self.batch_size).to_list(None)
+            if not docs:
+                return deleted, []
+            deleted += await self._delete_documents(docs)
+
+        return deleted, list(parent_ids)
@@ -0,0 +1,292 @@
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+
+from bson import ObjectId
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from app.shared.database.ancestors import (
+    ANCESTORS_FIELD,
+    ROOT_ID_FIELD,
+    ancestors_ready,
+    child_ancestors,
+    child_root_id,
+    root_ids_ready,
+    subtree_query,
+)
+from app.shared.database.children_count import refresh_children_count
+from app.shared.database.tree_snapshot import bump_tree_version
+from app.shared.database.inventory_stats import (
+    INVENTORY_STATS_COLLECTION,
+    LOCATION_SCOPE,
+    STATS_WRITE_BATCH_SIZE,
+    InventoryStatsDelta,
+)
+
+MOVE_PROJECTION = {"_id": 1, "parent_id": 1, "reference": 1, "path": 1, "level": 1, "node_type": 1, ANCESTORS_FIELD: 1, ROOT_ID_FIELD: 1}
+
+
+def subtree_path_query(path: List[str], include_root: bool = False) -> Dict[str, Any]:
+    """
+        Nodes whose path starts with `path`. The equality on the last reference is served
+        by the multikey `path` index, the positional conditions filter what it returns.
+    """
+    query: Dict[str, Any] = {"path": path[-1]}
+    query.update({f"path.{index}": reference for index, reference in enumerate(path)})
+    if not include_root:
+        query[f"path.{len(path)}"] = {"$exists": True}
+    return query
+
+
+def rewrite_path_pipeline(
+    old_length: int,
+    new_prefix: List[str],
+    level_delta: int,
+    item_id: Optional[ObjectId] = None,
+    new_ancestors: Optional[List[ObjectId]] = None,
+    new_root_id: Optional[ObjectId] = None
+) -> List[Dict[str, Any]]:
+    """
+        Update pipeline replacing the first `old_length` path entries with `new_prefix`,
+        taken as literals so a reference starting with `$` is not read as a field path.
+
+        With `item_id`, a node whose `ancestors` hold the moved item is rewritten from
+        the item's position in them instead: the entries above it are replaced by
+        `new_ancestors` and the path up to it by `new_prefix`, so applying the pipeline
+        twice gives the same node. A node whose ancestors do not hold it yet (not
+        backfilled) keeps them and relies on the `old_length` prefix. `root_id` becomes
+        `new_root_id`, or is removed for the backfill to restore when it is unknown.
+    """
+    prefix = [{"$literal": reference} for reference in new_prefix]
+
+    def path_from(start: Any) -> Dict[str, Any]:
+        return {
+            "$concatArrays": [
+                prefix,
+                {"$slice": ["$path", start, {"$max": [{"$subtract": [{"$size": "$path"}, start]}, 1]}]}
+            ]
+        }
+
+    fields: Dict[str, Any] = {
+        "path": path_from(old_length),
+        "level": {"$add": ["$level", level_delta]},
+    }
+    if item_id is not None:
+        ancestors = {"$ifNull": [f"${ANCESTORS_FIELD}", []]}
+        position = {"$indexOfArray": [ancestors, item_id]}
+        holds_item = {"$gte": [position, 0]}
+        fields["path"] = {"$cond": [holds_item, path_from({"$add": [position, 1]}), fields["path"]]}
+        fields["level"] = {
+            "$cond": [
+                holds_item,
+                {"$add": ["$level", {"$subtract": [len(new_ancestors or []), position]}]},
+                fields["level"]
+            ]
+        }
+        fields[ANCESTORS_FIELD] = {
+            "$cond": [
+                holds_item,
+                {
+                    "$concatArrays": [
+                        new_ancestors or [],
+                        {"$slice": [ancestors, position, {"$max": [{"$subtract": [{"$size": ancestors}, position]}, 1]}]}
+                    ]
+                },
+                f"${ANCESTORS_FIELD}"
+            ]
+        }
+        fields[ROOT_ID_FIELD] = new_root_id if new_root_id is not None else "$$REMOVE"
+    return [{"$set": fields}]
+
+
+class ItemSubtreeMove:
+    """
+        Moves nodes to a new parent together with their subtrees.
+
+        Descendants are rewritten by one update_many with an update pipeline that swaps
+        the moved path and `ancestors` prefixes and shifts `level`, so a move costs a fixed
+        number of round trips whatever the subtree size. Counters are adjusted by `commit`, once for every
+        move made through the instance.
+
+        There is no transaction: the descendants are rewritten first and the moved item
+        last, its new `parent_id` marking the move as done. The rewrite is idempotent,
+        descendants already rewritten either hold the item in `ancestors` or no longer
+        match the old path, so a move interrupted halfway is completed by repeating it.
+    """
+
+    def __init__(self, database: AsyncIOMotorDatabase):
+        self.db = database
+        self._collection = self.db["inventory_items"]
+        self._stats = InventoryStatsDelta()
+        self._parents: Set[ObjectId] = set()
+        self._moved_subtrees: List[Dict[str, Any]] = []
+
+    async def _ensure_not_descendant(self, item: Dict[str, Any], new_parent: Dict[str, Any]) -> None:
+        if await ancestors_ready(self.db):
+            if item["_id"] == new_parent["_id"] or item["_id"] in new_parent.get(ANCESTORS_FIELD, []):
+                raise HTTPException(400, "Item não pode ser movido para dentro de si mesmo")
+            return
+
+        # walks up from the new parent, trees are a few levels deep
+        current = new_parent
+        while current is not None:
+            if current["_id"] == item["_id"]:
+                raise HTTPException(400, "Item não pode ser movido para dentro de si mesmo")
+            if current.get("parent_id") is None:
+                return
+            current = await self._collection.find_one({"_id": current["parent_id"]}, {"parent_id": 1})
+
+    async def _path_shared(self, path: List[str], item_id: ObjectId) -> bool:
+        """True when a node other than `item_id` has exactly `path` (same-named siblings in older data)."""
+        namesake = await self._collection.find_one(
+            {**subtree_path_query(path, include_root=True), f"path.{len(path)}": {"$exists": False}, "_id": {"$ne": item_id}},
+            {"_id": 1}
+        )
+        return namesake is not None
+
+    async def _rewrite_descendants(
+        self,
+        item: Dict[str, Any],
+        new_path: List[str],
+        level_delta: int,
+        new_ancestors: List[ObjectId],
+        new_root_id: Optional[ObjectId]
+    ) -> Dict[str, Any]:
+        """Rewrites the descendants of `item` and returns the query selecting its subtree once moved."""
+        old_path = item["path"]
+        pipeline = rewrite_path_pipeline(len(old_path), new_path, level_delta, item["_id"], new_ancestors, new_root_id)
+
+        if await ancestors_ready(self.db):
+            await self._collection.update_many({ANCESTORS_FIELD: item["_id"]}, pipeline)
+            return subtree_query([item["_id"]])
+
+        # a namesake on either path shares the prefix, then the subtree is walked over
+        # parent_id instead and selected by the ids the walk found
+        if not await self._path_shared(old_path, item["_id"]) and not await self._path_shared(new_path, item["_id"]):
+            await self._collection.update_many(subtree_path_query(old_path), pipeline)
+            return subtree_path_query(new_path, include_root=True)
+
+        old_prefix = {f"path.{index}": reference for index, reference in enumerate(old_path)}
+        subtree = [item["_id"]]
+        pending = deque([item["_id"]])
+        while pending:
+            parents = [pending.popleft() for _ in range(min(STATS_WRITE_BATCH_SIZE, len(pending)))]
+            children = [
+                child["_id"]
+                for child in await self._collection.find({"parent_id": {"$in": parents}}, {"_id": 1}).to_list(None)
+            ]
+            if children:
+                # children rewritten by an interrupted move no longer hold the old path
+                await self._collection.update_many({"_id": {"$in": children}, **old_prefix}, pipeline)
+                pending.extend(children)
+                subtree.extend(children)
+        return {"_id": {"$in": subtree}}
+
+    async def _ensure_no_reference_clash(self, item: Dict[str, Any], new_root_id: Optional[ObjectId]) -> None:
+        """
+            Nodes created by the app keep their reference unique within a tree; a subtree
+            moving to another tree must not bring one the target tree already has, which
+            the unique index would otherwise reject halfway through the rewrite.
+        """
+        if new_root_id is None or item.get(ROOT_ID_FIELD) == new_root_id or not await root_ids_ready(self.db):
+            return
+
+        references = await self._collection.distinct(
+            "reference",
+            {**subtree_query([item["_id"]]), "is_app_created": True}
+        )
+        if not references:
+            return
+
+        clash = await self._collection.find_one(
+            {ROOT_ID_FIELD: new_root_id, "reference": {"$in": references}, "is_app_created": True},
+            {"reference": 1}
+        )
+        if clash:
+            raise HTTPException(400, f"Já existe um item com a referência '{clash['reference']}' nesta árvore")
+
+    async def _subtree_asset_counts(self, subtree: Dict[str, Any]) -> Dict[str, int]:
+        totals = await self._collection.aggregate([
+            {"$match": {**subtree, "node_type": "ASSET"}},
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "checked": {"$sum": {"$cond": [{"$eq": ["$checked", True]}, 1, 0]}},
+            }},
+        ]).to_list(None)
+        return totals[0] if totals else {"total": 0, "checked": 0}
+
+    async def move(self, item_id: ObjectId, new_parent_id: ObjectId) -> Dict[str, Any]:
+        item = await self._collection.find_one({"_id": item_id}, MOVE_PROJECTION)
+        if not item:
+            raise HTTPException(404, "Item não encontrado")
+
+        if item.get("parent_id") == new_parent_id:
+            return item
+
+        new_parent = await self._collection.find_one({"_id": new_parent_id}, MOVE_PROJECTION)
+        if not new_parent:
+            raise HTTPException(400, "Item pai não encontrado")
+        await self._ensure_not_descendant(item, new_parent)
+        if await self._collection.find_one({"parent_id": new_parent_id, "reference": item["reference"]}, {"_id": 1}):
+            raise HTTPException(400, f"Já existe um item com a referência '{item['reference']}' neste local")
+
+        old_path = item.get("path") or [item["reference"]]
+        new_path = (new_parent.get("path") or []) + [item["reference"]]
+        new_level = new_parent.get("level", 0) + 1
+        level_delta = new_level - item.get("level", len(old_path) - 1)
+
+        new_root_id = child_root_id(new_parent)
+        await self._ensure_no_reference_clash(item, new_root_id)
+
+        new_ancestors = child_ancestors(new_parent)
+        subtree = await self._rewrite_descendants({**item, "path": old_path}, new_path, level_delta, new_ancestors, new_root_id)
+        # last, until the item holds its new parent repeating the move completes it
+        update: Dict[str, Any] = {
+            "$set": {"parent_id": new_parent_id, "path": new_path, "level": new_level, ANCESTORS_FIELD: new_ancestors}
+        }
+        if new_root_id is not None:
+            update["$set"][ROOT_ID_FIELD] = new_root_id
+        else:
+            update["$unset"] = {ROOT_ID_FIELD: ""}
+        await self._collection.update_one({"_id": item_id}, update)
+
+        counts = await self._subtree_asset_counts(subtree)
+        self._stats.move_subtree(old_path, new_path, counts["total"], counts["checked"])
+        self._parents.update([item.get("parent_id"), new_parent_id])
+        self._moved_subtrees.append(subtree)
+
+        return {
+            **item,
+            "parent_id": new_parent_id,
+            "path": new_path,
+            "level": new_level,
+            ANCESTORS_FIELD: new_ancestors,
+            ROOT_ID_FIELD: new_root_id,
+        }
+
+    async def commit(self) -> None:
+        """Recounts the children of every touched parent and moves the dashboard counters."""
+        if self._parents:
+            await bump_tree_version(self.db)
+        await refresh_children_count(self._collection, self._parents)
+
+        # location counters are matched by path, the moved ones follow their nodes
+        operations = []
+        for subtree in self._moved_subtrees:
+            async for location in self._collection.find(
+                {**subtree, "node_type": "LOCATION"},
+                {"parent_id": 1, "path": 1, "level": 1}
+            ):
+                operations.append(UpdateOne(
+                    {"_id": location["_id"], "scope": LOCATION_SCOPE},
+                    {"$set": {"parent_id": location.get("parent_id"), "path": location["path"], "level": location.get("level")}}
+                ))
+        for start in range(0, len(operations), STATS_WRITE_BATCH_SIZE):
+            await self.db[INVENTORY_STATS_COLLECTION].bulk_write(operations[start:start + STATS_WRITE_BATCH_SIZE], ordered=False)
+
+        await self._stats.apply(self.db)
+        self._stats = InventoryStatsDelta()
+        self._parents = set()
+        self._moved_subtrees = []
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+from app.core.decorators.auth_decorator import no_auth
+from app.core.decorators.tenant_decorator import no_tenant_required
+from app.shared.observability.metrics import METRICS_CONTENT_TYPE, render_metrics
+
+router = APIRouter(tags=["Metrics"])
+
+@no_tenant_required
+@no_auth
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
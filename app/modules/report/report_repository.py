@@ -19,13 +19,16 @@ from pathlib import Path
 
 from colorsys import hls_to_rgb
 from app.modules.report.report_choices import HierarchyStandChoice, ImageExportModeChoice
-from app.shared.database.pipelines.inventory_items import InventoryItemsPipelines
+from app.shared.database.ancestors import ancestors_ready, descendant_nodes_stages, subtree_query
+from app.shared.database.tree_snapshot import get_tree_snapshot
 
 from app.shared.stream.image_zipstream import ImageStreamingZipWriter
 from app.shared.storage.s3.multi_part_uploader import MultipartUploader
 from app.shared.global_functions.download_storage_objects import DownloadStorageObjecs
 import uuid
 from app.shared.files.files_type_choices import FileTypeChoices
+from app.shared.files.images import PHOTO_DERIVATIVES_FIELD, photo_keys_for_size
+from app.shared.files.photo_size_choices import PhotoSizeChoice
 
 
 from app.modules.report.report_schemas import (
@@ -34,6 +37,10 @@ from app.modules.report.report_schemas import (
     AnalyticalReportRawDataDTO
 )
 
+# ids per $in query when reading the nodes selected through the tree snapshot
+REPORT_FETCH_BATCH_SIZE = 1000
+EXPORT_IMAGES_BATCH_SIZE = 200
+
 
 class AssetInventoryResponsibilityReportService:
     def __init__(self, database: AsyncIOMotorDatabase):
@@ -41,10 +48,11 @@ class AssetInventoryResponsibilityReportService:
 
     async def create_inventory_responsibility_agreement_report(
         self,
-        parent_location_ids: Optional[List[str]]
+        parent_location_ids: Optional[List[str]],
+        photo_size: PhotoSizeChoice = PhotoSizeChoice.PREVIEW
     ) -> UploadFile:
 
-        data = await self._build_data(parent_location_ids)
+        data = await self._build_data(parent_location_ids, PhotoSizeChoice(photo_size))
         env = Environment(
             loader=FileSystemLoader("app/template"),
             autoescape=True
@@ -68,10 +76,12 @@ class AssetInventoryResponsibilityReportService:
 
     async def _build_data(
         self,
-        parent_location_ids: Optional[List[str]]
+        parent_location_ids: Optional[List[str]],
+        photo_size: PhotoSizeChoice = PhotoSizeChoice.PREVIEW
     ) -> List[InventoryResposabilityAgreementLocationDTO]:
 
-        locations_ids = await self._get_all_descendant_locations(parent_location_ids)
+        materialized = await ancestors_ready(self.db)
+        locations_ids = await self._get_all_descendant_locations(parent_location_ids, materialized)
         item_docs = await self.db.inventory_items.aggregate([
             {
                 "$match": {
@@ -79,16 +89,11 @@ class AssetInventoryResponsibilityReportService:
                     "node_type": {"$ne": "LOCATION"}
                 }
             },
-            {
-                "$graphLookup": {
-                    "from": "inventory_items",
-                    "startWith": "$_id",
-                    "connectFromField": "_id",
-                    "connectToField": "parent_id",
-                    "as": "descendants",
-                    "restrictSearchWithMatch": {"node_type": {"$ne": "LOCATION"}}
-                }
-            },
+            *descendant_nodes_stages(
+                "descendants",
+                restrict_search={"node_type": {"$ne": "LOCATION"}},
+                materialized=materialized
+            ),
             {"$addFields": {"root_loc": "$parent_id"}},
             {"$project": {"docs": {"$concatArrays": [["$$ROOT"], "$descendants"]}, "root_loc": 1}},
             {"$unwind": "$docs"},
@@ -133,7 +138,8 @@ class AssetInventoryResponsibilityReportService:
                 else 1
             )
 
-            photo_key = item_doc.get("photos")[0] if item_doc.get("photos", None) else None
+            photo_keys = photo_keys_for_size(item_doc, photo_size)
+            photo_key = photo_keys[0] if photo_keys else None
             location.items.append(
                 InventoryResposabilityAgreementItemDTO(
                     reference=item_doc.get("reference"),
@@ -188,7 +194,8 @@ class AssetInventoryResponsibilityReportService:
 
     async def _get_all_descendant_locations(
         self,
-        parent_location_ids: Optional[List[str]]
+        parent_location_ids: Optional[List[str]],
+        materialized: bool = False
     ) -> List[ObjectId]:
 
         if not parent_location_ids:
@@ -207,6 +214,13 @@ class AssetInventoryResponsibilityReportService:
                 )
             parent_location_object_ids.append(ObjectId(parent_location_id))
 
+        if materialized:
+            docs = await self.db.inventory_items.find(
+                {**subtree_query(parent_location_object_ids, include_roots=False), "node_type": "LOCATION"},
+                {"_id": 1}
+            ).to_list(None)
+            return list(set([doc["_id"] for doc in docs] + parent_location_object_ids))
+
         docs = await self.db.inventory_items.aggregate([
             {"$match": {"_id": {"$in": parent_location_object_ids}}},
             {
@@ -381,186 +395,46 @@ class AnalyticalReportService:
         parent_ids: Optional[List[str]]
     ) -> List[AnalyticalReportRawDataDTO]:
 
-        docs = []
         raw_fields = {
             field.name: 1
             for field in fields(AnalyticalReportRawDataDTO)
         }
 
         parent_object_ids = []
-
-        if not parent_ids:
+        for parent_id in parent_ids or []:
+            if not ObjectId.is_valid(parent_id):
+                raise ValueError(
+                    f"Invalid parent_id sent '{parent_id}', can not be tranformed to ObjectId"
+                )
+            parent_object_ids.append(ObjectId(parent_id))
+
+        # ancestors and subtrees come from the tree snapshot, Mongo only serves the assets
+        snapshot = await get_tree_snapshot(self.db)
+        if parent_object_ids:
+            asset_ids = snapshot.descendants(parent_object_ids, "ASSET", include_self=True)
+            docs = []
+            for start in range(0, len(asset_ids), REPORT_FETCH_BATCH_SIZE):
+                docs += await self.db.inventory_items.find(
+                    {"_id": {"$in": asset_ids[start:start + REPORT_FETCH_BATCH_SIZE]}},
+                    raw_fields
+                ).to_list(None)
+        else:
             docs = await self.db.inventory_items.find(
                 {"node_type": "ASSET"},
                 raw_fields
             ).to_list(None)
-            parent_object_ids = [doc["_id"] for doc in docs]
-        else:
-            for parent_id in parent_ids:
-                if not ObjectId.is_valid(parent_id):
-                    raise ValueError(
-                        f"Invalid parent_id sent '{parent_id}', can not be tranformed to ObjectId"
-                    )
-                parent_object_ids.append(ObjectId(parent_id))
-
-        docs = await self.db.inventory_items.aggregate(
-        [
-            {
-                "$match": {
-                    "_id": { "$in": parent_object_ids }
-                }
-            },
-            {
-                "$graphLookup": {
-                    "from": "inventory_items",
-                    "startWith": "$_id",
-                    "connectFromField": "_id",
-                    "connectToField": "parent_id",
-                    "as": "descendants"
-                }
-            },
-            {
-                "$project": {
-                    "items": {
-                        "$concatArrays": [
-                            ["$$ROOT"],
-                            "$descendants"
-                        ]
-                    }
-                }
-            },
-            { "$unwind": "$items" },
-            { "$replaceRoot": { "newRoot": "$items" } },
-            {
-                "$group": {
-                    "_id": "$_id",
-                    "doc": { "$first": "$$ROOT" }
-                }
-            },
-            {
-                "$replaceRoot": {
-                    "newRoot": "$doc"
-                }
-            },
-            {
-                "$match": {
-                    "node_type": "ASSET"
-                }
-            },
-            {
-                "$graphLookup": {
-                    "from": "inventory_items",
-                    "startWith": "$parent_id",
-                    "connectFromField": "parent_id",
-                    "connectToField": "_id",
-                    "as": "ancestors",
-                    "depthField": "depth"
-                }
-            },
-            {
-                "$addFields": {
-                    "ancestors": {
-                        "$sortArray": {
-                            "input": "$ancestors",
-                            "sortBy": { "depth": -1 }
-                        }
-                    }
-                }
-            },
-            {
-                "$addFields": {
-                    "location_path": {
-                        "$cond": [
-                            { "$eq": ["$node_type", "LOCATION"] },
-                            {
-                                "$concatArrays": [
-                                    {
-                                        "$map": {
-                                            "input": {
-                                                "$filter": {
-                                                    "input": "$ancestors",
-                                                    "as": "a",
-                                                    "cond": { "$eq": ["$$a.node_type", "LOCATION"] }
-                                                }
-                                            },
-                                            "as": "loc",
-                                            "in": "$$loc.reference"
-                                        }
-                                    },
-                                    ["$reference"]
-                                ]
-                            },
-                            {
-                                "$map": {
-                                    "input": {
-                                        "$filter": {
-                                            "input": "$ancestors",
-                                            "as": "a",
-                                            "cond": { "$eq": ["$$a.node_type", "LOCATION"] }
-                                        }
-                                    },
-                                    "as": "loc",
-                                    "in": "$$loc.reference"
-                                }
-                            }
-                        ]
-                    },
-                    "hierarchy_path": {
-                        "$concatArrays": [
-                            {
-                                "$map": {
-                                    "input": {
-                                        "$filter": {
-                                            "input": "$ancestors",
-                                            "as": "a",
-                                            "cond": { "$eq": ["$$a.node_type", "ASSET"] }
-                                        }
-                                    },
-                                    "as": "asset",
-                                    "in": "$$asset.reference"
-                                }
-                            },
-                            ["$reference"]
-                        ]
-                    }
-                }
-            },
-            {
-                "$addFields": {
-                    "level": {
-                        "$subtract": [
-                            {
-                                "$add": [
-                                    "$level",
-                                    1
-                                ]
-                            },
-                            { "$size": "$location_path" }
-                        ]
-                    }
-                }
-            },
-            {
-                "$addFields": {
-                    "hierarchy_stand": {
-                        "$cond": [
-                            { "$eq": ["$level", 1] },
-                            HierarchyStandChoice.PARENT.value,
-                            HierarchyStandChoice.CHILD.value
-                        ]
-                    }
-                }
-            },
-            {
-                "$project": raw_fields
-            },
-            {
-                "$sort": {
-                    "level": 1
-                }
-            }
-        ]
-        ).to_list(None)
+
+        for doc in docs:
+            doc["location_path"] = snapshot.location_path(doc["_id"])
+            doc["hierarchy_path"] = snapshot.ancestor_references(doc["_id"], "ASSET") + [doc.get("reference")]
+            doc["level"] = doc.get("level", 0) + 1 - len(doc["location_path"])
+            doc["hierarchy_stand"] = (
+                HierarchyStandChoice.PARENT.value
+                if doc["level"] == 1
+                else HierarchyStandChoice.CHILD.value
+            )
+
+        docs.sort(key=lambda doc: doc["level"])
 
         dto_list: List[AnalyticalReportRawDataDTO] = [
             AnalyticalReportRawDataDTO(**doc) for doc in docs
@@ -571,8 +445,15 @@ class AnalyticalReportService:
 class ImagesExportService:
     def __init__(self, database: AsyncIOMotorDatabase):
         self.db = database
+        self.photo_size = PhotoSizeChoice.ORIGINAL
 
-    async def export_images(self, parent_id: Optional[str], mode: ImageExportModeChoice):
+    async def export_images(
+        self,
+        parent_id: Optional[str],
+        mode: ImageExportModeChoice,
+        photo_size: PhotoSizeChoice = PhotoSizeChoice.ORIGINAL
+    ):
+        self.photo_size = PhotoSizeChoice(photo_size)
         storage_key = None
         if mode == ImageExportModeChoice.EXPORT_ALL:
             storage_key = await self.export_all_images()
@@ -591,22 +472,11 @@ class ImagesExportService:
         return storage_key
 
     async def export_all_images(self):
-        pipeline_service = InventoryItemsPipelines(self.db)
-        all_location_docs = await pipeline_service.get_all_location_with_parents_locations(
-            projection_fields={"_id": 1, "parent_locations": 1}
-        )
-
-        locations_map: Dict[str, str] = {
-            str(loc["_id"]): " -> ".join(loc.get("parent_locations", ["POSICAO_SEM_PATH"]))
-            for loc in all_location_docs
-        }
-
-        items_cursor = await pipeline_service.get_all_items_by_locations(
-            locations_ids=[loc["_id"] for loc in all_location_docs],
-            projection_fields={"root_loc": 1, "reference": 1, "photos": 1},
-            batch_size=200,
-            as_list=False
-        )
+        snapshot = await get_tree_snapshot(self.db)
+        items_cursor = self.db.inventory_items.find(
+            {"node_type": {"$ne": "LOCATION"}, "photos": {"$exists": True, "$ne": []}},
+            {"reference": 1, "photos": 1, PHOTO_DERIVATIVES_FIELD: 1}
+        ).batch_size(EXPORT_IMAGES_BATCH_SIZE)
 
         storage_key = generate_s3_temporary_storage_object_key(FileTypeChoices.ZIP)
         uploader = MultipartUploader(
@@ -616,20 +486,18 @@ class ImagesExportService:
         zip_writer = ImageStreamingZipWriter(uploader)
 
         async for item in items_cursor:
-            root_loc = str(item["root_loc"])
-            folder = locations_map.get(root_loc)
-
-            if not folder:
+            locations_path = snapshot.location_path(item["_id"])
+            if not locations_path:
                 continue
 
-            photos_keys = item.get("photos") or []
+            photos_keys = photo_keys_for_size(item, self.photo_size)
             if not photos_keys:
                 continue
 
             photos_base64 = await DownloadStorageObjecs().download_by_path(photos_keys)
 
             await zip_writer.process(
-                folder=folder,
+                folder=" -> ".join(locations_path),
                 reference=item.get("reference", "SEM_REFERENCIA"),
                 images_base64=photos_base64
             )
@@ -654,15 +522,17 @@ class ImagesExportService:
         )
 
         asset_object_id = ObjectId(asset_id)
-        pipeline_service = InventoryItemsPipelines(self.db)
-        item = await pipeline_service.get_asset_with_images_and_parent_locations(
-            asset_id=asset_object_id,
-            projection_fields={"locations": "$locations.reference", "reference": 1, "photos": 1}
+        item = await self.db.inventory_items.find_one(
+            {"_id": asset_object_id, "node_type": "ASSET", "photos": {"$exists": True, "$ne": []}},
+            {"reference": 1, "photos": 1, PHOTO_DERIVATIVES_FIELD: 1}
         )
 
         if item:
-            location_path = (" -> ").join(item.get("locations", ["CAMINHO_LOCALIZACAO_NAO_ENCONTRADO"]))
-            photos_keys = item.get("photos") or []
+            snapshot = await get_tree_snapshot(self.db)
+            # nearest location first, as this folder has always been named
+            locations = snapshot.location_path(asset_object_id)[::-1]
+            location_path = (" -> ").join(locations or ["CAMINHO_LOCALIZACAO_NAO_ENCONTRADO"])
+            photos_keys = photo_keys_for_size(item, self.photo_size)
             photos_base64 = await DownloadStorageObjecs().download_by_path(photos_keys)
 
             await zip_writer.process(
@@ -690,23 +560,16 @@ class ImagesExportService:
             uploader
         )
 
-        pipeline_service = InventoryItemsPipelines(self.db)
-        parent_object_id = ObjectId(parent_id)
+        snapshot = await get_tree_snapshot(self.db)
+        asset_ids = snapshot.descendants([ObjectId(parent_id)], "ASSET", include_self=True)
 
-        items_cursor = await pipeline_service.get_asset_tree_with_images_and_parent_locations(
-            parent_id=parent_object_id,
-            projection_fields={"parent_locations": "$parent_locations.reference", "reference": 1, "photos": 1},
-            batch_size=200,
-            as_list=False
-        )
-
-        async for item in items_cursor:
-            locations_path = item.get("parent_locations")
+        async for item in self._iter_items_with_photos(asset_ids):
+            locations_path = snapshot.location_path(item["_id"])
             if not locations_path:
                 locations_path = ["CAMINHO_LOCALIZACAO_NAO_ENCONTRADO"]
 
             folder = " -> ".join(locations_path)
-            photos_keys = item.get("photos", [])
+            photos_keys = photo_keys_for_size(item, self.photo_size)
             photos_base64 = await DownloadStorageObjecs().download_by_path(photos_keys)
 
             await zip_writer.process(
@@ -716,4 +579,12 @@ class ImagesExportService:
             )
 
         await zip_writer.stream_to_cloud()
-        return storage_key
\ No newline at end of file
+        return storage_key
+
+    async def _iter_items_with_photos(self, item_ids: List[ObjectId]):
+        for start in range(0, len(item_ids), EXPORT_IMAGES_BATCH_SIZE):
+            async for item in self.db.inventory_items.find(
+                {"_id": {"$in": item_ids[start:start + EXPORT_IMAGES_BATCH_SIZE]}, "photos": {"$exists": True, "$ne": []}},
+                {"reference": 1, "photos": 1, PHOTO_DERIVATIVES_FIELD: 1}
+            ):
+                yield item
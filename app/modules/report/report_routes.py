@@ -1,11 +1,22 @@
 from bson import ObjectId
-from fastapi import APIRouter, Query, Request
+from fastapi import APIRouter, HTTPException, Query, Request
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.modules.task.task_choices import AsyncTaskResultType
 from app.modules.task.task_schemas import AsyncTaskCreateResponse
 from app.modules.task.task_repository import AsyncTaskRepository
 from fastapi import BackgroundTasks, status
 from app.modules.task.task_choices import AsyncTaskType
+from app.shared.database.children_count import children_total
+from app.shared.database.inventory_stats import (
+    INVENTORY_STATS_COLLECTION,
+    LOCATION_SCOPE,
+    TENANT_STATS_ID,
+    claim_first_reconciliation,
+    claim_reconciliation,
+    live_inventory_stats,
+    stats_counts,
+)
+from app.shared.database.pagination import keyset_page
 
 # schemas
 from app.modules.report.report_schemas import (
@@ -20,8 +31,9 @@ router = APIRouter(prefix="/report", tags=["Report"])
 async def get_items(
     request: Request,
     parent_id: str | None = Query(default=None, description="ID do item pai. Vazio para itens raiz."),
-    skip: int = Query(default=0, ge=0),
-    limit: int = Query(default=20, ge=1, le=100)
+    skip: int = Query(default=0, ge=0, description="Deslocamento, ignorado quando `cursor` é informado."),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = Query(default=None, description="Token `next` retornado pela página anterior.")
 ):
     db = request.state.db
 
@@ -29,15 +41,18 @@ async def get_items(
     
     if parent_id:
         query = {"parent_id": ObjectId(parent_id)}
-    
-    cursor = db.inventory_items.find(
-        query, {}
-    ).sort("reference", 1).skip(skip).limit(limit)
+
+    try:
+        docs, next_cursor = await keyset_page(
+            db.inventory_items, query, limit, cursor=cursor, skip=skip
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
     
     items = []
-    total_count = await db.inventory_items.count_documents(query)
+    total_count = await children_total(db.inventory_items, query["parent_id"])
     
-    async for doc in cursor:
+    for doc in docs:
         doc["_id"] = str(doc["_id"])
         if doc.get("parent_id"):
             doc["parent_id"] = str(doc["parent_id"])
@@ -47,31 +62,79 @@ async def get_items(
     return {
         "items": items,
         "total": total_count,
-        "skip": skip,
+        "skip": 0 if cursor else skip,
         "limit": limit,
-        "has_more": (skip + limit) < total_count
+        "has_more": next_cursor is not None,
+        "next": next_cursor
     }
 
 @router.get("/dashboard")
-async def dashboard_session(request: Request):
+async def dashboard_session(
+    request: Request,
+    location_id: str | None = Query(default=None, description="ID de uma localização para os totais da sua subárvore.")
+):
+    db: AsyncIOMotorDatabase = request.state.db
+    stats_collection = db[INVENTORY_STATS_COLLECTION]
+
+    stats = await stats_collection.find_one({"_id": TENANT_STATS_ID})
+    # until the first reconciliation lands the counters are read live
+    reconciled = stats is not None and stats.get("reconciled_at") is not None
+    claimed = await claim_first_reconciliation(db) if stats is None else await claim_reconciliation(db, stats)
+    if claimed:
+        await AsyncTaskRepository(db).create(
+            task_type=AsyncTaskType.RECONCILE_INVENTORY_STATS,
+            params={}
+        )
+
+    if location_id:
+        if not ObjectId.is_valid(location_id):
+            raise HTTPException(status_code=400, detail="ObjectId inválido")
+        if reconciled:
+            location = await stats_collection.find_one({"_id": ObjectId(location_id), "scope": LOCATION_SCOPE})
+        else:
+            location = await db.inventory_items.find_one({"_id": ObjectId(location_id), "node_type": "LOCATION"}, {"path": 1})
+        if not location:
+            raise HTTPException(status_code=404, detail="Localização não encontrada")
+        return stats_counts(location if reconciled else await live_inventory_stats(db, location.get("path")))
+
+    return stats_counts(stats if reconciled else await live_inventory_stats(db))
+
+@router.get("/dashboard/locations")
+async def dashboard_locations(
+    request: Request,
+    parent_id: str | None = Query(default=None, description="ID da localização pai. Vazio para as localizações raiz.")
+):
     db: AsyncIOMotorDatabase = request.state.db
-    
-    total = await db.inventory_items.count_documents({
-        "node_type": "ASSET"
-    })
-
-    inventoried = await db.inventory_items.count_documents({
-        "checked": True
-    })
 
-    percent = round((inventoried / total) * 100, 2) if total else 0
+    query = {"scope": LOCATION_SCOPE, "parent_id": None}
+    if parent_id:
+        if not ObjectId.is_valid(parent_id):
+            raise HTTPException(status_code=400, detail="ObjectId inválido")
+        query["parent_id"] = ObjectId(parent_id)
+
+    locations = await db[INVENTORY_STATS_COLLECTION].find(query).sort("reference", 1).to_list(None)
+
+    return [
+        {
+            "_id": str(location["_id"]),
+            "reference": location.get("reference"),
+            "path": location.get("path"),
+            **stats_counts(location)
+        }
+        for location in locations
+    ]
 
-    return {
-        "total_items": total,
-        "inventoried": inventoried,
-        "pending": total - inventoried,
-        "percent": percent
-    }
+@router.post(
+    "/dashboard/reconcile",
+    response_model=AsyncTaskCreateResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def dashboard_reconcile(request: Request) -> AsyncTaskCreateResponse:
+    repository = AsyncTaskRepository(request.state.db)
+    return await repository.create(
+        task_type=AsyncTaskType.RECONCILE_INVENTORY_STATS,
+        params={}
+    )
 
 @router.post(
     "/inventory-responsibility-agreement", 
@@ -86,7 +149,7 @@ async def create_inventory_responsibility_agreement_report(
     repository = AsyncTaskRepository(request.state.db)
     async_task = await repository.create(
         task_type=AsyncTaskType.EXPORT_INVENTORY_RESPONSIBILITY_AGREEMENT_REPORT,
-        params={"parent_location_ids": payload.parent_location_ids}
+        params={"parent_location_ids": payload.parent_location_ids, "photo_size": payload.photo_size}
     )
 
     return async_task
@@ -122,7 +185,7 @@ async def images_export(
     repository = AsyncTaskRepository(request.state.db)
     async_task = await repository.create(
         task_type=AsyncTaskType.EXPORT_ITEMS_IMAGES,
-        params={"parent_id": payload.parent_id, "mode": payload.mode}
+        params={"parent_id": payload.parent_id, "mode": payload.mode, "photo_size": payload.photo_size}
     )
 
     return async_task
\ No newline at end of file
@@ -6,10 +6,12 @@ import datetime
 from bson import ObjectId
 import datetime
 from app.modules.report.report_choices import HierarchyStandChoice, ImageExportModeChoice
+from app.shared.files.photo_size_choices import PhotoSizeChoice
 
 
 class CreateInventoryResponsibilityAgreementReportRequest(BaseModel):
     parent_location_ids: List[str]
+    photo_size: PhotoSizeChoice = PhotoSizeChoice.PREVIEW
     
 class CreateAnalyticalReportRequest(BaseModel):
     parent_ids: List[str]
@@ -17,6 +19,7 @@ class CreateAnalyticalReportRequest(BaseModel):
 class ImagesExportRequest(BaseModel):
     mode: ImageExportModeChoice
     parent_id: Optional[str] = None
+    photo_size: PhotoSizeChoice = PhotoSizeChoice.ORIGINAL
 
 @dataclass
 class InventoryResposabilityAgreementItemDTO:
@@ -1,12 +1,14 @@
 import asyncio
+import time
 import anyio
 from abc import ABC, abstractmethod
-from app.modules.task.task_choices import AsyncTaskStatus, AsyncTaskResultType
-from typing import Any, Dict
+from app.modules.task.task_choices import AsyncTaskStatus, AsyncTaskResultType, AsyncTaskType
+from typing import Any, Dict, Optional
 from app.modules.task.task_storage_paths import TaskStoragePaths
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.shared.database.object_management import update_attributes
+from app.shared.observability.metrics import ASYNC_TASK_DURATION
 
 from app.shared.storage.s3.objects import (
     generate_s3_storage_object_key,
@@ -15,24 +17,38 @@ from app.shared.storage.s3.objects import (
     generate_s3_storage_move_object_key
 )
 
+# progress `run` reports before and after `execute`, report_progress moves between them
+EXECUTE_PROGRESS_START = 5
+EXECUTE_PROGRESS_END = 70
+
 
 class BaseAsyncTaskHandler(ABC):
-    def __init__(self, *, task_id: str, db: AsyncIOMotorDatabase, result_type: AsyncTaskResultType):
+    def __init__(
+        self,
+        *,
+        task_id: str,
+        db: AsyncIOMotorDatabase,
+        result_type: AsyncTaskResultType,
+        task_type: Optional[AsyncTaskType] = None
+    ):
         self.task_id = task_id
         self.db = db
         self.collection = db["async_tasks"]
         self.result_type = result_type
+        self.task_type = task_type
 
     async def run(self, params: dict) -> None:
+        started = time.perf_counter()
+        status = AsyncTaskStatus.FAILED
         try:
             await self.update_attributes(
                 status=AsyncTaskStatus.IN_PROGRESS.value,
-                progress=5
+                progress=EXECUTE_PROGRESS_START
             )
 
             result = await self.execute(params)
             await self.update_attributes(
-                progress=70
+                progress=EXECUTE_PROGRESS_END
             )
             
             result = await self._handle_result(result)
@@ -41,6 +57,7 @@ class BaseAsyncTaskHandler(ABC):
                 progress=100,
                 result=result
             )
+            status = AsyncTaskStatus.COMPLETED
 
         except Exception as exc:
             await self.update_attributes(
@@ -49,6 +66,12 @@ class BaseAsyncTaskHandler(ABC):
             )
             raise
 
+        finally:
+            ASYNC_TASK_DURATION.labels(
+                self.task_type.value if self.task_type else "UNKNOWN",
+                status.value
+            ).observe(time.perf_counter() - started)
+
     async def update_attributes(self, **args):
         await update_attributes(
             collection=self.collection,
@@ -56,6 +79,15 @@ class BaseAsyncTaskHandler(ABC):
             **args
         )
 
+    async def report_progress(self, processed: int, total: Optional[int], **args):
+        """Progress of `execute` once `processed` of `total` units are done, saved along with `args`."""
+        progress = EXECUTE_PROGRESS_START
+        if total:
+            ratio = min(processed / total, 1)
+            progress += int((EXECUTE_PROGRESS_END - EXECUTE_PROGRESS_START) * ratio)
+
+        await self.update_attributes(progress=progress, **args)
+
     async def _handle_result(self, result: Any) -> str:
         if self.result_type == AsyncTaskResultType.RAW_RESULT:
             return result
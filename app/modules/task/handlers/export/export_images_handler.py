@@ -1,5 +1,6 @@
 from app.modules.report.report_repository import ImagesExportService
 from app.modules.task.handlers.base_handler import BaseAsyncTaskHandler
+from app.shared.files.photo_size_choices import PhotoSizeChoice
 from typing import Dict, Any
 
 class ExportImagesHandler(BaseAsyncTaskHandler):
@@ -7,5 +8,6 @@ class ExportImagesHandler(BaseAsyncTaskHandler):
         service = ImagesExportService(self.db)
         return await service.export_images(
             parent_id=params["parent_id"],
-            mode=params["mode"]
+            mode=params["mode"],
+            photo_size=params.get("photo_size", PhotoSizeChoice.ORIGINAL)
         )
\ No newline at end of file
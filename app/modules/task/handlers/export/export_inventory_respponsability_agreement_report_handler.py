@@ -1,10 +1,12 @@
 from app.modules.report.report_repository import AssetInventoryResponsibilityReportService
 from app.modules.task.handlers.base_handler import BaseAsyncTaskHandler
+from app.shared.files.photo_size_choices import PhotoSizeChoice
 from typing import Dict, Any
 
 class ExportInventoryResponsibilityAgreementReportHandler(BaseAsyncTaskHandler):
     async def execute(self, params: Dict[Any, Any]):
         service = AssetInventoryResponsibilityReportService(self.db)
         return await service.create_inventory_responsibility_agreement_report(
-            parent_location_ids=params["parent_location_ids"]
+            parent_location_ids=params["parent_location_ids"],
+            photo_size=params.get("photo_size", PhotoSizeChoice.PREVIEW)
         )
@@ -0,0 +1,8 @@
+from app.modules.task.handlers.base_handler import BaseAsyncTaskHandler
+from app.shared.database.ancestors import backfill_ancestors
+from typing import Dict, Any
+
+
+class BackfillTreeAncestorsHandler(BaseAsyncTaskHandler):
+    async def execute(self, params: Dict[Any, Any]):
+        return await backfill_ancestors(self.db, on_progress=self.report_progress)
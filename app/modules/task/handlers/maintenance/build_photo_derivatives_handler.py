@@ -0,0 +1,12 @@
+from app.modules.item.item_photo_derivatives import ItemPhotoDerivatives
+from app.modules.task.handlers.base_handler import BaseAsyncTaskHandler
+from typing import Dict, Any
+
+
+class BuildPhotoDerivativesHandler(BaseAsyncTaskHandler):
+    async def execute(self, params: Dict[Any, Any]):
+        service = ItemPhotoDerivatives(self.db)
+        return await service.backfill(
+            item_ids=params.get("item_ids"),
+            on_progress=self.report_progress
+        )
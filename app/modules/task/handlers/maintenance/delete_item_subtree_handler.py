@@ -0,0 +1,23 @@
+from bson import ObjectId
+from app.modules.item.item_subtree_delete import ItemSubtreeDelete
+from app.modules.task.handlers.base_handler import BaseAsyncTaskHandler
+from app.shared.storage.s3.cleanup import drain_storage_cleanup
+from typing import Dict, Any
+
+class DeleteItemSubtreeHandler(BaseAsyncTaskHandler):
+    async def execute(self, params: Dict[Any, Any]):
+        service = ItemSubtreeDelete(self.db)
+        deleted_count = 0
+        for item_id in params.get("item_ids", []):
+            deleted, _ = await service.delete(ObjectId(item_id), limit=None)
+            deleted_count += deleted
+        # tasks queued before `item_ids`, whose items were already deleted
+        if params.get("parent_ids"):
+            deleted, _ = await service.delete_descendants(
+                [ObjectId(parent_id) for parent_id in params["parent_ids"]]
+            )
+            deleted_count += deleted
+        return {
+            "deleted_count": deleted_count,
+            "deleted_objects": await drain_storage_cleanup(self.db)
+        }
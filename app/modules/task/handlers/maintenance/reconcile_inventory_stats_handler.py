@@ -0,0 +1,7 @@
+from app.modules.task.handlers.base_handler import BaseAsyncTaskHandler
+from app.shared.database.inventory_stats import reconcile_inventory_stats
+from typing import Dict, Any
+
+class ReconcileInventoryStatsHandler(BaseAsyncTaskHandler):
+    async def execute(self, params: Dict[Any, Any]):
+        return await reconcile_inventory_stats(self.db)
@@ -0,0 +1,39 @@
+import logging
+
+from app.modules.data_load.data_load_repository import InventoryExcelImport
+from app.modules.task.handlers.base_handler import BaseAsyncTaskHandler
+from app.shared.storage.s3.cleanup import drain_storage_cleanup, queue_storage_cleanup
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ImportInventoryExcelHandler(BaseAsyncTaskHandler):
+    async def execute(self, params: Dict[Any, Any]):
+        service = InventoryExcelImport(self.db)
+        try:
+            return await service.perform_import(
+                source_key=params["source_key"],
+                extra_fields=params.get("extra_fields", []),
+                on_progress=self.report_rows,
+                dry_run=params.get("dry_run", False)
+            )
+        finally:
+            await self.discard_workbook(params["source_key"])
+
+    async def discard_workbook(self, source_key: str):
+        """The staged workbook is only read by this task; queued first, so a failed delete is retried by the next drain."""
+        await queue_storage_cleanup(self.db, [source_key])
+        try:
+            await drain_storage_cleanup(self.db)
+        except Exception:
+            logger.exception("Could not delete the staged workbook '%s'", source_key)
+
+    async def report_rows(self, processed_rows: int, total_rows: Optional[int], errors: List[Dict[str, Any]]):
+        await self.report_progress(
+            processed_rows,
+            total_rows,
+            processed_rows=processed_rows,
+            total_rows=total_rows,
+            errors=errors
+        )
@@ -15,4 +15,9 @@ class AsyncTaskType(str, Enum):
     EXPORT_INVENTORY_RESPONSIBILITY_AGREEMENT_REPORT = "EXPORT_INVENTORY_RESPONSIBILITY_AGREEMENT_REPORT"
     EXPORT_ANALYTICAL_REPORT = "EXPORT_ANALYTICAL_REPORT"
     EXPORT_ITEMS_IMAGES = "EXPORT_ITEMS_IMAGES"
-    UPLOAD_ITEMS_IMAGES = "UPLOAD_ITEMS_IMAGES"
\ No newline at end of file
+    UPLOAD_ITEMS_IMAGES = "UPLOAD_ITEMS_IMAGES"
+    IMPORT_INVENTORY_EXCEL = "IMPORT_INVENTORY_EXCEL"
+    RECONCILE_INVENTORY_STATS = "RECONCILE_INVENTORY_STATS"
+    BUILD_PHOTO_DERIVATIVES = "BUILD_PHOTO_DERIVATIVES"
+    DELETE_ITEM_SUBTREE = "DELETE_ITEM_SUBTREE"
+    BACKFILL_TREE_ANCESTORS = "BACKFILL_TREE_ANCESTORS"
\ No newline at end of file
@@ -3,6 +3,11 @@ from app.modules.task.handlers.export.export_inventory_respponsability_agreement
 from app.modules.task.handlers.export.export_analytical_report_handler import ExportAnalyticalReportHandler
 from app.modules.task.handlers.export.export_images_handler import ExportImagesHandler
 from app.modules.task.handlers.upload.upload_items_images_handler import UploadItemsImagesHandler
+from app.modules.task.handlers.upload.import_inventory_excel_handler import ImportInventoryExcelHandler
+from app.modules.task.handlers.maintenance.reconcile_inventory_stats_handler import ReconcileInventoryStatsHandler
+from app.modules.task.handlers.maintenance.build_photo_derivatives_handler import BuildPhotoDerivativesHandler
+from app.modules.task.handlers.maintenance.delete_item_subtree_handler import DeleteItemSubtreeHandler
+from app.modules.task.handlers.maintenance.backfill_tree_ancestors_handler import BackfillTreeAncestorsHandler
 from app.modules.task.task_schemas import AsyncTaskSpec
 
 
@@ -23,6 +28,26 @@ class AsyncTaskFactory:
         AsyncTaskType.UPLOAD_ITEMS_IMAGES: AsyncTaskSpec(
             handler=UploadItemsImagesHandler,
             result_type=AsyncTaskResultType.RAW_RESULT
+        ),
+        AsyncTaskType.IMPORT_INVENTORY_EXCEL: AsyncTaskSpec(
+            handler=ImportInventoryExcelHandler,
+            result_type=AsyncTaskResultType.RAW_RESULT
+        ),
+        AsyncTaskType.RECONCILE_INVENTORY_STATS: AsyncTaskSpec(
+            handler=ReconcileInventoryStatsHandler,
+            result_type=AsyncTaskResultType.RAW_RESULT
+        ),
+        AsyncTaskType.BUILD_PHOTO_DERIVATIVES: AsyncTaskSpec(
+            handler=BuildPhotoDerivativesHandler,
+            result_type=AsyncTaskResultType.RAW_RESULT
+        ),
+        AsyncTaskType.DELETE_ITEM_SUBTREE: AsyncTaskSpec(
+            handler=DeleteItemSubtreeHandler,
+            result_type=AsyncTaskResultType.RAW_RESULT
+        ),
+        AsyncTaskType.BACKFILL_TREE_ANCESTORS: AsyncTaskSpec(
+            handler=BackfillTreeAncestorsHandler,
+            result_type=AsyncTaskResultType.RAW_RESULT
         )
     }
 
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Request
 from fastapi import HTTPException
 from bson import ObjectId
 from app.modules.task.task_choices import AsyncTaskResultType
-from app.shared.storage.s3.objects import storage_s3_retrieve_objects_url
+from app.shared.storage.s3.presign import presign_service
 from app.modules.task.task_schemas import AsyncTaskListResponse
 
 
@@ -26,7 +26,7 @@ async def retreave_task(request: Request, task_id: str) -> AsyncTaskListResponse
         and async_task.get("result_type", None) == AsyncTaskResultType.ARCHIVE.value
         and async_task.get("result", None)
     ):
-        async_task["result"] = await storage_s3_retrieve_objects_url(async_task["result"])
+        async_task["result"] = await presign_service.resolve(async_task["result"])
 
     return AsyncTaskListResponse(
         _id=str(async_task["_id"]),
@@ -34,5 +34,8 @@ async def retreave_task(request: Request, task_id: str) -> AsyncTaskListResponse
         result_type=async_task["result_type"],
         progress=async_task["progress"],
         result=async_task["result"],
-        error=async_task.get("error")
+        error=async_task.get("error"),
+        processed_rows=async_task.get("processed_rows"),
+        total_rows=async_task.get("total_rows"),
+        errors=async_task.get("errors")
     )
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Any, Optional
+from typing import Any, Dict, List, Optional
 from app.modules.task.task_choices import AsyncTaskStatus, AsyncTaskResultType, AsyncTaskType
 from datetime import datetime
 from app.shared.datetime import time_now
@@ -26,6 +26,9 @@ class AsyncTaskListResponse(BaseModel):
     progress: int
     result: Optional[Any] = None
     log: Optional[str] = None
+    processed_rows: Optional[int] = None
+    total_rows: Optional[int] = None
+    errors: Optional[List[Dict[str, Any]]] = None
 
     model_config = {
         "from_attributes": True,
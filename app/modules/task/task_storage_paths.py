@@ -9,5 +9,9 @@ class TaskStoragePaths:
     def root(self) -> str:
         return f"multi-tenant/client/{self.client_name}/tasks"
 
+    @property
+    def inputs(self) -> str:
+        return f"{self.root}/inputs"
+
     def async_task(self, task_id: ObjectId) -> str:
         return f"{self.root}/async/{str(task_id)}"
\ No newline at end of file
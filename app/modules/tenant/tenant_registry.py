@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Set
+
+from dotenv import load_dotenv
+
+from app.core.database import MongoConnection
+
+load_dotenv()
+
+
+@dataclass(frozen=True)
+class TenantRegistryEntry:
+    database: str
+    is_active: bool = True
+
+
+class TenantRegistry:
+    """
+        In-process view of the tenant databases and their `is_active` flag.
+
+        The database list is refreshed at most every `ttl` seconds, unknown tenant
+        names trigger an early refresh at most every `miss_refresh_interval`
+        seconds, so validating a known tenant costs no Mongo round trip.
+    """
+
+    def __init__(
+        self,
+        ttl: float = float(os.getenv("TENANT_REGISTRY_TTL", "60")),
+        miss_refresh_interval: float = float(os.getenv("TENANT_REGISTRY_MISS_REFRESH_INTERVAL", "5")),
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ttl = ttl
+        self.miss_refresh_interval = miss_refresh_interval
+        self._clock = clock
+        self._databases: Set[str] = set()
+        self._entries: Dict[str, TenantRegistryEntry] = {}
+        self._refreshed_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self, db_name: str) -> Optional[TenantRegistryEntry]:
+        if self._age() >= self.ttl:
+            await self.refresh()
+        elif db_name not in self._databases and self._age() >= self.miss_refresh_interval:
+            await self.refresh()
+
+        if db_name not in self._databases:
+            return None
+
+        entry = self._entries.get(db_name)
+        if entry is None:
+            entry = await self._load_entry(db_name)
+            self._entries[db_name] = entry
+        return entry
+
+    async def refresh(self) -> None:
+        refreshed_at = self._refreshed_at
+        async with self._lock:
+            # another coroutine refreshed while this one was waiting for the lock
+            if self._refreshed_at != refreshed_at:
+                return
+
+            client = MongoConnection.get_client()
+            self._databases = set(await client.list_database_names())
+            self._entries = {}
+            self._refreshed_at = self._clock()
+
+    def invalidate(self, db_name: Optional[str] = None) -> None:
+        if db_name is None:
+            self._databases = set()
+            self._entries = {}
+            self._refreshed_at = None
+            return
+        self._entries.pop(db_name, None)
+
+    def _age(self) -> float:
+        if self._refreshed_at is None:
+            return float("inf")
+        return self._clock() - self._refreshed_at
+
+    async def _load_entry(self, db_name: str) -> TenantRegistryEntry:
+        db = MongoConnection.get_client().get_database(db_name)
+        info_doc = await db.dummy.find_one({}, {"is_active": 1})
+        return TenantRegistryEntry(
+            database=db_name,
+            is_active=info_doc.get("is_active", True) if info_doc else True
+        )
+
+
+tenant_registry = TenantRegistry()
@@ -2,7 +2,7 @@ import datetime
 from typing import List
 
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, HTTPException, status
 from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
 from pymongo import ReturnDocument
 
@@ -13,6 +13,8 @@ from fastapi import Request
 from app.modules.tenant.tenant_schema import TenantCreateUpdateDTO, TenantSchema, TenantResponseDTO, \
     TenantListResponseDTO
 from app.modules.tenant.tenant_service import get_tenant_database_names
+from app.modules.tenant.tenant_registry import tenant_registry
+from app.shared.mongo_indexes import ensure_indexes
 
 
 router = APIRouter(prefix="/tenant", tags=["Tenant"])
@@ -25,7 +27,7 @@ client = MongoConnection.get_client()
     response_model=TenantResponseDTO,
     status_code=status.HTTP_201_CREATED
 )
-async def create_tenant(payload: TenantCreateUpdateDTO):
+async def create_tenant(payload: TenantCreateUpdateDTO, background_tasks: BackgroundTasks):
     existing_dbs: List[str] = await client.list_database_names()
     
     if payload.database in existing_dbs:
@@ -49,6 +51,8 @@ async def create_tenant(payload: TenantCreateUpdateDTO):
     await tenant_db.dummy.insert_one(
         tenant_db_model.model_dump(by_alias=True) # by_alias has to be true so we insert '_id' instead of 'id'
     )
+    tenant_registry.invalidate()
+    background_tasks.add_task(ensure_indexes, tenant_db)
 
     return tenant_db_model
 
@@ -109,6 +113,8 @@ async def update_tenant(payload: TenantCreateUpdateDTO, request: Request):
             detail="Tenant não encontrado"
         )
 
+    tenant_registry.invalidate(db.name)
+
     return updated
 
 
@@ -133,4 +139,6 @@ async def inactivate_tenant(request: Request):
             detail="Tenant não encontrado"
         )
 
+    tenant_registry.invalidate(db.name)
+
     return updated
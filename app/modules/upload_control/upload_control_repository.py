@@ -6,45 +6,36 @@ from typing import Optional, List, Dict, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.modules.item.item_storage_paths import ItemStoragePaths
 from app.modules.item.item_repository import ItemRepository
+from app.modules.item.item_photo_derivatives import ItemPhotoDerivatives
 from fastapi import UploadFile
 from app.shared.files.images import detect_image_extension
+from app.shared.database.tree_snapshot import TreeSnapshot, get_tree_snapshot
 
 class UploadItemsImages:
     def __init__(self, database: AsyncIOMotorDatabase):
         self.db = database
         self._collection = self.db["inventory_items"]
         self._cache: Dict[Tuple[str, str], dict] = {}
+        self._derivatives = ItemPhotoDerivatives(database)
+        self._snapshot: Optional[TreeSnapshot] = None
 
-    async def _find_asset_by_reference_and_path(self, reference: str, location_path: List[str]):
-        key = (reference, " -> ".join(location_path))
+    async def _find_asset_by_reference_and_path(self, reference: str, location_path: str) -> Optional[dict]:
+        key = (reference, location_path)
         if key in self._cache:
             return self._cache[key]
 
-        candidates = await self._collection.find(
-            {"reference": reference, "node_type": "ASSET"}
-        ).to_list(None)
+        # candidates and their locations come from the tree snapshot, without a query per ancestor
+        if self._snapshot is None:
+            self._snapshot = await get_tree_snapshot(self.db)
 
-        for item in candidates:
-            current = item
-            locations_in_path = []
+        item = None
+        for item_id in self._snapshot.with_reference(reference, "ASSET"):
+            if " -> ".join(self._snapshot.location_path(item_id)) == location_path:
+                item = {"_id": item_id}
+                break
 
-            while current.get("parent_id"):
-                parent = await self._collection.find_one({"_id": current["parent_id"]})
-                if not parent:
-                    break
-
-                if parent["node_type"] == "LOCATION":
-                    locations_in_path.insert(0, parent["reference"])
-
-                current = parent
-
-            locations_in_path = " -> ".join(locations_in_path)
-            if locations_in_path == location_path:
-                self._cache[key] = item
-                return item
-
-        self._cache[key] = None
-        return None
+        self._cache[key] = item
+        return item
 
     async def perform_upload(self, encoded_file: str):
         try:
@@ -99,4 +90,6 @@ class UploadItemsImages:
                                 "photos": item_photo_path[0]
                             }
                         }
-                    )
\ No newline at end of file
+                    )
+                    # the bytes are at hand, no need to download the original again
+                    await self._derivatives.build_for_item(item["_id"], item_photo_path, [image_bytes])
\ No newline at end of file
@@ -1,46 +1,115 @@
-from pprint import pprint
+import hashlib
+import json
+from typing import BinaryIO, Iterator, Optional
 from bson import ObjectId
+import numpy as np
 import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from pandas.io.parsers import TextParser
+
+from app.shared.database.ancestors import ANCESTORS_FIELD, ROOT_ID_FIELD
+
+
+def node_content_hash(doc: dict) -> str:
+    """Digest of the fields a spreadsheet controls, used to skip re-imports of unchanged nodes."""
+    content = [doc["reference"], doc["path"], doc["node_type"], doc.get("asset_data")]
+    raw = json.dumps(content, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def hierarchy_levels(df: pd.DataFrame, delimiter_column: str):
+    """
+        Normalizes the hierarchy columns (those before `delimiter_column`) of a sheet.
+
+        Returns the level columns, the raw row values, the stripped references as
+        an object array and the depth of every row (levels filled before the first
+        empty cell).
+    """
+    delimiter_index = df.columns.get_loc(delimiter_column)
+    level_columns = list(df.columns[:delimiter_index])
+
+    # same values (and dtype upcasting) that DataFrame.iterrows yields
+    values = df.to_numpy()
+    level_cells = pd.DataFrame(values[:, :delimiter_index])
+    references = level_cells.astype(str).apply(lambda column: column.str.strip())
+
+    is_empty = level_cells.isna().to_numpy() | (references == "").to_numpy()
+    depths = np.logical_and.accumulate(~is_empty, axis=1).sum(axis=1)
+    return level_columns, values, references.to_numpy(dtype=object), depths
 
 
 def build_nodes_from_df(
     df: pd.DataFrame,
     delimiter_column: str,
     extra_fields: list[str] = None,
-    nodes = {},
+    nodes = None,
+    include_existing: bool = False,
 ):
-    delimiter_index = df.columns.get_loc(delimiter_column)
-    level_columns = list(df.columns[:delimiter_index])
+    """
+        Builds the inventory tree documents of a spreadsheet.
+
+        Columns before `delimiter_column` are the hierarchy levels (`LOC*` columns are
+        locations, the others assets). `nodes` maps (reference, parent_id) to the
+        `_id` of nodes that already exist and is updated with every created node.
+        Known nodes are skipped unless `include_existing` is set, in which case they
+        are built with their current `_id` so their `content_hash` can be compared.
+        Level cells are normalized once, column-wise, and (reference, parent) pairs
+        are deduplicated one level at a time; the result is identical, in content
+        and order, to the row-by-row builder kept in benchmarks/legacy_excel_builder.py.
+    """
+    if nodes is None:
+        nodes = {}
+
+    level_columns, values, references, depths = hierarchy_levels(df, delimiter_column)
+
+    if df.empty or not level_columns:
+        return []
+
+    row_depths = depths.tolist()
+
+    extra_columns = [
+        (f, df.columns.get_loc(f))
+        for f in (extra_fields or [])
+        if f in df.columns
+    ]
 
-    documents = []
+    node_ids: list[ObjectId] = []
+    node_ancestors: list[list[ObjectId]] = []
+    row_parent_codes = np.full(len(df), -1, dtype=np.int64)
+    created = []
 
-    for _, row in df.iterrows():
-        parent_id = None
-        path = []
-        
-        deepest_level = -1
-        for level, col in enumerate(level_columns):
-            value = row[col]
-            if pd.isna(value) or str(value).strip() == "":
-                break
-            deepest_level = level
+    for level, col in enumerate(level_columns):
+        active_rows = np.flatnonzero(depths > level)
+        if active_rows.size == 0:
+            break
 
-        for level, col in enumerate(level_columns):
-            value = row[col]
+        level_references = references[active_rows, level]
+        parent_codes = row_parent_codes[active_rows]
 
-            if pd.isna(value) or str(value).strip() == "":
-                break
+        reference_codes, _ = pd.factorize(level_references)
+        pair_keys = reference_codes.astype(np.int64) * (len(node_ids) + 1) + (parent_codes + 1)
+        pair_codes, unique_pairs = pd.factorize(pair_keys)
+        _, first_positions = np.unique(pair_codes, return_index=True)
 
-            value = str(value).strip()
-            path.append(value)
+        is_location = col.lower().startswith("loc")
+        pair_node_codes = [0] * len(unique_pairs)
 
+        # plain lists, numpy scalar indexing dominates the loop otherwise
+        level_rows = active_rows.tolist()
+        level_parent_codes = parent_codes.tolist()
+
+        for pair_code, position in enumerate(first_positions.tolist()):
+            row_index = level_rows[position]
+            value = level_references[position]
+            parent_code = level_parent_codes[position]
+            parent_id = node_ids[parent_code] if parent_code >= 0 else None
+            ancestors = node_ancestors[parent_code] + [parent_id] if parent_code >= 0 else []
             node_key = (value, parent_id)
-            is_last_level = (level == deepest_level)
-            
-            if node_key not in nodes:
-                _id = ObjectId()
 
-                is_location = col.lower().startswith("loc")
+            is_new = node_key not in nodes
+            if is_new or include_existing:
+                _id = ObjectId() if is_new else nodes[node_key]
 
                 doc = {
                     "_id": _id,
@@ -49,25 +118,32 @@ def build_nodes_from_df(
                     "parent_id": parent_id,
                     "level": level,
                     "checked": None if is_location else False,
-                    "path": path.copy()
+                    "path": list(references[row_index, :level + 1]),
+                    ANCESTORS_FIELD: ancestors,
+                    ROOT_ID_FIELD: ancestors[0] if ancestors else _id,
                 }
 
-                if not is_location and extra_fields and is_last_level:
-                    asset_data = {}
-                    for f in extra_fields:
-                        if f in df.columns:
-                            asset_data[f] = normalize(row[f])
-
+                is_last_level = row_depths[row_index] - 1 == level
+                if not is_location and extra_columns and is_last_level:
+                    asset_data = {
+                        f: normalize(values[row_index, column_index])
+                        for f, column_index in extra_columns
+                    }
                     if asset_data:
                         doc["asset_data"] = asset_data
-                        
 
+                doc["content_hash"] = node_content_hash(doc)
                 nodes[node_key] = _id
-                documents.append(doc)
+                created.append((row_index, level, doc))
+
+            pair_node_codes[pair_code] = len(node_ids)
+            node_ids.append(nodes[node_key])
+            node_ancestors.append(ancestors)
 
-            parent_id = nodes[node_key]
+        row_parent_codes[active_rows] = np.asarray(pair_node_codes, dtype=np.int64)[pair_codes]
 
-    return documents
+    created.sort(key=lambda entry: (entry[0], entry[1]))
+    return [doc for _, _, doc in created]
 
 
 def normalize(value):
@@ -76,3 +152,143 @@ def normalize(value):
     if isinstance(value, (int, float, str, bool)):
         return value
     return str(value)
+
+
+def excel_header(cells: tuple) -> list:
+    """Column names as pandas.read_excel builds them: blank headers become `Unnamed: i`, repeated ones get `.1`, `.2`..."""
+    columns = []
+    seen = {}
+    for index, cell in enumerate(cells):
+        name = f"Unnamed: {index}" if cell is None or str(cell).strip() == "" else cell
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def excel_cell_value(cell):
+    """Cell value as the openpyxl reader of pandas.read_excel converts it: blanks are "", integral numbers int."""
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        value = int(cell.value)
+        return value if value == cell.value else float(cell.value)
+    return cell.value
+
+
+def iter_excel_rows(file: BinaryIO) -> Iterator[list]:
+    """Converted rows of the first sheet, the header first."""
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows():
+            yield [excel_cell_value(cell) for cell in row]
+    finally:
+        workbook.close()
+
+
+def excel_columns(file: BinaryIO) -> Optional[list]:
+    rows = iter_excel_rows(file)
+    try:
+        header = next(rows, None)
+    finally:
+        rows.close()
+    return None if header is None else excel_header(header)
+
+
+def iter_excel_row_chunks(file: BinaryIO, width: int, chunk_size: int) -> Iterator[list]:
+    """
+        Data rows padded to `width`, `chunk_size` at a time. Like read_excel, blank rows
+        are kept (they become all-NaN rows) unless no data follows them.
+    """
+    rows = iter_excel_rows(file)
+    next(rows, None)
+    chunk = []
+    blanks = []
+    for row in rows:
+        row = row[:width] + [""] * (width - len(row))
+        if all(value == "" for value in row):
+            blanks.append(row)
+            continue
+        for row in blanks + [row]:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        blanks = []
+    if chunk:
+        yield chunk
+
+
+def parse_excel_rows(rows: list, columns: list, dtype: Optional[dict] = None) -> pd.DataFrame:
+    """Rows parsed by the TextParser read_excel uses, with its default `na_values`."""
+    return TextParser(rows, names=columns, header=None, skip_blank_lines=False, dtype=dtype or None).read()
+
+
+def merged_dtype(kinds: set, has_na: bool):
+    """Dtype pandas infers for a whole column from the dtype kinds of its chunks."""
+    if kinds == {"b"} and not has_na:
+        return np.dtype(bool)
+    # booleans are numbers to pandas once mixed with numbers or blanks
+    if kinds <= {"b", "i", "f"}:
+        return np.dtype(np.float64) if "f" in kinds or has_na or not kinds else np.dtype(np.int64)
+    if kinds == {"M"}:
+        return np.dtype("datetime64[ns]")
+    return np.dtype(object)
+
+
+def excel_column_dtypes(file: BinaryIO, columns: list, chunk_size: int) -> dict:
+    kinds = {column: set() for column in columns}
+    with_na = set()
+    for rows in iter_excel_row_chunks(file, len(columns), chunk_size):
+        chunk = parse_excel_rows(rows, columns)
+        for column in columns:
+            missing = chunk[column].isna()
+            if missing.any():
+                with_na.add(column)
+            # an all-NaN chunk says nothing about the column type
+            if not missing.all():
+                kinds[column].add(chunk[column].dtype.kind)
+    return {column: merged_dtype(kinds[column], column in with_na) for column in columns}
+
+
+def excel_row_count(file: BinaryIO) -> Optional[int]:
+    """Data rows of the first sheet according to its stored dimension (blank rows included), None when unknown."""
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        max_row = workbook.worksheets[0].max_row
+        return max(max_row - 1, 0) if max_row else None
+    finally:
+        workbook.close()
+
+
+def iter_excel_chunks(file: BinaryIO, chunk_size: int = 5000) -> Iterator[pd.DataFrame]:
+    """
+        Streams the first sheet of a workbook as DataFrames of at most `chunk_size` rows,
+        with the values `pd.read_excel` gives for the whole sheet.
+
+        Cells are converted and parsed as read_excel does (its `na_values` included),
+        but the dtype pandas would infer per column depends on every row: one blank cell
+        turns an integer column into floats ("101" becomes "101.0"). A first pass over
+        the sheet infers the dtype of each chunk and merges them per column, the second
+        casts every chunk to the merged dtypes. Only one chunk is held in memory at a
+        time, the file is read twice.
+    """
+    start = file.tell()
+    columns = excel_columns(file)
+    if columns is None:
+        return
+
+    file.seek(start)
+    dtypes = excel_column_dtypes(file, columns, chunk_size)
+
+    file.seek(start)
+    object_columns = {column: object for column, dtype in dtypes.items() if dtype == object}
+    for rows in iter_excel_row_chunks(file, len(columns), chunk_size):
+        # object columns skip the numeric conversion, as read_excel does once it fails
+        chunk = parse_excel_rows(rows, columns, object_columns)
+        yield chunk.astype({column: dtype for column, dtype in dtypes.items() if chunk[column].dtype != dtype})
@@ -0,0 +1,213 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from app.shared.datetime import time_now
+
+ANCESTORS_FIELD = "ancestors"
+ROOT_ID_FIELD = "root_id"
+TREE_STATE_COLLECTION = "tree_state"
+ANCESTORS_STATE_ID = "ancestors"
+ROOT_ID_STATE_ID = "root_id"
+ANCESTORS_BACKFILL_BATCH_SIZE = 1000
+
+
+def child_ancestors(parent: Optional[Dict[str, Any]]) -> List[ObjectId]:
+    """Ancestors of a child of `parent`, root first; a root has none."""
+    if parent is None:
+        return []
+    return list(parent.get(ANCESTORS_FIELD) or []) + [parent["_id"]]
+
+
+def child_root_id(parent: Dict[str, Any]) -> Optional[ObjectId]:
+    """Root of the tree a child of `parent` joins, None when the parent predates `root_id`."""
+    if parent.get("parent_id") is None:
+        return parent["_id"]
+    return parent.get(ROOT_ID_FIELD)
+
+
+async def _tree_state_ready(db: AsyncIOMotorDatabase, state_id: str) -> bool:
+    state = await db[TREE_STATE_COLLECTION].find_one({"_id": state_id}, {"ready": 1})
+    return bool(state and state.get("ready"))
+
+
+async def ancestors_ready(db: AsyncIOMotorDatabase) -> bool:
+    """True once every node of the tenant carries its `ancestors`, set by `backfill_ancestors`."""
+    return await _tree_state_ready(db, ANCESTORS_STATE_ID)
+
+
+async def root_ids_ready(db: AsyncIOMotorDatabase) -> bool:
+    """True once every node of the tenant carries its `root_id`, set by `backfill_ancestors`."""
+    return await _tree_state_ready(db, ROOT_ID_STATE_ID)
+
+
+async def _set_tree_state(db: AsyncIOMotorDatabase, fields: Dict[str, Any]) -> None:
+    for state_id in (ANCESTORS_STATE_ID, ROOT_ID_STATE_ID):
+        await db[TREE_STATE_COLLECTION].update_one({"_id": state_id}, {"$set": fields}, upsert=True)
+
+
+async def backfill_ancestors(
+    db: AsyncIOMotorDatabase,
+    batch_size: int = ANCESTORS_BACKFILL_BATCH_SIZE,
+    on_progress: Optional[Callable[[int, int], Awaitable[Any]]] = None
+) -> Dict[str, int]:
+    """
+        Writes `ancestors` and `root_id` on every node, walking the tree from the roots
+        one level at a time over the parent_id index; only the nodes whose stored values
+        differ are updated. Nodes created meanwhile take theirs from the parent, so the
+        tenant is marked ready at the end and the queries switch to the materialized fields.
+    """
+    collection = db.inventory_items
+    await _set_tree_state(db, {"ready": False, "started_at": time_now()})
+
+    total_nodes = await collection.count_documents({})
+    processed_nodes = 0
+    updated = 0
+    frontier: Dict[Optional[ObjectId], List[ObjectId]] = {None: []}
+
+    while frontier:
+        parent_ids = list(frontier)
+        next_frontier: Dict[Optional[ObjectId], List[ObjectId]] = {}
+
+        for start in range(0, len(parent_ids), batch_size):
+            batch = parent_ids[start:start + batch_size]
+            query = {"parent_id": None} if batch == [None] else {"parent_id": {"$in": batch}}
+            operations = []
+
+            async for node in collection.find(
+                query,
+                {"parent_id": 1, ANCESTORS_FIELD: 1, ROOT_ID_FIELD: 1}
+            ).batch_size(batch_size):
+                parent_id = node.get("parent_id")
+                ancestors = frontier[parent_id] + [parent_id] if parent_id is not None else []
+                root_id = ancestors[0] if ancestors else node["_id"]
+                if node.get(ANCESTORS_FIELD) != ancestors or node.get(ROOT_ID_FIELD) != root_id:
+                    operations.append(UpdateOne(
+                        {"_id": node["_id"]},
+                        {"$set": {ANCESTORS_FIELD: ancestors, ROOT_ID_FIELD: root_id}}
+                    ))
+                next_frontier[node["_id"]] = ancestors
+                processed_nodes += 1
+
+                if len(operations) >= batch_size:
+                    updated += (await collection.bulk_write(operations, ordered=False)).modified_count
+                    operations = []
+
+            if operations:
+                updated += (await collection.bulk_write(operations, ordered=False)).modified_count
+            if on_progress:
+                await on_progress(processed_nodes, total_nodes)
+
+        frontier = next_frontier
+
+    await _set_tree_state(db, {"ready": True, "completed_at": time_now()})
+    return {"processed_nodes": processed_nodes, "updated_nodes": updated}
+
+
+def ancestor_nodes_stages(
+    as_field: str,
+    depth_field: Optional[str] = None,
+    materialized: bool = True
+) -> List[Dict[str, Any]]:
+    """
+        Stages adding the ancestor documents of each input document in `as_field`, as a
+        $graphLookup up the parent_id chain does (`depth_field` is 0 for the parent).
+
+        With `materialized` the ids come from `ancestors` and are fetched by one $lookup
+        on _id, root first; otherwise the $graphLookup itself is returned.
+    """
+    if not materialized:
+        graph_lookup = {
+            "from": "inventory_items",
+            "startWith": "$parent_id",
+            "connectFromField": "parent_id",
+            "connectToField": "_id",
+            "as": as_field,
+        }
+        if depth_field:
+            graph_lookup["depthField"] = depth_field
+        return [{"$graphLookup": graph_lookup}]
+
+    lookup_field = f"_{as_field}_lookup"
+    ancestor_ids = {"$ifNull": [f"${ANCESTORS_FIELD}", []]}
+    node = {
+        "$first": {
+            "$filter": {
+                "input": f"${lookup_field}",
+                "as": "found",
+                "cond": {"$eq": ["$$found._id", {"$arrayElemAt": [ancestor_ids, "$$index"]}]}
+            }
+        }
+    }
+    if depth_field:
+        depth = {"$subtract": [{"$subtract": [{"$size": ancestor_ids}, 1]}, "$$index"]}
+        node = {"$mergeObjects": [node, {depth_field: depth}]}
+
+    return [
+        {
+            "$lookup": {
+                "from": "inventory_items",
+                "localField": ANCESTORS_FIELD,
+                "foreignField": "_id",
+                "as": lookup_field,
+            }
+        },
+        {
+            "$addFields": {
+                as_field: {
+                    "$map": {
+                        "input": {"$range": [0, {"$size": ancestor_ids}]},
+                        "as": "index",
+                        "in": node,
+                    }
+                }
+            }
+        },
+        {"$unset": lookup_field},
+    ]
+
+
+def descendant_nodes_stages(
+    as_field: str,
+    restrict_search: Optional[Dict[str, Any]] = None,
+    materialized: bool = True
+) -> List[Dict[str, Any]]:
+    """
+        Stages adding the descendant documents of each input document in `as_field`, as
+        a $graphLookup down the parent_id chain does.
+
+        With `materialized` they are the documents whose `ancestors` hold the input _id,
+        one $lookup on the multikey index. `restrict_search` then filters the descendants
+        without cutting the walk: nodes below an excluded one are still returned.
+    """
+    if not materialized:
+        graph_lookup = {
+            "from": "inventory_items",
+            "startWith": "$_id",
+            "connectFromField": "_id",
+            "connectToField": "parent_id",
+            "as": as_field,
+        }
+        if restrict_search:
+            graph_lookup["restrictSearchWithMatch"] = restrict_search
+        return [{"$graphLookup": graph_lookup}]
+
+    lookup = {
+        "from": "inventory_items",
+        "localField": "_id",
+        "foreignField": ANCESTORS_FIELD,
+        "as": as_field,
+    }
+    if restrict_search:
+        lookup["pipeline"] = [{"$match": restrict_search}]
+    return [{"$lookup": lookup}]
+
+
+def subtree_query(root_ids: List[ObjectId], include_roots: bool = True) -> Dict[str, Any]:
+    """Nodes below any of `root_ids` (and the roots themselves with `include_roots`)."""
+    descendants = {ANCESTORS_FIELD: {"$in": root_ids}}
+    if not include_roots:
+        return descendants
+    return {"$or": [{"_id": {"$in": root_ids}}, descendants]}
@@ -0,0 +1,68 @@
+from typing import Iterable, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+
+CHILDREN_COUNT_FIELD = "children_count"
+REFRESH_BATCH_SIZE = 500
+
+
+async def increment_children_count(
+    collection: AsyncIOMotorCollection,
+    parent_id: Optional[ObjectId],
+    delta: int
+) -> None:
+    """
+        Adjusts a parent's `children_count`. Nodes created before the field existed are
+        left alone, `children_total` counts and stores their value on first read.
+    """
+    if parent_id is None or not delta:
+        return
+
+    await collection.update_one(
+        {"_id": parent_id, CHILDREN_COUNT_FIELD: {"$exists": True}},
+        {"$inc": {CHILDREN_COUNT_FIELD: delta}}
+    )
+
+
+async def refresh_children_count(
+    collection: AsyncIOMotorCollection,
+    parent_ids: Iterable[Optional[ObjectId]]
+) -> None:
+    """Recounts the children of `parent_ids` (parent_id index) and stores the exact totals."""
+    ids = list({parent_id for parent_id in parent_ids if parent_id is not None})
+
+    for start in range(0, len(ids), REFRESH_BATCH_SIZE):
+        batch = ids[start:start + REFRESH_BATCH_SIZE]
+        counts = {
+            doc["_id"]: doc["count"]
+            async for doc in collection.aggregate([
+                {"$match": {"parent_id": {"$in": batch}}},
+                {"$group": {"_id": "$parent_id", "count": {"$sum": 1}}},
+            ])
+        }
+        await collection.bulk_write(
+            [
+                UpdateOne({"_id": parent_id}, {"$set": {CHILDREN_COUNT_FIELD: counts.get(parent_id, 0)}})
+                for parent_id in batch
+            ],
+            ordered=False
+        )
+
+
+async def children_total(collection: AsyncIOMotorCollection, parent_id: Optional[ObjectId]) -> int:
+    """Children of a node read from its `children_count`; roots and older nodes are counted."""
+    if parent_id is not None:
+        parent = await collection.find_one({"_id": parent_id}, {CHILDREN_COUNT_FIELD: 1})
+        if parent and CHILDREN_COUNT_FIELD in parent:
+            return parent[CHILDREN_COUNT_FIELD]
+
+    total = await collection.count_documents({"parent_id": parent_id})
+
+    if parent_id is not None:
+        await collection.update_one(
+            {"_id": parent_id, CHILDREN_COUNT_FIELD: {"$exists": False}},
+            {"$set": {CHILDREN_COUNT_FIELD: total}}
+        )
+    return total
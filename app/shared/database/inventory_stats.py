@@ -0,0 +1,268 @@
+import os
+from collections import defaultdict
+from datetime import timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DeleteMany, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.shared.datetime import time_now
+
+load_dotenv()
+
+INVENTORY_STATS_COLLECTION = "inventory_stats"
+TENANT_STATS_ID = "tenant"
+LOCATION_SCOPE = "location"
+TENANT_SCOPE = "tenant"
+# a dashboard read older than this asks for a background reconciliation (seconds)
+INVENTORY_STATS_RECONCILE_INTERVAL = float(os.getenv("INVENTORY_STATS_RECONCILE_INTERVAL", "3600"))
+STATS_WRITE_BATCH_SIZE = 1000
+
+# inventoried counts ASSET nodes with `checked` true, checked locations are not items
+ASSET_TOTALS_GROUP = {"$group": {
+    "_id": None,
+    "total": {"$sum": 1},
+    "checked": {"$sum": {"$cond": [{"$eq": ["$checked", True]}, 1, 0]}},
+}}
+
+
+def location_prefixes(path: Optional[List[str]]) -> List[Tuple[str, ...]]:
+    """Paths of the ancestors of a node, the node itself excluded."""
+    path = path or []
+    return [tuple(path[:size]) for size in range(1, len(path))]
+
+
+def stats_counts(doc: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    total = doc.get("total_assets", 0) if doc else 0
+    checked = doc.get("checked_assets", 0) if doc else 0
+    return {
+        "total_items": total,
+        "inventoried": checked,
+        "pending": total - checked,
+        "percent": round((checked / total) * 100, 2) if total else 0,
+    }
+
+
+class InventoryStatsDelta:
+    """
+        Changes to the asset counters caused by one operation.
+
+        Counters live in `inventory_stats`: one tenant document and one document per
+        LOCATION holding the assets of its whole subtree, matched by the location
+        `path`. Nothing is written while the tenant has not been reconciled yet, the
+        first reconciliation builds every counter from scratch. `requires_reconcile`
+        is set by callers that made a change the delta cannot express.
+    """
+
+    def __init__(self):
+        self.requires_reconcile = False
+        self.total = 0
+        self.checked = 0
+        self.by_location: Dict[Tuple[str, ...], List[int]] = defaultdict(lambda: [0, 0])
+        self.new_locations: Dict[ObjectId, Dict[str, Any]] = {}
+        self.removed_locations: List[ObjectId] = []
+
+    def add_asset(self, path: Optional[List[str]], checked: bool, sign: int = 1) -> None:
+        checked_delta = sign if checked else 0
+        self.total += sign
+        self.checked += checked_delta
+        for prefix in location_prefixes(path):
+            counters = self.by_location[prefix]
+            counters[0] += sign
+            counters[1] += checked_delta
+
+    def move_subtree(self, old_path: Optional[List[str]], new_path: Optional[List[str]], total: int, checked: int) -> None:
+        """Assets of a moved subtree leave the locations above `old_path` and join the ones above `new_path`."""
+        for path, sign in ((old_path, -1), (new_path, 1)):
+            for prefix in location_prefixes(path):
+                counters = self.by_location[prefix]
+                counters[0] += sign * total
+                counters[1] += sign * checked
+
+    def add_node(self, doc: Dict[str, Any], sign: int = 1) -> None:
+        if doc.get("node_type") == "ASSET":
+            self.add_asset(doc.get("path"), doc.get("checked") is True, sign)
+        elif doc.get("node_type") == "LOCATION":
+            if sign > 0:
+                # stamped like a reconciled entry so the next reconciliation keeps or replaces it
+                self.new_locations[doc["_id"]] = {**location_stats_document(doc), "reconciled_at": time_now()}
+            else:
+                self.removed_locations.append(doc["_id"])
+
+    def operations(self) -> List[Any]:
+        operations: List[Any] = [
+            UpdateOne({"_id": location_id}, {"$setOnInsert": document}, upsert=True)
+            for location_id, document in self.new_locations.items()
+        ]
+        operations += [
+            UpdateMany(
+                {"scope": LOCATION_SCOPE, "path": list(prefix)},
+                {"$inc": {"total_assets": total, "checked_assets": checked}}
+            )
+            for prefix, (total, checked) in self.by_location.items()
+            if total or checked
+        ]
+        if self.total or self.checked:
+            operations.append(UpdateOne(
+                {"_id": TENANT_STATS_ID},
+                {"$inc": {"total_assets": self.total, "checked_assets": self.checked}}
+            ))
+        if self.removed_locations:
+            operations.append(DeleteMany({"_id": {"$in": self.removed_locations}}))
+        return operations
+
+    async def apply(self, db: AsyncIOMotorDatabase) -> None:
+        operations = self.operations()
+        if not operations:
+            return
+
+        collection = db[INVENTORY_STATS_COLLECTION]
+        if not await collection.find_one({"_id": TENANT_STATS_ID, "reconciled_at": {"$exists": True}}, {"_id": 1}):
+            return
+
+        # ordered, so new locations exist before their counters are incremented
+        for start in range(0, len(operations), STATS_WRITE_BATCH_SIZE):
+            await collection.bulk_write(operations[start:start + STATS_WRITE_BATCH_SIZE])
+
+
+def location_stats_document(doc: Dict[str, Any], total: int = 0, checked: int = 0) -> Dict[str, Any]:
+    return {
+        "scope": LOCATION_SCOPE,
+        "reference": doc.get("reference"),
+        "parent_id": doc.get("parent_id"),
+        "path": doc.get("path") or [],
+        "level": doc.get("level"),
+        "total_assets": total,
+        "checked_assets": checked,
+    }
+
+
+async def apply_stats_delta(db: AsyncIOMotorDatabase, docs: Iterable[Dict[str, Any]], sign: int = 1) -> None:
+    delta = InventoryStatsDelta()
+    for doc in docs:
+        delta.add_node(doc, sign)
+    await delta.apply(db)
+
+
+async def reconcile_inventory_stats(db: AsyncIOMotorDatabase) -> Dict[str, int]:
+    """
+        Recomputes every counter from `inventory_items`: one aggregation for the tenant
+        totals and one grouping the assets by ancestor path for the locations.
+    """
+    items = db.inventory_items
+    collection = db[INVENTORY_STATS_COLLECTION]
+    reconciled_at = time_now()
+
+    totals = await items.aggregate([{"$match": {"node_type": "ASSET"}}, ASSET_TOTALS_GROUP]).to_list(None)
+    total = totals[0]["total"] if totals else 0
+    checked = totals[0]["checked"] if totals else 0
+
+    by_prefix = {}
+    async for group in items.aggregate([
+        {"$match": {"node_type": "ASSET"}},
+        {"$project": {
+            "checked": {"$cond": [{"$eq": ["$checked", True]}, 1, 0]},
+            "prefixes": {"$map": {
+                "input": {"$range": [1, {"$size": {"$ifNull": ["$path", []]}}]},
+                "as": "size",
+                "in": {"$slice": ["$path", "$$size"]},
+            }},
+        }},
+        {"$unwind": "$prefixes"},
+        {"$group": {"_id": "$prefixes", "total": {"$sum": 1}, "checked": {"$sum": "$checked"}}},
+    ], allowDiskUse=True):
+        by_prefix[tuple(group["_id"])] = (group["total"], group["checked"])
+
+    operations = []
+    locations = 0
+    async for location in items.find(
+        {"node_type": "LOCATION"},
+        {"reference": 1, "parent_id": 1, "path": 1, "level": 1}
+    ):
+        location_total, location_checked = by_prefix.get(tuple(location.get("path") or []), (0, 0))
+        document = location_stats_document(location, location_total, location_checked)
+        operations.append(ReplaceOne(
+            {"_id": location["_id"]},
+            {**document, "reconciled_at": reconciled_at},
+            upsert=True
+        ))
+        locations += 1
+        if len(operations) >= STATS_WRITE_BATCH_SIZE:
+            await collection.bulk_write(operations, ordered=False)
+            operations = []
+
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+
+    # locations deleted since the previous run
+    await collection.delete_many({"scope": LOCATION_SCOPE, "reconciled_at": {"$lt": reconciled_at}})
+    await collection.replace_one(
+        {"_id": TENANT_STATS_ID},
+        {
+            "scope": TENANT_SCOPE,
+            "total_assets": total,
+            "checked_assets": checked,
+            "reconciled_at": reconciled_at,
+        },
+        upsert=True
+    )
+
+    return {"total_assets": total, "checked_assets": checked, "locations": locations}
+
+
+async def claim_reconciliation(db: AsyncIOMotorDatabase, stats: Dict[str, Any]) -> bool:
+    """
+        True for the single caller that should schedule a reconciliation of stale
+        counters; the claim is an atomic update on the tenant document.
+    """
+    now = time_now()
+    last = stats.get("reconcile_requested_at") or stats.get("reconciled_at")
+    if last is not None:
+        # the driver returns naive UTC datetimes
+        if last.tzinfo is None:
+            last = last.replace(tzinfo=timezone.utc)
+        if (now - last).total_seconds() < INVENTORY_STATS_RECONCILE_INTERVAL:
+            return False
+
+    result = await db[INVENTORY_STATS_COLLECTION].update_one(
+        {"_id": TENANT_STATS_ID, "reconcile_requested_at": stats.get("reconcile_requested_at")},
+        {"$set": {"reconcile_requested_at": now}}
+    )
+    return result.modified_count == 1
+
+
+async def live_inventory_stats(db: AsyncIOMotorDatabase, path: Optional[List[str]] = None) -> Dict[str, int]:
+    """
+        Asset counters of the tenant, or of the location at `path`, read straight from
+        `inventory_items`. Served while the tenant has not been reconciled yet.
+    """
+    match: Dict[str, Any] = {"node_type": "ASSET"}
+    if path:
+        match.update({f"path.{index}": reference for index, reference in enumerate(path)})
+        match[f"path.{len(path)}"] = {"$exists": True}
+
+    totals = await db.inventory_items.aggregate([{"$match": match}, ASSET_TOTALS_GROUP]).to_list(None)
+    return {
+        "total_assets": totals[0]["total"] if totals else 0,
+        "checked_assets": totals[0]["checked"] if totals else 0,
+    }
+
+
+async def claim_first_reconciliation(db: AsyncIOMotorDatabase) -> bool:
+    """
+        True for the single caller that should schedule the first reconciliation of a
+        tenant. The claim inserts the tenant document without `reconciled_at`, which
+        the reconciliation replaces.
+    """
+    try:
+        result = await db[INVENTORY_STATS_COLLECTION].update_one(
+            {"_id": TENANT_STATS_ID},
+            {"$setOnInsert": {"scope": TENANT_SCOPE, "reconcile_requested_at": time_now()}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return result.upserted_id is not None
@@ -0,0 +1,68 @@
+import base64
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId, json_util
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING
+
+# siblings are listed by reference, `_id` breaks ties so every position is unique
+KEYSET_SORT = [("reference", ASCENDING), ("_id", ASCENDING)]
+
+
+def encode_cursor(reference: Any, object_id: ObjectId) -> str:
+    raw = json_util.dumps({"r": reference, "i": object_id})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[Any, ObjectId]:
+    """Reverses `encode_cursor`, raises ValueError for tokens it did not produce."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        reference, object_id = data["r"], data["i"]
+    except Exception as error:
+        raise ValueError(f"Invalid cursor: {error}")
+
+    if not isinstance(object_id, ObjectId):
+        raise ValueError("Invalid cursor")
+    return reference, object_id
+
+
+def keyset_query(query: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+    if not cursor:
+        return query
+
+    reference, object_id = decode_cursor(cursor)
+    after = {
+        "$or": [
+            {"reference": {"$gt": reference}},
+            {"reference": reference, "_id": {"$gt": object_id}},
+        ]
+    }
+    return {"$and": [query, after]}
+
+
+async def keyset_page(
+    collection: AsyncIOMotorCollection,
+    query: Dict[str, Any],
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+        One page of `query` ordered by (reference, _id), starting after `cursor`.
+
+        Returns the documents and the `next` token, None on the last page. `skip` is
+        only honoured without a cursor, for clients still paging by offset.
+    """
+    find = collection.find(keyset_query(query, cursor)).sort(KEYSET_SORT)
+    if skip and not cursor:
+        find = find.skip(skip)
+
+    docs = await find.limit(limit + 1).to_list(None)
+    if len(docs) <= limit:
+        return docs, None
+
+    docs = docs[:limit]
+    last = docs[-1]
+    return docs, encode_cursor(last.get("reference"), last["_id"])
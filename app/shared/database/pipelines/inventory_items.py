@@ -2,11 +2,19 @@ from typing import Dict, Any, Optional, List
 from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCursor
 from bson import ObjectId
 
+from app.shared.database.ancestors import ancestor_nodes_stages, descendant_nodes_stages, subtree_query
 
 
 class InventoryItemsPipelines:
-    def __init__(self, database: AsyncIOMotorDatabase):
+    """
+        Tree aggregations of `inventory_items`. With `materialized_ancestors` (the tenant
+        passed `backfill_ancestors`) subtrees and ancestor chains are read through the
+        indexed `ancestors` field instead of a recursive $graphLookup.
+    """
+
+    def __init__(self, database: AsyncIOMotorDatabase, materialized_ancestors: bool = False):
         self._collection = database.inventory_items
+        self.materialized_ancestors = materialized_ancestors
 
     async def get_all_locations(
         self,
@@ -42,18 +50,11 @@ class InventoryItemsPipelines:
                         "node_type": { "$ne": "LOCATION" }
                     }
                 },
-                {
-                    "$graphLookup": {
-                        "from": "inventory_items",
-                        "startWith": "$_id",
-                        "connectFromField": "_id",
-                        "connectToField": "parent_id",
-                        "as": "descendants",
-                        "restrictSearchWithMatch": {
-                            "node_type": { "$ne": "LOCATION" }
-                        }
-                    }
-                },
+                *descendant_nodes_stages(
+                    "descendants",
+                    restrict_search={ "node_type": { "$ne": "LOCATION" } },
+                    materialized=self.materialized_ancestors
+                ),
                 { "$addFields": { "root_loc": "$parent_id" } },
                 {
                     "$project": {
@@ -110,16 +111,7 @@ class InventoryItemsPipelines:
         cursor: AsyncIOMotorCursor = self._collection.aggregate(
             [
                 { "$match": { "node_type": "LOCATION" } },
-                {
-                    "$graphLookup": {
-                        "from": "inventory_items",
-                        "startWith": "$parent_id",
-                        "connectFromField": "parent_id",
-                        "connectToField": "_id",
-                        "as": "ancestors",
-                        "depthField": "depth"
-                    }
-                },
+                *ancestor_nodes_stages("ancestors", "depth", self.materialized_ancestors),
                 {
                     "$addFields": {
                         "parent_locations": {
@@ -164,16 +156,7 @@ class InventoryItemsPipelines:
                         "photos": { "$exists": True, "$ne": [] }
                     } 
                 },
-                {
-                    "$graphLookup": {
-                        "from": "inventory_items",
-                        "startWith": "$parent_id",
-                        "connectFromField": "parent_id",
-                        "connectToField": "_id",
-                        "as": "ancestors",
-                        "depthField": "depth"
-                    }
-                },
+                *ancestor_nodes_stages("ancestors", "depth", self.materialized_ancestors),
                 {
                     "$addFields": {
                         "locations": {
@@ -210,18 +193,12 @@ class InventoryItemsPipelines:
         batch_size: Optional[int] = None,
         as_list: bool = True
     ):
-        cursor = self._collection.aggregate(
-            [
+        if self.materialized_ancestors:
+            subtree_stages = [{ "$match": subtree_query([parent_id]) }]
+        else:
+            subtree_stages = [
                 { "$match": { "_id": parent_id } },
-                {
-                    "$graphLookup": {
-                        "from": "inventory_items",
-                        "startWith": "$_id",
-                        "connectFromField": "_id",
-                        "connectToField": "parent_id",
-                        "as": "descendants"
-                    }
-                },
+                *descendant_nodes_stages("descendants", materialized=False),
                 {
                     "$addFields": {
                         "all_nodes": { "$concatArrays": [["$$ROOT"], "$descendants"] }
@@ -230,18 +207,13 @@ class InventoryItemsPipelines:
 
                 { "$unwind": "$all_nodes" },
                 { "$replaceRoot": { "newRoot": "$all_nodes" } },
+            ]
 
+        cursor = self._collection.aggregate(
+            [
+                *subtree_stages,
                 { "$match": { "node_type": "ASSET", "photos": { "$exists": True, "$ne": [] } } },
-                {
-                    "$graphLookup": {
-                        "from": "inventory_items",
-                        "startWith": "$parent_id",
-                        "connectFromField": "parent_id",
-                        "connectToField": "_id",
-                        "as": "parent_locations",
-                        "depthField": "depth"
-                    }
-                },
+                *ancestor_nodes_stages("parent_locations", "depth", self.materialized_ancestors),
                 {
                     "$addFields": {
                         "parent_locations": {
@@ -291,16 +263,7 @@ class InventoryItemsPipelines:
                         "node_type": "LOCATION"
                     }
                 },
-                {
-                    "$graphLookup": {
-                        "from": "inventory_items",
-                        "startWith": "$parent_id",
-                        "connectFromField": "parent_id",
-                        "connectToField": "_id",
-                        "as": "ancestor_nodes",
-                        "depthField": "level"
-                    }
-                },
+                *ancestor_nodes_stages("ancestor_nodes", "level", self.materialized_ancestors),
                 {
                     "$addFields": {
                         "parent_locations": {
@@ -0,0 +1,233 @@
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.shared.database.ancestors import TREE_STATE_COLLECTION
+
+load_dotenv()
+
+TREE_VERSION_ID = "version"
+# tenants whose snapshot is kept in memory, least recently used first out
+TREE_SNAPSHOT_CACHE_SIZE = int(os.getenv("TREE_SNAPSHOT_CACHE_SIZE", "8"))
+TREE_SNAPSHOT_LOAD_BATCH_SIZE = 5000
+NODE_TYPES = ("LOCATION", "ASSET")
+NO_NODE = -1
+
+
+async def tree_version(db: AsyncIOMotorDatabase) -> int:
+    state = await db[TREE_STATE_COLLECTION].find_one({"_id": TREE_VERSION_ID}, {"version": 1})
+    return state.get("version", 0) if state else 0
+
+
+async def bump_tree_version(db: AsyncIOMotorDatabase) -> None:
+    """Marks the tree of the tenant as changed; called after every write to nodes, references or parents."""
+    await db[TREE_STATE_COLLECTION].update_one(
+        {"_id": TREE_VERSION_ID},
+        {"$inc": {"version": 1}},
+        upsert=True
+    )
+
+
+def object_id_keys(object_ids: Sequence[ObjectId]) -> np.ndarray:
+    """ObjectIds as fixed 12 byte strings, which compare like the ids."""
+    return np.frombuffer(b"".join(object_id.binary for object_id in object_ids), dtype="S12")
+
+
+class TreeSnapshot:
+    """
+        Read-only copy of the shape of a tenant tree, in arrays indexed by node position.
+
+        Each node keeps its parent position, node type code and interned reference code;
+        children and namesakes are CSR lists (an offsets array into a positions array).
+        Ids are kept as 12 byte strings sorted for binary search, so no Python object
+        is kept per node. Ancestors walk the parent array, descendants expand
+        the child lists one level at a time.
+    """
+
+    def __init__(self, version: int, ids: List[ObjectId], parent_ids: List[Optional[ObjectId]], node_types: List[Any], references: List[Any]):
+        self.version = version
+        size = len(ids)
+
+        self._ids = object_id_keys(ids)
+        self._order = np.argsort(self._ids, kind="stable")
+        self._sorted_ids = self._ids[self._order]
+
+        self.parents = np.full(size, NO_NODE, dtype=np.int64)
+        with_parent = [index for index, parent_id in enumerate(parent_ids) if parent_id is not None]
+        if with_parent:
+            self.parents[with_parent] = self.positions([parent_ids[index] for index in with_parent])
+
+        type_codes = {node_type: code for code, node_type in enumerate(NODE_TYPES)}
+        self.node_types = np.fromiter((type_codes.get(node_type, NO_NODE) for node_type in node_types), dtype=np.int8, count=size)
+
+        codes, uniques = pd.factorize(pd.Series(references, dtype=object), use_na_sentinel=True)
+        self.reference_codes = codes.astype(np.int32)
+        self.references: List[str] = [str(reference) for reference in uniques]
+        self._reference_index = {reference: code for code, reference in enumerate(self.references)}
+
+        self.child_offsets, self.children = self._csr(self.parents, size)
+        self.namesake_offsets, self.namesakes = self._csr(self.reference_codes, len(self.references))
+
+    @staticmethod
+    def _csr(keys: np.ndarray, groups: int):
+        """Positions grouped by `keys` (negative keys left out): group g is positions[offsets[g]:offsets[g + 1]]."""
+        valid = np.flatnonzero(keys >= 0)
+        positions = valid[np.argsort(keys[valid], kind="stable")]
+        offsets = np.zeros(groups + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys[valid], minlength=groups), out=offsets[1:])
+        return offsets, positions
+
+    @classmethod
+    async def load(cls, db: AsyncIOMotorDatabase, version: int) -> "TreeSnapshot":
+        ids, parent_ids, node_types, references = [], [], [], []
+        async for node in db.inventory_items.find(
+            {},
+            {"parent_id": 1, "node_type": 1, "reference": 1}
+        ).batch_size(TREE_SNAPSHOT_LOAD_BATCH_SIZE):
+            ids.append(node["_id"])
+            parent_ids.append(node.get("parent_id"))
+            node_types.append(node.get("node_type"))
+            references.append(node.get("reference"))
+
+        return await asyncio.to_thread(cls, version, ids, parent_ids, node_types, references)
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def position(self, node_id: ObjectId) -> int:
+        """Position of `node_id`, NO_NODE when it is not in the tree."""
+        return int(self.positions([node_id])[0])
+
+    def positions(self, node_ids: Sequence[ObjectId]) -> np.ndarray:
+        if not len(node_ids) or not len(self._order):
+            return np.full(len(node_ids), NO_NODE, dtype=np.int64)
+
+        keys = object_id_keys(node_ids)
+        index = np.minimum(np.searchsorted(self._sorted_ids, keys), len(self._order) - 1)
+        return np.where(self._sorted_ids[index] == keys, self._order[index], NO_NODE)
+
+    def object_id(self, position: int) -> ObjectId:
+        # numpy drops the trailing zero bytes of fixed strings
+        return ObjectId(self._ids[position].ljust(12, b"\0"))
+
+    def object_ids(self, positions: Iterable[int]) -> List[ObjectId]:
+        return [self.object_id(position) for position in positions]
+
+    def reference(self, position: int) -> Optional[str]:
+        code = self.reference_codes[position]
+        return self.references[code] if code >= 0 else None
+
+    def ancestor_positions(self, position: int) -> List[int]:
+        """Root first, the node itself excluded."""
+        chain = []
+        parent = self.parents[position] if position != NO_NODE else NO_NODE
+        while parent != NO_NODE and len(chain) < len(self.parents):
+            chain.append(int(parent))
+            parent = self.parents[parent]
+        chain.reverse()
+        return chain
+
+    def ancestors(self, node_id: ObjectId) -> List[ObjectId]:
+        return self.object_ids(self.ancestor_positions(self.position(node_id)))
+
+    def ancestor_references(self, node_id: ObjectId, node_type: Optional[str] = None) -> List[str]:
+        """References of the ancestors of `node_id`, root first, only those of `node_type` when given."""
+        chain = self.ancestor_positions(self.position(node_id))
+        if node_type is not None:
+            code = NODE_TYPES.index(node_type)
+            chain = [position for position in chain if self.node_types[position] == code]
+        return [self.reference(position) for position in chain]
+
+    def location_path(self, node_id: ObjectId) -> List[str]:
+        """References of the LOCATION ancestors of `node_id`, root first."""
+        return self.ancestor_references(node_id, "LOCATION")
+
+    def descendant_positions(self, positions: np.ndarray) -> np.ndarray:
+        found = []
+        level = np.unique(positions[positions != NO_NODE])
+        # a tree is at most len(self) levels deep, the bound only matters for corrupt parents
+        for _ in range(len(self.parents)):
+            if not level.size:
+                break
+            starts = self.child_offsets[level]
+            counts = self.child_offsets[level + 1] - starts
+            total = int(counts.sum())
+            if not total:
+                break
+            # one gather per level: the child slices of every node of the level, back to back
+            shifts = np.repeat(starts - np.cumsum(counts) + counts, counts)
+            level = self.children[shifts + np.arange(total)]
+            found.append(level)
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def descendants(
+        self,
+        node_ids: Sequence[ObjectId],
+        node_type: Optional[str] = None,
+        include_self: bool = False
+    ) -> List[ObjectId]:
+        """Descendants of any of `node_ids`, once each, level by level; only those of `node_type` when given."""
+        roots = self.positions(node_ids)
+        found = self.descendant_positions(roots)
+        if include_self:
+            found = np.concatenate([np.unique(roots[roots != NO_NODE]), found])
+        found = found[np.sort(np.unique(found, return_index=True)[1])]
+        if node_type is not None:
+            found = found[self.node_types[found] == NODE_TYPES.index(node_type)]
+        return self.object_ids(found)
+
+    def with_reference(self, reference: str, node_type: Optional[str] = None) -> List[ObjectId]:
+        code = self._reference_index.get(reference)
+        if code is None:
+            return []
+        found = self.namesakes[self.namesake_offsets[code]:self.namesake_offsets[code + 1]]
+        if node_type is not None:
+            found = found[self.node_types[found] == NODE_TYPES.index(node_type)]
+        return self.object_ids(found)
+
+
+class TreeSnapshotCache:
+    """
+        Snapshots by tenant, reused while the tenant tree version is unchanged. One load
+        runs per tenant at a time, concurrent readers wait for it.
+    """
+
+    def __init__(self, max_size: int = TREE_SNAPSHOT_CACHE_SIZE):
+        self.max_size = max_size
+        self._snapshots: "OrderedDict[str, TreeSnapshot]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def get(self, db: AsyncIOMotorDatabase) -> TreeSnapshot:
+        version = await tree_version(db)
+        snapshot = self._snapshots.get(db.name)
+        if snapshot is not None and snapshot.version == version:
+            self._snapshots.move_to_end(db.name)
+            return snapshot
+
+        async with self._locks.setdefault(db.name, asyncio.Lock()):
+            snapshot = self._snapshots.get(db.name)
+            if snapshot is None or snapshot.version != version:
+                # read before loading, a write made meanwhile bumps past it and forces a reload
+                snapshot = await TreeSnapshot.load(db, version)
+                self._snapshots[db.name] = snapshot
+            self._snapshots.move_to_end(db.name)
+            while len(self._snapshots) > self.max_size:
+                self._snapshots.popitem(last=False)
+            return snapshot
+
+    def clear(self) -> None:
+        self._snapshots.clear()
+
+
+tree_snapshots = TreeSnapshotCache()
+
+
+async def get_tree_snapshot(db: AsyncIOMotorDatabase) -> TreeSnapshot:
+    return await tree_snapshots.get(db)
@@ -0,0 +1,45 @@
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from redis.exceptions import LockError, RedisError
+
+from app.core.redis import RedisConnection
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def distributed_lock(
+    name: str,
+    timeout: float = 300,
+    blocking_timeout: float = 0
+) -> AsyncIterator[bool]:
+    """
+        Redis lock shared by every API and Celery worker process.
+
+        Yields True when the lock was acquired and False when another process
+        holds it. If Redis cannot be reached the body runs unlocked (yields True),
+        so callers must only guard idempotent work with it.
+    """
+    lock = RedisConnection.get_client().lock(
+        f"lock:{name}",
+        timeout=timeout,
+        blocking_timeout=blocking_timeout
+    )
+
+    try:
+        acquired = bool(await lock.acquire())
+    except RedisError as error:
+        logger.warning("Redis unavailable, running '%s' without lock: %s", name, error)
+        yield True
+        return
+
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                await lock.release()
+            except (LockError, RedisError):
+                pass
@@ -1,4 +1,19 @@
+import io
+from pathlib import PurePosixPath
+from typing import Any, Dict, List, Optional
+
 import magic
+from PIL import Image, ImageOps
+
+from app.shared.files.photo_size_choices import PhotoSizeChoice
+
+# longest side of each derivative, in pixels
+PHOTO_DERIVATIVE_SIZES = {
+    PhotoSizeChoice.THUMBNAIL: 256,
+    PhotoSizeChoice.PREVIEW: 1024,
+}
+PHOTO_DERIVATIVE_QUALITY = 80
+PHOTO_DERIVATIVES_FIELD = "photo_derivatives"
 
 def detect_image_extension(data: bytes) -> str:
     mime = magic.from_buffer(data, mime=True)
@@ -7,3 +22,38 @@ def detect_image_extension(data: bytes) -> str:
         return "bin"
 
     return mime.split("/")[-1]
+
+def render_photo_derivatives(data: bytes) -> Dict[str, bytes]:
+    """
+        JPEG derivatives of a photo, one per PHOTO_DERIVATIVE_SIZES entry, keyed by
+        size. Runs in a worker process, so it only takes and returns bytes.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source).convert("RGB")
+
+    derivatives = {}
+    for size, pixels in PHOTO_DERIVATIVE_SIZES.items():
+        derivative = image.copy()
+        derivative.thumbnail((pixels, pixels), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        derivative.save(output, format="JPEG", quality=PHOTO_DERIVATIVE_QUALITY, optimize=True)
+        derivatives[size.value] = output.getvalue()
+    return derivatives
+
+def photo_derivative_key(key: str, size: PhotoSizeChoice) -> str:
+    path = PurePosixPath(key)
+    return str(path.parent / "derivatives" / size.value.lower() / f"{path.stem}.jpg")
+
+def photo_keys_for_size(doc: Dict[str, Any], size: Optional[PhotoSizeChoice]) -> List[str]:
+    """Photo keys of an item in the requested size, the original where no derivative exists yet."""
+    photos = doc.get("photos") or []
+    if isinstance(photos, str):
+        photos = [photos]
+    if not size or size == PhotoSizeChoice.ORIGINAL:
+        return list(photos)
+
+    derivatives = {
+        entry.get(PhotoSizeChoice.ORIGINAL.value): entry
+        for entry in doc.get(PHOTO_DERIVATIVES_FIELD) or []
+    }
+    return [derivatives.get(key, {}).get(size.value, key) for key in photos]
@@ -0,0 +1,6 @@
+from enum import Enum
+
+class PhotoSizeChoice(str, Enum):
+    ORIGINAL = "ORIGINAL"
+    PREVIEW = "PREVIEW"
+    THUMBNAIL = "THUMBNAIL"
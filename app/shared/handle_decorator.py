@@ -1,20 +1,91 @@
+from typing import Dict, FrozenSet, List, Optional, Tuple
 from fastapi import Request
 from fastapi.routing import APIRoute
-from starlette.routing import Match
-from functools import lru_cache
+from starlette.types import Scope
 
+ROUTE_FLAGS = ("no_auth", "no_tenant_required")
+NO_FLAGS: FrozenSet[str] = frozenset()
 
-@lru_cache
-def route_has_decorator(endpoint, decorator: str) -> bool:
-    return bool(getattr(endpoint, decorator, False))
+
+class RouteFlagTable:
+    """
+        Decorator flags of every APIRoute, keyed by (route template, method).
+
+        Routes without path parameters are resolved with a single dict lookup,
+        unless a parameterized route declared before them matches their path. Any
+        other path is matched against the route regexes in declaration order, the
+        order Starlette dispatches in.
+    """
+
+    def __init__(self, routes):
+        self.flags: Dict[Tuple[str, str], FrozenSet[str]] = {}
+        self._static: Dict[Tuple[str, str], str] = {}
+        self._routes: List[APIRoute] = []
+
+        for route in routes:
+            if not isinstance(route, APIRoute):
+                continue
+
+            flags = frozenset(
+                flag for flag in ROUTE_FLAGS
+                if getattr(route.endpoint, flag, False)
+            )
+
+            for method in route.methods:
+                self.flags.setdefault((route.path_format, method), flags)
+                if not route.param_convertors and self._match(route.path_format, method) is None:
+                    self._static[(route.path_format, method)] = route.path_format
+
+            self._routes.append(route)
+
+    def _match(self, path: str, method: str) -> Optional[str]:
+        for route in self._routes:
+            if method in route.methods and route.path_regex.match(path):
+                return route.path_format
+        return None
+
+    def resolve_template(self, path: str, method: str) -> Optional[str]:
+        template = self._static.get((path, method))
+        if template is not None:
+            return template
+        return self._match(path, method)
+
+    def resolve(self, path: str, method: str) -> FrozenSet[str]:
+        template = self.resolve_template(path, method)
+        if template is None:
+            return NO_FLAGS
+        return self.flags[(template, method)]
+
+
+def get_route_flag_table(app) -> RouteFlagTable:
+    table = getattr(app.state, "route_flags", None)
+    if table is None:
+        table = RouteFlagTable(app.routes)
+        app.state.route_flags = table
+    return table
+
+
+def route_path(scope: Scope) -> str:
+    """The request path without the `root_path` the app is mounted under."""
+    path = scope["path"]
+    root_path = scope.get("root_path") or ""
+    if not root_path or not path.startswith(root_path):
+        return path
+    if path == root_path:
+        return ""
+    if path[len(root_path)] == "/":
+        return path[len(root_path):]
+    return path
+
+
+def route_flags(scope: Scope) -> FrozenSet[str]:
+    flags = scope.get("route_flags")
+    if flags is None:
+        table = get_route_flag_table(scope["app"])
+        flags = table.resolve(route_path(scope), scope["method"])
+        scope["route_flags"] = flags
+    return flags
 
 
 def handle_decorator(decorator: str, request: Request) -> bool:
-    for route in request.app.routes:
-        if isinstance(route, APIRoute):
-            match, _ = route.matches(request.scope)
-            if match == Match.FULL:
-                endpoint_func = route.endpoint
-                if getattr(endpoint_func, decorator, False):
-                    return True
-    return False
\ No newline at end of file
+    return decorator in route_flags(request.scope)
@@ -1,43 +1,143 @@
+import logging
+from typing import Any, Dict, List, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+from app.core.database import MongoConnection
+from app.shared.datetime import time_now
+from app.shared.distributed_lock import distributed_lock
+
+logger = logging.getLogger(__name__)
+
+# Bump INDEXES_VERSION whenever INDEX_MANIFEST or OBSOLETE_INDEXES changes so every tenant is provisioned again.
+INDEXES_VERSION = 7
+
+INDEX_MANIFEST: List[Tuple[str, List[Tuple[str, int]], Dict[str, Any]]] = [
+    ("inventory_items", [("parent_id", ASCENDING)], {}),
+    ("inventory_items", [("node_type", ASCENDING)], {}),
+    ("inventory_items", [("reference", ASCENDING)], {}),
+    ("inventory_items", [("path", ASCENDING)], {}),
+    # children lookups by reference and keyset pages ordered by (reference, _id)
+    ("inventory_items", [("parent_id", ASCENDING), ("reference", ASCENDING), ("_id", ASCENDING)], {}),
+    # subtrees of a node, multikey over the materialized ancestor ids
+    ("inventory_items", [("ancestors", ASCENDING)], {}),
+    # imported trees may repeat references, so uniqueness only binds the nodes created by the app
+    (
+        "inventory_items",
+        [("root_id", ASCENDING), ("reference", ASCENDING)],
+        {
+            "name": "root_id_reference_app_created_unique",
+            "unique": True,
+            "partialFilterExpression": {"is_app_created": True, "root_id": {"$exists": True}},
+        },
+    ),
+    ("inventory_checks", [("item_id", ASCENDING)], {}),
+    ("inventory_checks", [("session_id", ASCENDING)], {}),
+    ("inventory_checks", [("parent_id", ASCENDING)], {}),
+    ("inventory_checks", [("reference", ASCENDING)], {}),
+    ("inventory_checks", [("path", ASCENDING)], {}),
+    ("inventory_checks", [("checked_at", ASCENDING)], {}),
+    # dashboard counters, matched by location path and listed by parent
+    ("inventory_stats", [("scope", ASCENDING), ("path", ASCENDING)], {}),
+    ("inventory_stats", [("scope", ASCENDING), ("parent_id", ASCENDING), ("reference", ASCENDING)], {}),
+]
+
+# indexes removed from INDEX_MANIFEST, dropped from the tenants provisioned before
+OBSOLETE_INDEXES: List[Tuple[str, str]] = [
+    # (reference, root_id), replaced by root_id_reference_app_created_unique
+    ("inventory_items", "reference_1_root_id_1"),
+]
+INDEX_NOT_FOUND = 27
+NAMESPACE_NOT_FOUND = 26
+
+INDEX_MANIFEST_COLLECTION = "index_manifest"
+INDEX_MANIFEST_ID = "indexes"
+SYSTEM_DATABASES = {"admin", "config", "local"}
+
+
+async def create_indexes(db: AsyncIOMotorDatabase) -> List[str]:
+    """
+        Drops OBSOLETE_INDEXES and creates every index of INDEX_MANIFEST, one failing (a
+        unique index over duplicated data raises DuplicateKeyError) is logged and the
+        others are still created. Returns a description of each index that failed.
+    """
+    failed = []
+    for collection, name in OBSOLETE_INDEXES:
+        try:
+            await db[collection].drop_index(name)
+        except OperationFailure as error:
+            if error.code in (INDEX_NOT_FOUND, NAMESPACE_NOT_FOUND):
+                continue
+            failed.append(f"drop {collection}.{name}: {error}")
+            logger.exception("Could not drop index %s on '%s.%s'", name, db.name, collection)
+
+    for collection, keys, options in INDEX_MANIFEST:
+        try:
+            await db[collection].create_index(keys, **options)
+        except OperationFailure as error:
+            failed.append(f"create {collection} {keys}: {error}")
+            logger.exception("Could not create index %s on '%s.%s'", keys, db.name, collection)
+    return failed
 
 
-async def create_indexes(db):
-    await db.inventory_items.create_index(
-        [("parent_id", ASCENDING)]
-    )
+async def get_applied_indexes_version(db: AsyncIOMotorDatabase) -> int:
+    manifest = await db[INDEX_MANIFEST_COLLECTION].find_one({"_id": INDEX_MANIFEST_ID})
+    return manifest.get("version", 0) if manifest else 0
 
-    await db.inventory_items.create_index(
-        [("node_type", ASCENDING)]
-    )
 
-    await db.inventory_items.create_index(
-        [("reference", ASCENDING)]
-    )
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> bool:
+    """
+        Applies INDEX_MANIFEST to a tenant database once per INDEXES_VERSION.
 
-    await db.inventory_items.create_index(
-        [("path", ASCENDING)]
-    )
+        The applied version is stored in the tenant `index_manifest` collection and
+        the work runs under a Redis lock, so concurrent API and Celery processes do
+        not repeat it. When an index fails the version is not recorded and the failures
+        are stored in the manifest as `failed_indexes` until a later start, which tries
+        again, succeeds. Returns True when the indexes were created by this call.
+    """
+    if await get_applied_indexes_version(db) >= INDEXES_VERSION:
+        return False
 
-    await db.inventory_checks.create_index(
-        [("item_id", ASCENDING)],
-    )
+    async with distributed_lock(f"mongo_indexes:{db.name}") as acquired:
+        if not acquired:
+            return False
 
-    await db.inventory_checks.create_index(
-        [("session_id", ASCENDING)]
-    )
+        if await get_applied_indexes_version(db) >= INDEXES_VERSION:
+            return False
 
-    await db.inventory_checks.create_index(
-        [("parent_id", ASCENDING)]
-    )
+        failed = await create_indexes(db)
+        if failed:
+            await db[INDEX_MANIFEST_COLLECTION].update_one(
+                {"_id": INDEX_MANIFEST_ID},
+                {"$set": {"failed_indexes": failed, "failed_version": INDEXES_VERSION, "failed_at": time_now()}},
+                upsert=True
+            )
+            logger.error(
+                "Indexes version %s NOT applied to tenant '%s', %s index operations failed; retried on the next start: %s",
+                INDEXES_VERSION, db.name, len(failed), failed
+            )
+            return False
+        await db[INDEX_MANIFEST_COLLECTION].update_one(
+            {"_id": INDEX_MANIFEST_ID},
+            {
+                "$set": {"version": INDEXES_VERSION, "applied_at": time_now()},
+                "$unset": {"failed_indexes": "", "failed_version": "", "failed_at": ""},
+            },
+            upsert=True
+        )
 
-    await db.inventory_checks.create_index(
-        [("reference", ASCENDING)]
-    )
+    logger.info("Indexes version %s applied to tenant '%s'", INDEXES_VERSION, db.name)
+    return True
 
-    await db.inventory_checks.create_index(
-        [("path", ASCENDING)]
-    )
 
-    await db.inventory_checks.create_index(
-        [("checked_at", ASCENDING)]
-    )
\ No newline at end of file
+async def ensure_all_tenant_indexes() -> None:
+    client = MongoConnection.get_client()
+    for db_name in await client.list_database_names():
+        if db_name in SYSTEM_DATABASES:
+            continue
+        try:
+            await ensure_indexes(client.get_database(db_name))
+        except Exception:
+            logger.exception("Could not provision indexes for tenant '%s'", db_name)
@@ -0,0 +1,204 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# prometheus_client switches to multiprocess mode when the variable merely exists, an
+# empty value (as loaded from .env) would write its files to the working directory
+if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from pymongo import monitoring
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Prometheus multiprocess mode is used when PROMETHEUS_MULTIPROC_DIR is set
+# (several uvicorn workers or prefork Celery children behind one endpoint).
+MULTIPROCESS_MODE = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+if MULTIPROCESS_MODE:
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TASK_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "API request latency by route template and tenant.",
+    ["method", "route", "tenant", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+MONGO_COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds",
+    "Mongo command latency.",
+    ["command", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+MONGO_POOL_CHECKOUT_WAIT = Histogram(
+    "mongo_pool_checkout_wait_seconds",
+    "Time spent waiting to check a connection out of the Mongo pool.",
+    ["outcome"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+
+MONGO_POOL_CHECKED_OUT = Gauge(
+    "mongo_pool_checked_out_connections",
+    "Mongo connections currently checked out of the pool.",
+    multiprocess_mode="livesum",
+)
+
+S3_OPERATION_DURATION = Histogram(
+    "s3_operation_duration_seconds",
+    "S3 operation latency.",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+
+S3_TRANSFERRED_BYTES = Counter(
+    "s3_transferred_bytes",
+    "Bytes uploaded to or downloaded from S3.",
+    ["direction"],
+)
+
+ASYNC_TASK_DURATION = Histogram(
+    "async_task_duration_seconds",
+    "Async task duration by task type and outcome.",
+    ["task_type", "status"],
+    buckets=TASK_BUCKETS,
+)
+
+
+@contextmanager
+def observe_s3(operation: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        S3_OPERATION_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+
+def count_s3_bytes(direction: str, size: Optional[int]) -> None:
+    if size:
+        S3_TRANSFERRED_BYTES.labels(direction).inc(size)
+
+
+class MongoMetricsListener(monitoring.CommandListener, monitoring.ConnectionPoolListener):
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        MONGO_COMMAND_DURATION.labels(event.command_name, "success").observe(event.duration_micros / 1_000_000)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        MONGO_COMMAND_DURATION.labels(event.command_name, "failure").observe(event.duration_micros / 1_000_000)
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        MONGO_POOL_CHECKOUT_WAIT.labels("success").observe(event.duration)
+        MONGO_POOL_CHECKED_OUT.inc()
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        MONGO_POOL_CHECKOUT_WAIT.labels("failure").observe(event.duration)
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        MONGO_POOL_CHECKED_OUT.dec()
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        pass
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+
+class PrometheusMiddleware:
+    """Observes the latency of every HTTP request labelled by its route template and tenant."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            tenant = scope.get("state", {}).get("tenant")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"],
+                getattr(route, "path_format", "unmatched"),
+                tenant.database if tenant else "none",
+                str(status_code),
+            ).observe(time.perf_counter() - started)
+
+
+def clear_multiprocess_dir() -> None:
+    """
+        Removes the value files left by previous runs. Called once by the parent
+        process before its workers start, never by a worker.
+    """
+    if not MULTIPROCESS_MODE:
+        return
+
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    for name in os.listdir(directory):
+        if name.endswith(".db"):
+            os.remove(os.path.join(directory, name))
+
+
+def metrics_registry() -> CollectorRegistry:
+    if not MULTIPROCESS_MODE:
+        from prometheus_client import REGISTRY
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics() -> bytes:
+    return generate_latest(metrics_registry())
+
+
+def start_metrics_server(port: int) -> None:
+    start_http_server(port, registry=metrics_registry())
+
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
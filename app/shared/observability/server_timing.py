@@ -0,0 +1,135 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from fastapi.responses import JSONResponse
+from pymongo import monitoring
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+load_dotenv()
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger("app.server_timing")
+
+_current_timings: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Cumulative duration and call count of each phase measured during one request."""
+
+    def __init__(self):
+        self.phases: Dict[str, List[float]] = {}
+        self._lock = Lock()
+
+    def add(self, phase: str, seconds: float) -> None:
+        # Mongo command listeners report from motor's executor threads
+        with self._lock:
+            totals = self.phases.setdefault(phase, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += 1
+
+    def header_value(self, total_seconds: float) -> str:
+        metrics = [
+            f'{phase};dur={seconds * 1000:.2f};desc="{count} calls"'
+            for phase, (seconds, count) in self.phases.items()
+        ]
+        metrics.append(f"total;dur={total_seconds * 1000:.2f}")
+        return ", ".join(metrics)
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        return {
+            phase: {"ms": round(seconds * 1000, 2), "count": count}
+            for phase, (seconds, count) in self.phases.items()
+        }
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+def record(phase: str, seconds: float) -> None:
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """
+        Adds the duration of the block to `phase` of the current request. Executor threads
+        do not inherit the request context, so work run in them is timed by wrapping the
+        await of the whole batch, not inside the threads.
+    """
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - started)
+
+
+class ServerTimingMiddleware:
+    """
+        Collects per-phase timings (auth, tenant, mongo, s3, serialize) for each
+        request, emits them as a `Server-Timing` response header and logs them as
+        one JSON line.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        started = time.perf_counter()
+
+        async def send_with_timings(message: Message):
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - started
+                MutableHeaders(scope=message).append("Server-Timing", timings.header_value(total))
+                logger.info(json.dumps({
+                    "event": "server_timing",
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": message["status"],
+                    "total_ms": round(total * 1000, 2),
+                    "phases": timings.as_dict(),
+                }))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            _current_timings.reset(token)
+
+
+class TimedJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        with timed("serialize"):
+            return super().render(content)
+
+
+class MongoTimingListener(monitoring.CommandListener):
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        record("mongo", event.duration_micros / 1_000_000)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        record("mongo", event.duration_micros / 1_000_000)
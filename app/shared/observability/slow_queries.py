@@ -0,0 +1,211 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from bson import json_util
+from dotenv import load_dotenv
+from pymongo import MongoClient, monitoring
+
+from app.shared.cache.ttl_cache import TTLCache
+from app.shared.datetime import time_now
+
+load_dotenv()
+
+MONGO_SLOW_QUERY_MS = float(os.getenv("MONGO_SLOW_QUERY_MS", "0"))
+MONGO_SLOW_QUERY_EXPLAIN = os.getenv("MONGO_SLOW_QUERY_EXPLAIN", "false").lower() in ("1", "true", "yes")
+MONGO_SLOW_QUERY_EXPLAIN_VERBOSITY = os.getenv("MONGO_SLOW_QUERY_EXPLAIN_VERBOSITY", "executionStats")
+MONGO_SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("MONGO_SLOW_QUERY_EXPLAIN_INTERVAL", "600"))
+
+SLOW_QUERIES_COLLECTION = "slow_queries"
+
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+
+# driver/session fields that are not part of the query and are rejected inside explain
+DRIVER_FIELDS = {"$db", "lsid", "$clusterTime", "$readPreference", "txnNumber", "readConcern", "writeConcern", "apiVersion"}
+
+# values kept verbatim in the shape because they name fields or collections, not user data
+STRUCTURAL_KEYS = {
+    "from", "as", "localField", "foreignField", "connectFromField", "connectToField",
+    "depthField", "startWith", "path", "includeArrayIndex", "sortBy", "newRoot",
+}
+
+logger = logging.getLogger("app.slow_queries")
+
+
+def redact_shape(value: Any, key: Optional[str] = None) -> Any:
+    """Replaces literal values with '?' while keeping operators, field names and field paths."""
+    if isinstance(value, dict):
+        return {k: redact_shape(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(not isinstance(item, (dict, list, tuple)) for item in value):
+            return ["?"]
+        return [redact_shape(item, key) for item in value]
+    if isinstance(value, str) and (value.startswith("$") or key in STRUCTURAL_KEYS):
+        return value
+    if key in STRUCTURAL_KEYS and isinstance(value, (int, bool)):
+        return value
+    return "?"
+
+
+def command_shape(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    if command_name == "aggregate":
+        return {"pipeline": redact_shape(command.get("pipeline", []))}
+    if command_name in ("update", "delete"):
+        statements = command.get("updates") or command.get("deletes") or []
+        return {"q": redact_shape(statements[0].get("q", {}))} if statements else {}
+    if command_name == "findAndModify":
+        return {"query": redact_shape(command.get("query", {}))}
+    if command_name == "distinct":
+        return {"key": command.get("key"), "query": redact_shape(command.get("query", {}))}
+    return {
+        "filter": redact_shape(command.get("filter", command.get("query", {}))),
+        "sort": redact_shape(command.get("sort")) if command.get("sort") else None,
+    }
+
+
+def explain_command(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    """The command as sent to `explain`, which only takes single-statement writes."""
+    explainable = {k: v for k, v in command.items() if k not in DRIVER_FIELDS}
+    for field in ("updates", "deletes"):
+        if command_name in ("update", "delete") and explainable.get(field):
+            explainable[field] = explainable[field][:1]
+    return explainable
+
+
+def shape_hash(db_name: str, collection: str, command_name: str, shape: Dict[str, Any]) -> str:
+    raw = json.dumps([db_name, collection, command_name, shape], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    stages = []
+    stats = {"docs_examined": 0, "keys_examined": 0, "returned": 0}
+
+    def collect_stages(plan: Any):
+        if isinstance(plan, dict):
+            if "stage" in plan and plan["stage"] not in stages:
+                stages.append(plan["stage"])
+            for value in plan.values():
+                collect_stages(value)
+        elif isinstance(plan, list):
+            for value in plan:
+                collect_stages(value)
+
+    def walk(node: Any):
+        if isinstance(node, dict):
+            if "winningPlan" in node:
+                collect_stages(node["winningPlan"])
+            execution = node.get("executionStats")
+            if isinstance(execution, dict):
+                stats["docs_examined"] += execution.get("totalDocsExamined", 0)
+                stats["keys_examined"] += execution.get("totalKeysExamined", 0)
+                stats["returned"] += execution.get("nReturned", 0)
+            for key, value in node.items():
+                if key not in ("winningPlan", "executionStats"):
+                    walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(explain)
+    return {
+        "stages": stages,
+        "collection_scan": "COLLSCAN" in stages,
+        **stats,
+    }
+
+
+class SlowQueryExplainer:
+    """
+        Background thread that runs `explain` for slow commands and stores a plan
+        summary in the tenant `slow_queries` collection. Uses its own synchronous
+        client without listeners, so explains are never reported as slow queries.
+    """
+
+    def __init__(self, mongo_uri: str, max_pending: int = 100):
+        self._mongo_uri = mongo_uri
+        self._pending: "queue.Queue[Tuple[str, Dict[str, Any], Dict[str, Any]]]" = queue.Queue(max_pending)
+        self._client: Optional[MongoClient] = None
+        self._thread = threading.Thread(target=self._run, name="slow-query-explainer", daemon=True)
+        self._thread.start()
+
+    def submit(self, db_name: str, command: Dict[str, Any], record: Dict[str, Any]) -> None:
+        try:
+            self._pending.put_nowait((db_name, command, record))
+        except queue.Full:
+            pass
+
+    def _run(self) -> None:
+        while True:
+            db_name, command, record = self._pending.get()
+            try:
+                if self._client is None:
+                    self._client = MongoClient(self._mongo_uri, serverSelectionTimeoutMS=5000)
+                db = self._client[db_name]
+                explain = db.command(
+                    {"explain": command, "verbosity": MONGO_SLOW_QUERY_EXPLAIN_VERBOSITY}
+                )
+                db[SLOW_QUERIES_COLLECTION].insert_one({
+                    **record,
+                    "plan": summarize_explain(explain),
+                    "captured_at": time_now(),
+                })
+            except Exception as error:
+                logger.warning("Could not explain slow %s on %s: %s", record.get("command"), db_name, error)
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """
+        Logs Mongo commands slower than `threshold_ms`. The command of a running
+        query is only kept with an explainer, then the log also carries a redacted
+        shape of its filter or pipeline.
+    """
+
+    def __init__(self, threshold_ms: float, explainer: Optional[SlowQueryExplainer] = None):
+        self.threshold_micros = threshold_ms * 1000
+        self.explainer = explainer
+        self._started: Dict[Tuple[Any, int], Tuple[str, Any, Optional[Dict[str, Any]]]] = {}
+        self._explained: TTLCache[bool] = TTLCache(max_size=1000, default_ttl=MONGO_SLOW_QUERY_EXPLAIN_INTERVAL)
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name not in EXPLAINABLE_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        if collection == SLOW_QUERIES_COLLECTION:
+            return
+        self._started[(event.connection_id, event.request_id)] = (
+            event.database_name,
+            collection,
+            event.command if self.explainer else None
+        )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event)
+
+    def _finish(self, event) -> None:
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None or event.duration_micros < self.threshold_micros:
+            return
+
+        db_name, collection, command = started
+        shape = command_shape(event.command_name, command) if command is not None else None
+        record = {
+            "database": db_name,
+            "collection": collection if isinstance(collection, str) else None,
+            "command": event.command_name,
+            "shape": shape,
+            "shape_hash": shape_hash(db_name, str(collection), event.command_name, shape),
+            "duration_ms": round(event.duration_micros / 1000, 2),
+        }
+        logger.warning(json_util.dumps({"event": "slow_query", **record}))
+
+        if command is not None and self._explained.get(record["shape_hash"]) is None:
+            self._explained.set(record["shape_hash"], True)
+            self.explainer.submit(db_name, explain_command(event.command_name, command), record)
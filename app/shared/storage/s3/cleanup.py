@@ -0,0 +1,38 @@
+import asyncio
+from typing import Iterable
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.shared.datetime import time_now
+from app.shared.storage.s3.objects import S3_DELETE_BATCH_SIZE, storage_s3_delete_objects
+from app.shared.storage.s3.presign import presign_service
+
+STORAGE_CLEANUP_COLLECTION = "storage_cleanup"
+
+
+async def queue_storage_cleanup(db: AsyncIOMotorDatabase, keys: Iterable[str]) -> int:
+    """
+        Records storage keys whose objects must be deleted. The queue lives in the tenant
+        database, so keys of deleted items survive a crash until a drain removes them.
+    """
+    documents = [{"key": key, "queued_at": time_now()} for key in dict.fromkeys(keys) if key]
+    if documents:
+        await db[STORAGE_CLEANUP_COLLECTION].insert_many(documents, ordered=False)
+    return len(documents)
+
+
+async def drain_storage_cleanup(db: AsyncIOMotorDatabase, batch_size: int = S3_DELETE_BATCH_SIZE) -> int:
+    """Deletes the queued objects with one DeleteObjects request per batch; returns how many were removed."""
+    collection = db[STORAGE_CLEANUP_COLLECTION]
+    deleted = 0
+    while True:
+        entries = await collection.find({}, {"key": 1}).sort("_id", 1).limit(batch_size).to_list(None)
+        if not entries:
+            return deleted
+
+        keys = [entry["key"] for entry in entries]
+        # deleting a missing key succeeds, a concurrent drain of the same entries is harmless
+        await asyncio.to_thread(storage_s3_delete_objects, keys)
+        presign_service.invalidate(keys)
+        await collection.delete_many({"_id": {"$in": [entry["_id"] for entry in entries]}})
+        deleted += len(keys)
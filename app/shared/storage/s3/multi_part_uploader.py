@@ -5,6 +5,7 @@ import boto3
 from app.shared.storage.s3.client import get_s3_client
 import os
 from app.shared.storage.s3.objects import storage_s3_retrieve_objects_url
+from app.shared.observability.metrics import count_s3_bytes, observe_s3
 
 
 class MultipartUploader:
@@ -46,16 +47,18 @@ class MultipartUploader:
         self.buffer.seek(0)
         data = self.buffer.read()
 
-        resp = await self._loop.run_in_executor(
-            None,
-            lambda: self.s3.upload_part(
-                Bucket=self.bucket,
-                Key=self.key,
-                UploadId=self.upload_id,
-                PartNumber=self.part_number,
-                Body=data
+        with observe_s3("upload_part"):
+            resp = await self._loop.run_in_executor(
+                None,
+                lambda: self.s3.upload_part(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self.upload_id,
+                    PartNumber=self.part_number,
+                    Body=data
+                )
             )
-        )
+        count_s3_bytes("upload", len(data))
 
         self.parts.append({
             "PartNumber": self.part_number,
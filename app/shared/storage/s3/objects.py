@@ -2,20 +2,28 @@ import os
 from starlette.datastructures import UploadFile
 from app.shared.exceptions.storage import StorageError
 from app.shared.storage.s3.client import get_s3_client
-from typing import Union, List
+from typing import BinaryIO, Union, List
 from uuid import uuid4
 from pathlib import Path
 from datetime import datetime
 import asyncio
 from app.shared.files.files_type_choices import FileTypeChoices
+from app.shared.observability.metrics import count_s3_bytes, observe_s3
+from app.shared.observability.server_timing import timed
 from pathlib import Path, PurePosixPath
 
+# DeleteObjects accepts up to 1000 keys per request
+S3_DELETE_BATCH_SIZE = 1000
+
 
 def generate_s3_storage_object_key(prefix: str, file: UploadFile) -> str:
     if not isinstance(file, UploadFile):
         raise ValueError("File must be a UploadFile instance.")
 
-    path = Path(file.filename)
+    return generate_s3_storage_file_key(prefix, file.filename)
+
+def generate_s3_storage_file_key(prefix: str, filename: str) -> str:
+    path = Path(filename)
     file_name = path.stem.lower().replace(" ", "_")
     extension = path.suffix.lower()
     timestamp = datetime.now().strftime("%d%m%Y_%H%M%S")
@@ -50,11 +58,12 @@ def generate_s3_presigned_url(key: str, expires_in: int = 3600) -> str:
     
     try:
         s3_client = get_s3_client()
-        url = s3_client.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": bucket_name, "Key": key},
-            ExpiresIn=expires_in
-        )
+        with timed("s3"), observe_s3("presign"):
+            url = s3_client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": bucket_name, "Key": key},
+                ExpiresIn=expires_in
+            )
     except Exception as error:
         raise StorageError(
             f"Error on generate presigned URL for {key}: {error}"
@@ -62,24 +71,6 @@ def generate_s3_presigned_url(key: str, expires_in: int = 3600) -> str:
 
     return url
 
-def storage_s3_save_object(file: UploadFile, relative_save_path: str) -> str:
-    bucket_name = os.getenv("AWS_S3_BUCKET")
-    if not bucket_name:
-        raise StorageError("AWS_S3_BUCKET not present in .env.")
-
-    try:
-        get_s3_client().upload_fileobj(
-            file.file,
-            bucket_name,
-            relative_save_path
-        )
-    except Exception as error:
-        raise StorageError(
-            f"Error saving object to cloud storage: {error}."
-        )
-
-    return generate_s3_presigned_url(relative_save_path)
-
 async def storage_s3_retrieve_objects_url(relative_paths: Union[str, List[str]]) -> Union[None, str, List[str]]:
     if not relative_paths:
         return None
@@ -90,8 +81,9 @@ async def storage_s3_retrieve_objects_url(relative_paths: Union[str, List[str]])
     if isinstance(relative_paths, list):
         try:
             async_loop = asyncio.get_running_loop()
-            tasks = [async_loop.run_in_executor(None, generate_presigned_url, relative_path) for relative_path in relative_paths]
-            results = await asyncio.gather(*tasks)
+            with timed("s3"):
+                tasks = [async_loop.run_in_executor(None, generate_presigned_url, relative_path) for relative_path in relative_paths]
+                results = await asyncio.gather(*tasks)
             return [result for result in results if result]        
         except Exception as error:
             raise StorageError(
@@ -101,22 +93,64 @@ async def storage_s3_retrieve_objects_url(relative_paths: Union[str, List[str]])
     return generate_presigned_url(relative_paths)
 
 def storage_s3_save_object(file: UploadFile, relative_save_path: str) -> str:
+    """Uploads `file` under `relative_save_path` and returns the key; URLs are signed on read."""
     bucket_name = os.getenv("AWS_S3_BUCKET")
     if not bucket_name:
         raise StorageError("AWS_S3_BUCKET not present in .env.")
 
     try:
-        get_s3_client().upload_fileobj(
-            file.file,
-            bucket_name,
-            relative_save_path
+        with timed("s3"), observe_s3("upload"):
+            get_s3_client().upload_fileobj(
+                file.file,
+                bucket_name,
+                relative_save_path
+            )
+        count_s3_bytes("upload", file.size if file.size is not None else file.file.tell())
+    except Exception as error:
+        raise StorageError(
+            f"Error saving object to cloud storage: {error}."
         )
+
+    return relative_save_path
+
+def storage_s3_save_bytes(data: bytes, relative_save_path: str, content_type: str) -> str:
+    bucket_name = os.getenv("AWS_S3_BUCKET")
+    if not bucket_name:
+        raise StorageError("AWS_S3_BUCKET not present in .env.")
+
+    try:
+        with timed("s3"), observe_s3("upload"):
+            get_s3_client().put_object(
+                Bucket=bucket_name,
+                Key=relative_save_path,
+                Body=data,
+                ContentType=content_type
+            )
+        count_s3_bytes("upload", len(data))
     except Exception as error:
         raise StorageError(
             f"Error saving object to cloud storage: {error}."
         )
 
-    return generate_s3_presigned_url(relative_save_path)
+    return relative_save_path
+
+def storage_s3_download_object(relative_path: str, file: BinaryIO) -> None:
+    bucket_name = os.getenv("AWS_S3_BUCKET")
+    if not bucket_name:
+        raise StorageError("AWS_S3_BUCKET not present in .env.")
+
+    try:
+        with timed("s3"), observe_s3("download"):
+            get_s3_client().download_fileobj(
+                bucket_name,
+                relative_path,
+                file
+            )
+        count_s3_bytes("download", file.tell())
+    except Exception as error:
+        raise StorageError(
+            f"Error downloading object {relative_path} from cloud storage: {error}."
+        )
 
 def storage_s3_move_object(
     source_key: str,
@@ -130,19 +164,20 @@ def storage_s3_move_object(
     s3_client = get_s3_client()
 
     try:
-        s3_client.copy_object(
-            Bucket=bucket_name,
-            CopySource={
-                "Bucket": bucket_name,
-                "Key": source_key
-            },
-            Key=destination_key
-        )
+        with timed("s3"), observe_s3("move"):
+            s3_client.copy_object(
+                Bucket=bucket_name,
+                CopySource={
+                    "Bucket": bucket_name,
+                    "Key": source_key
+                },
+                Key=destination_key
+            )
 
-        s3_client.delete_object(
-            Bucket=bucket_name,
-            Key=source_key
-        )
+            s3_client.delete_object(
+                Bucket=bucket_name,
+                Key=source_key
+            )
 
     except Exception as error:
         raise StorageError(
@@ -150,3 +185,34 @@ def storage_s3_move_object(
         )
 
     return destination_key
+
+def storage_s3_delete_objects(keys: List[str]) -> int:
+    """Deletes `keys` with batched DeleteObjects requests and returns how many were removed."""
+    bucket_name = os.getenv("AWS_S3_BUCKET")
+    if not bucket_name:
+        raise StorageError("AWS_S3_BUCKET not present in .env.")
+
+    s3_client = get_s3_client()
+    deleted = 0
+    try:
+        for start in range(0, len(keys), S3_DELETE_BATCH_SIZE):
+            batch = keys[start:start + S3_DELETE_BATCH_SIZE]
+            with timed("s3"), observe_s3("delete"):
+                response = s3_client.delete_objects(
+                    Bucket=bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+                )
+            errors = response.get("Errors", [])
+            if errors:
+                raise StorageError(
+                    f"Error deleting {len(errors)} objects, first {errors[0].get('Key')}: {errors[0].get('Message')}"
+                )
+            deleted += len(batch)
+    except StorageError:
+        raise
+    except Exception as error:
+        raise StorageError(
+            f"Error deleting objects from cloud storage: {error}"
+        )
+
+    return deleted
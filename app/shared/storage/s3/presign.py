@@ -0,0 +1,95 @@
+import asyncio
+import os
+from typing import Dict, Iterable, List, Optional, Union
+
+from dotenv import load_dotenv
+
+from app.shared.cache.ttl_cache import TTLCache
+from app.shared.exceptions.storage import StorageError
+from app.shared.observability.server_timing import timed
+from app.shared.storage.s3.objects import generate_s3_presigned_url
+
+load_dotenv()
+
+PRESIGN_EXPIRES_IN = int(os.getenv("PRESIGN_EXPIRES_IN", "3600"))
+# share of the URL lifetime it is served from cache, so a cached URL is valid for at least the rest
+PRESIGN_CACHE_TTL_RATIO = float(os.getenv("PRESIGN_CACHE_TTL_RATIO", "0.5"))
+PRESIGN_CACHE_MAX_SIZE = int(os.getenv("PRESIGN_CACHE_MAX_SIZE", "50000"))
+
+
+class PresignService:
+    """
+        Presigned GET URLs for storage keys, signed in batches and cached.
+
+        Keys missing from the cache are signed together in a single executor call
+        (signing is local CPU work in boto3, no request is made). URLs are cached for
+        `cache_ttl_ratio` of their `expires_in`, with LRU eviction past `max_size`.
+    """
+
+    def __init__(
+        self,
+        expires_in: int = PRESIGN_EXPIRES_IN,
+        cache_ttl_ratio: float = PRESIGN_CACHE_TTL_RATIO,
+        max_size: int = PRESIGN_CACHE_MAX_SIZE,
+    ):
+        self.expires_in = expires_in
+        self._cache: TTLCache[str] = TTLCache(max_size=max_size, default_ttl=expires_in * cache_ttl_ratio)
+
+    def _sign_keys(self, keys: List[str]) -> Dict[str, str]:
+        return {key: generate_s3_presigned_url(key, expires_in=self.expires_in) for key in keys}
+
+    async def sign_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        urls: Dict[str, str] = {}
+        missing: List[str] = []
+        for key in dict.fromkeys(key for key in keys if key):
+            url = self._cache.get(key)
+            if url is None:
+                missing.append(key)
+            else:
+                urls[key] = url
+
+        if missing:
+            try:
+                with timed("s3"):
+                    signed = await asyncio.get_running_loop().run_in_executor(None, self._sign_keys, missing)
+            except Exception as error:
+                raise StorageError(
+                    f"Error on retreave presigned object url, original error - {str(error)}."
+                )
+
+            for key, url in signed.items():
+                self._cache.set(key, url)
+            urls.update(signed)
+
+        return urls
+
+    @staticmethod
+    def keys_of(value: Union[None, str, List[str]]) -> List[str]:
+        if not value:
+            return []
+        return [value] if isinstance(value, str) else list(value)
+
+    @staticmethod
+    def pick(urls: Dict[str, str], value: Union[None, str, List[str]]) -> Union[None, str, List[str]]:
+        """Same shape as `value`: a URL for a key, a list of URLs for a list of keys, None when empty."""
+        if not value:
+            return None
+        if isinstance(value, str):
+            return urls.get(value)
+        return [urls[key] for key in value if key in urls]
+
+    async def resolve(self, value: Union[None, str, List[str]]) -> Union[None, str, List[str]]:
+        return self.pick(await self.sign_many(self.keys_of(value)), value)
+
+    def invalidate(self, keys: Optional[Iterable[str]] = None) -> None:
+        if keys is None:
+            self._cache.clear()
+            return
+        for key in keys:
+            self._cache.pop(key)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+presign_service = PresignService()
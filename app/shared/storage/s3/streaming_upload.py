@@ -0,0 +1,350 @@
+import asyncio
+import contextlib
+import functools
+import os
+from dataclasses import dataclass
+from tempfile import SpooledTemporaryFile
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.datastructures import FormData
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from app.shared.exceptions.storage import StorageError
+from app.shared.observability.metrics import count_s3_bytes, observe_s3
+from app.shared.observability.server_timing import timed
+from app.shared.storage.s3.client import get_s3_client
+from app.shared.storage.s3.objects import generate_s3_storage_file_key, storage_s3_delete_objects
+
+load_dotenv()
+
+# S3 requests in flight for one form, each one holds at most one part in memory
+PHOTO_UPLOAD_CONCURRENCY = int(os.getenv("PHOTO_UPLOAD_CONCURRENCY", "4"))
+# smallest part S3 accepts in a multipart upload, files up to it are sent with a single PutObject
+S3_STREAM_PART_SIZE = 5 * 1024 * 1024
+# photos accepted in one form and size of each one (MB)
+PHOTO_UPLOAD_MAX_FILES = int(os.getenv("PHOTO_UPLOAD_MAX_FILES", "20"))
+PHOTO_UPLOAD_MAX_FILE_SIZE = int(os.getenv("PHOTO_UPLOAD_MAX_FILE_SIZE_MB", "25")) * 1024 * 1024
+# limits of the text fields, Starlette's defaults
+MAX_FORM_FIELDS = 1000
+MAX_FORM_FIELD_SIZE = 1024 * 1024
+FILE_SPOOL_MAX_SIZE = 1024 * 1024
+
+
+class S3ObjectStream:
+    """
+        One object written to S3 while it is received. Data is buffered up to
+        `part_size`: a file that fits is sent with a single PutObject on `finish`,
+        a larger one becomes a multipart upload with one part per full buffer.
+    """
+
+    def __init__(self, key: str, content_type: Optional[str], limiter: asyncio.Semaphore, part_size: int = S3_STREAM_PART_SIZE):
+        self.key = key
+        self.content_type = content_type or "application/octet-stream"
+        self.part_size = part_size
+        self.size = 0
+        self.uploaded = False
+        self._limiter = limiter
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[Dict[str, Any]] = []
+        self._bucket = os.getenv("AWS_S3_BUCKET")
+        if not self._bucket:
+            raise StorageError("AWS_S3_BUCKET not present in .env.")
+
+    async def _call(self, operation: str, method: str, **kwargs) -> Dict[str, Any]:
+        function = functools.partial(getattr(get_s3_client(), method), Bucket=self._bucket, Key=self.key, **kwargs)
+        try:
+            async with self._limiter:
+                with observe_s3(operation):
+                    return await asyncio.get_running_loop().run_in_executor(None, function)
+        except Exception as error:
+            raise StorageError(
+                f"Error saving object to cloud storage: {error}."
+            )
+
+    async def write(self, data: bytes) -> None:
+        self._buffer += data
+        self.size += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            await self._upload_part(part)
+
+    async def _upload_part(self, data: bytes) -> None:
+        if self._upload_id is None:
+            response = await self._call("upload", "create_multipart_upload", ContentType=self.content_type)
+            self._upload_id = response["UploadId"]
+
+        part_number = len(self._parts) + 1
+        response = await self._call(
+            "upload_part", "upload_part",
+            UploadId=self._upload_id, PartNumber=part_number, Body=data
+        )
+        self._parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+        count_s3_bytes("upload", len(data))
+
+    async def finish(self) -> None:
+        if self._upload_id is None:
+            if not self.size:
+                return
+            data = bytes(self._buffer)
+            self._buffer = bytearray()
+            await self._call("upload", "put_object", Body=data, ContentType=self.content_type)
+            count_s3_bytes("upload", len(data))
+        else:
+            if self._buffer:
+                part = bytes(self._buffer)
+                self._buffer = bytearray()
+                await self._upload_part(part)
+            await self._call(
+                "upload", "complete_multipart_upload",
+                UploadId=self._upload_id, MultipartUpload={"Parts": self._parts}
+            )
+        self.uploaded = True
+
+    async def abort(self) -> None:
+        self._buffer = bytearray()
+        if self._upload_id is not None and not self.uploaded:
+            try:
+                await self._call("upload", "abort_multipart_upload", UploadId=self._upload_id)
+            except StorageError:
+                pass
+
+
+@dataclass
+class FormPart:
+    name: str
+    filename: str
+    content_type: Optional[str] = None
+    size: int = 0
+    stream: Optional[S3ObjectStream] = None
+    spool: Optional[SpooledTemporaryFile] = None
+    upload: bool = False
+
+
+class FormFileParser(MultiPartParser):
+    """
+        Starlette's multipart parser, with its limits, whose file parts are handed over
+        instead of spooled: the parts of `file_field` become ("begin" | "data" | "end",
+        part, data) entries of `events`, drained by the caller after every chunk written
+        to `multipart_parser()`. Other file parts are dropped, text fields end in `items`.
+        At most `max_uploads` files of `max_upload_size` bytes each are accepted.
+    """
+
+    def __init__(self, request: Request, file_field: str, max_uploads: int, max_upload_size: int):
+        super().__init__(
+            request.headers,
+            request.stream(),
+            max_fields=MAX_FORM_FIELDS,
+            max_part_size=MAX_FORM_FIELD_SIZE,
+        )
+        self.file_field = file_field
+        self.max_uploads = max_uploads
+        self.max_upload_size = max_upload_size
+        self.events: List[Tuple[str, FormPart, bytes]] = []
+        self.uploads = 0
+        self._file: Optional[FormPart] = None
+
+    def multipart_parser(self) -> MultipartParser:
+        """The python-multipart parser wired to these callbacks, as MultiPartParser.parse builds it."""
+        _, params = parse_options_header(self.headers["Content-Type"])
+        charset = params.get(b"charset", b"utf-8")
+        self._charset = charset.decode("latin-1") if isinstance(charset, bytes) else charset
+        if b"boundary" not in params:
+            raise MultiPartException("Missing boundary in multipart.")
+        return MultipartParser(params[b"boundary"], {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_end": self.on_end,
+        })
+
+    def on_part_begin(self) -> None:
+        super().on_part_begin()
+        self._file = None
+
+    def on_headers_finished(self) -> None:
+        super().on_headers_finished()
+        upload_file = self._current_part.file
+        if upload_file is None:
+            return
+        # the data goes to S3, not to the spool opened for the part
+        upload_file.file.close()
+        self._file = FormPart(self._current_part.field_name, upload_file.filename, upload_file.content_type)
+        # browsers send an empty part when no file is picked
+        self._file.upload = self._file.name == self.file_field and bool(self._file.filename)
+        if self._file.upload:
+            self.uploads += 1
+            if self.uploads > self.max_uploads:
+                raise HTTPException(422, f"Máximo de {self.max_uploads} fotos por envio")
+            self.events.append(("begin", self._file, b""))
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._file is None:
+            super().on_part_data(data, start, end)
+        elif self._file.upload:
+            self._file.size += end - start
+            if self._file.size > self.max_upload_size:
+                raise HTTPException(
+                    413,
+                    f"A foto '{self._file.filename}' excede {self.max_upload_size // (1024 * 1024)}MB"
+                )
+            self.events.append(("data", self._file, data[start:end]))
+
+    def on_part_end(self) -> None:
+        if self._file is None:
+            super().on_part_end()
+        elif self._file.upload:
+            self.events.append(("end", self._file, b""))
+
+
+class StreamingFormUpload:
+    """
+        Multipart form reader that sends the files of `file_field` to S3 while the body
+        is read, instead of spooling the whole form first.
+
+        `prefix_for(fields, complete)` gives the storage prefix of the files from the
+        text fields received so far. While it returns None (e.g. the field naming the
+        item comes after the files), files are spooled and uploaded once the body ends,
+        when it is called with `complete=True` and must return a prefix. Uploads run in
+        the background with at most `concurrency` of them in flight; reading the body
+        waits when the limit is reached, bounding the memory held by one request.
+    """
+
+    def __init__(
+        self,
+        file_field: str,
+        prefix_for: Callable[[Dict[str, str], bool], Optional[str]],
+        concurrency: int = PHOTO_UPLOAD_CONCURRENCY,
+        part_size: int = S3_STREAM_PART_SIZE,
+        max_files: int = PHOTO_UPLOAD_MAX_FILES,
+        max_file_size: int = PHOTO_UPLOAD_MAX_FILE_SIZE,
+    ):
+        self.file_field = file_field
+        self.prefix_for = prefix_for
+        self.concurrency = concurrency
+        self.part_size = part_size
+        self.max_files = max_files
+        self.max_file_size = max_file_size
+        self._limiter = asyncio.Semaphore(concurrency)
+        self._pending: Set[asyncio.Task] = set()
+        self._items: List[Tuple[str, str]] = []
+        self._files: List[FormPart] = []
+
+    @property
+    def keys(self) -> List[str]:
+        return [part.stream.key for part in self._files if part.stream is not None and part.stream.uploaded]
+
+    def _fields(self) -> Dict[str, str]:
+        return dict(self._items)
+
+    def _open_stream(self, part: FormPart, prefix: str) -> None:
+        part.stream = S3ObjectStream(
+            generate_s3_storage_file_key(prefix, part.filename),
+            part.content_type,
+            self._limiter,
+            self.part_size
+        )
+
+    async def _submit(self, upload) -> None:
+        while len(self._pending) >= self.concurrency:
+            done, self._pending = await asyncio.wait(self._pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        self._pending.add(asyncio.create_task(upload))
+
+    async def _handle_events(self, events: List[Tuple[str, FormPart, bytes]]) -> None:
+        handled = list(events)
+        events.clear()
+        for event, part, data in handled:
+            if event == "begin":
+                self._files.append(part)
+                prefix = self.prefix_for(self._fields(), False)
+                if prefix:
+                    self._open_stream(part, prefix)
+                else:
+                    part.spool = SpooledTemporaryFile(max_size=FILE_SPOOL_MAX_SIZE)
+            elif event == "data":
+                if part.stream is not None:
+                    await part.stream.write(data)
+                else:
+                    part.spool.write(data)
+            elif part.stream is not None:
+                await self._submit(part.stream.finish())
+
+    async def _upload_spooled(self, part: FormPart) -> None:
+        part.spool.seek(0)
+        while True:
+            data = await asyncio.to_thread(part.spool.read, self.part_size)
+            if not data:
+                break
+            await part.stream.write(data)
+        part.spool.close()
+        await part.stream.finish()
+
+    async def parse(self, request: Request) -> Tuple[FormData, List[str]]:
+        """Reads the whole body; returns the text fields and the keys of the uploaded files, in form order."""
+        content_type, _ = parse_options_header(request.headers.get("Content-Type", ""))
+        if content_type != b"multipart/form-data":
+            raise HTTPException(400, "Esperado multipart/form-data")
+
+        form = FormFileParser(request, self.file_field, self.max_files, self.max_file_size)
+        self._items = form.items
+        try:
+            try:
+                parser = form.multipart_parser()
+                async for chunk in form.stream:
+                    parser.write(chunk)
+                    await self._handle_events(form.events)
+                parser.finalize()
+                await self._handle_events(form.events)
+            except MultiPartException as error:
+                raise HTTPException(400, error.message)
+
+            spooled = [part for part in self._files if part.stream is None]
+            if spooled:
+                prefix = self.prefix_for(self._fields(), True)
+                for part in spooled:
+                    self._open_stream(part, prefix)
+                    await self._submit(self._upload_spooled(part))
+
+            with timed("s3"):
+                pending, self._pending = self._pending, set()
+                results = await asyncio.gather(*pending, return_exceptions=True)
+            errors = [result for result in results if isinstance(result, BaseException)]
+            if errors:
+                raise errors[0]
+        except BaseException:
+            # the original error is the one worth reporting
+            with contextlib.suppress(StorageError):
+                await self.discard()
+            raise
+
+        return FormData(self._items), self.keys
+
+    async def discard(self) -> None:
+        """Aborts unfinished uploads and deletes the stored ones, for a request that failed after its body was read."""
+        for task in self._pending:
+            task.cancel()
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        self._pending = set()
+        streams = [part.stream for part in self._files if part.stream is not None]
+        for part in self._files:
+            if part.spool is not None:
+                part.spool.close()
+        for stream in streams:
+            await stream.abort()
+
+        keys = self.keys
+        if keys:
+            await asyncio.to_thread(storage_s3_delete_objects, keys)
+        for stream in streams:
+            stream.uploaded = False
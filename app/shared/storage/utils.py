@@ -1,11 +1,14 @@
 import base64
-import httpx
+from app.core.http_client import HttpClient
+from app.shared.observability.metrics import count_s3_bytes, observe_s3
 
 async def download_file_base64(url: str, timeout: int = 30) -> str | None:
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            resp = await client.get(url)
-            resp.raise_for_status()
-            return base64.b64encode(resp.content).decode()
+        client = HttpClient.get_client()
+        with observe_s3("download"):
+            resp = await client.get(url, timeout=HttpClient.timeout(timeout))
+        resp.raise_for_status()
+        count_s3_bytes("download", len(resp.content))
+        return base64.b64encode(resp.content).decode()
     except Exception:
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,71 @@
+"""
+    Compares the row-by-row (iterrows) hierarchy builder with the column-wise one
+    on a synthetic inventory sheet and checks both produce the same tree.
+
+    Usage:
+        python -m benchmarks.excel_nodes_builder --rows 100000
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.excel_services import build_nodes_from_df
+from benchmarks.legacy_excel_builder import build_nodes_from_df_iterrows
+
+
+def build_sheet(rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = random.Random(seed)
+    sites = [f"SITE {i:02d}" for i in range(20)]
+    rooms = [f"Sala {i:03d}" for i in range(50)]
+
+    data = {"LOC 1": [], "LOC 2": [], "ATIVO 1": [], "ATIVO 2": []}
+    for index in range(rows):
+        data["LOC 1"].append(rng.choice(sites))
+        data["LOC 2"].append(rng.choice(rooms))
+        data["ATIVO 1"].append(f"RACK-{rng.randrange(rows // 4 + 1):06d}")
+        data["ATIVO 2"].append(f"EQP-{index:07d}" if rng.random() < 0.7 else None)
+
+    df = pd.DataFrame(data)
+    df["delimiter"] = None
+    df["description"] = np.where(df["ATIVO 2"].isna(), "Rack", "Equipamento")
+    df["serial"] = [f"SN{index:08d}" for index in range(rows)]
+    return df
+
+
+def measure(builder, df: pd.DataFrame):
+    started = time.perf_counter()
+    documents = builder(df, "delimiter", ["description", "serial"], nodes={})
+    return time.perf_counter() - started, documents
+
+
+def tree_signature(documents):
+    positions = {doc["_id"]: index for index, doc in enumerate(documents)}
+    return [
+        (doc["reference"], positions.get(doc["parent_id"]), doc["level"], doc["path"], doc.get("asset_data"))
+        for doc in documents
+    ]
+
+
+def main(rows: int):
+    df = build_sheet(rows)
+
+    legacy_seconds, legacy_documents = measure(build_nodes_from_df_iterrows, df)
+    vectorized_seconds, vectorized_documents = measure(build_nodes_from_df, df)
+
+    assert tree_signature(legacy_documents) == tree_signature(vectorized_documents)
+
+    print(f"{'rows':<12} {rows:>10}")
+    print(f"{'nodes':<12} {len(vectorized_documents):>10}")
+    print(f"{'iterrows':<12} {legacy_seconds:>9.2f}s")
+    print(f"{'column-wise':<12} {vectorized_seconds:>9.2f}s")
+    print(f"{'speedup':<12} {legacy_seconds / vectorized_seconds:>9.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.rows)
@@ -0,0 +1,116 @@
+"""
+    Throughput comparison between the previous BaseHTTPMiddleware based auth/tenant
+    layers and the current pure ASGI implementation, on a trivial endpoint.
+
+    Usage:
+        python -m benchmarks.middleware_throughput --requests 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.middlewares.auth_middleware import AuthMiddleware
+from app.core.middlewares.tenant_middleware import TenantMiddleware
+from app.shared.handle_decorator import handle_decorator
+
+TENANT = "tenant_bench"
+
+
+class LegacyAuthMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if handle_decorator("no_auth", request):
+            return await call_next(request)
+
+        auth_header = request.headers.get("Authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            raise HTTPException(status_code=401, detail="Token not provided.")
+
+        from app.modules.auth.auth_service import AuthService
+        if not await AuthService().validate_token(auth_header.split("Bearer ")[1].strip()):
+            raise HTTPException(status_code=401, detail="Invalid token.")
+
+        return await call_next(request)
+
+
+class LegacyTenantMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if handle_decorator("no_tenant_required", request):
+            return await call_next(request)
+
+        from app.core.database import MongoConnection
+        client = MongoConnection.get_client()
+        if request.headers.get("tenant") not in await client.list_database_names():
+            raise HTTPException(status_code=404, detail="Tenant não encontrado")
+
+        request.state.db = client.get_database(request.headers["tenant"])
+        return await call_next(request)
+
+
+def build_app(auth_middleware, tenant_middleware) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(auth_middleware)
+    app.add_middleware(tenant_middleware)
+
+    @app.get("/ping")
+    async def ping(request: Request):
+        return {"tenant": request.state.db.name}
+
+    return app
+
+
+async def measure(app: FastAPI, total: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": "Bearer bench-token", "tenant": TENANT}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def call():
+            async with semaphore:
+                response = await client.get("/ping", headers=headers)
+                assert response.status_code == 200, response.text
+
+        await asyncio.gather(*[call() for _ in range(concurrency)])
+
+        started = time.perf_counter()
+        await asyncio.gather(*[call() for _ in range(total)])
+        return total / (time.perf_counter() - started)
+
+
+async def main(total: int, concurrency: int):
+    mongo_client = MagicMock()
+    mongo_client.list_database_names = AsyncMock(return_value=[TENANT])
+    database = MagicMock()
+    database.name = TENANT
+    mongo_client.get_database.return_value = database
+    mongo_client.__getitem__.return_value = database
+    database.dummy.find_one = AsyncMock(return_value={"is_active": True})
+
+    with patch("app.core.database.MongoConnection.get_client", return_value=mongo_client), \
+            patch("app.modules.auth.auth_service.AuthService.validate_token", AsyncMock(return_value=True)):
+        results = {
+            "BaseHTTPMiddleware": await measure(
+                build_app(LegacyAuthMiddleware, LegacyTenantMiddleware), total, concurrency
+            ),
+            "pure ASGI": await measure(
+                build_app(AuthMiddleware, TenantMiddleware), total, concurrency
+            ),
+        }
+
+    for name, requests_per_second in results.items():
+        print(f"{name:<20} {requests_per_second:>10.0f} req/s")
+
+    speedup = results["pure ASGI"] / results["BaseHTTPMiddleware"]
+    print(f"{'speedup':<20} {speedup:>10.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -2,11 +2,12 @@ import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi.testclient import TestClient
 
-from app.main import INITIALIZED_TENANTS, create_test_app
+from app.main import create_test_app
+from app.modules.tenant.tenant_registry import tenant_registry
 
 @pytest.fixture(autouse=True)
-def clear_initialized_tenants():
-    INITIALIZED_TENANTS.clear()
+def clear_tenant_registry():
+    tenant_registry.invalidate()
 
 @pytest.fixture
 def mock_mongo():
@@ -16,6 +17,7 @@ def mock_mongo():
 
         db = MagicMock()
         db.name = "tenant_test"
+        db.dummy.find_one = AsyncMock(return_value={"is_active": True})
         client.get_database.return_value = db
 
         mock.return_value = client
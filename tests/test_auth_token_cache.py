@@ -0,0 +1,120 @@
+import base64
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.modules.auth.auth_service import AuthService
+from app.modules.auth.auth_token_cache import TokenValidationCache, token_validation_cache
+from app.shared.cache.ttl_cache import TTLCache
+
+
+def make_token(claims: dict) -> str:
+    def segment(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+    return f"{segment({'alg': 'HS256', 'typ': 'JWT'})}.{segment(claims)}.signature"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    token_validation_cache.clear()
+    yield
+    token_validation_cache.clear()
+
+
+def test_ttl_cache_expires_entries():
+    clock = FakeClock()
+    cache = TTLCache(max_size=10, default_ttl=5, clock=clock)
+    cache.set("key", True)
+
+    assert cache.get("key") is True
+    clock.now = 6
+    assert cache.get("key") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2, default_ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_token_ttl_is_capped_by_exp_claim():
+    cache = TokenValidationCache(max_size=10, ttl=300, negative_ttl=10)
+    expired_token = make_token({"exp": time.time() - 1})
+    valid_token = make_token({"exp": time.time() + 60})
+
+    cache.set(expired_token, True)
+    cache.set(valid_token, True)
+
+    assert cache.get(expired_token) is None
+    assert cache.get(valid_token) is True
+
+
+def test_token_cache_does_not_store_raw_token():
+    cache = TokenValidationCache(max_size=10, ttl=300, negative_ttl=10)
+    token = make_token({"exp": time.time() + 60})
+    cache.set(token, True)
+
+    assert token not in cache._cache._entries
+    assert TokenValidationCache.token_key(token) in cache._cache._entries
+
+
+def mock_legacy_response(status_code: int):
+    http_client = MagicMock()
+    http_client.post = AsyncMock(return_value=MagicMock(status_code=status_code))
+    return http_client
+
+
+@pytest.mark.asyncio
+async def test_validate_token_calls_legacy_server_once():
+    token = make_token({"exp": time.time() + 60})
+    http_client = mock_legacy_response(200)
+
+    with patch("app.modules.auth.auth_service.HttpClient.get_client", return_value=http_client):
+        assert await AuthService().validate_token(token) is True
+        assert await AuthService().validate_token(token) is True
+
+    assert http_client.post.await_count == 1
+    assert token_validation_cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_validate_token_caches_rejections():
+    token = make_token({"exp": time.time() + 60})
+    http_client = mock_legacy_response(401)
+
+    with patch("app.modules.auth.auth_service.HttpClient.get_client", return_value=http_client):
+        assert await AuthService().validate_token(token) is False
+        assert await AuthService().validate_token(token) is False
+
+    assert http_client.post.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_validate_token_does_not_cache_server_errors():
+    token = make_token({"exp": time.time() + 60})
+    http_client = mock_legacy_response(503)
+
+    with patch("app.modules.auth.auth_service.HttpClient.get_client", return_value=http_client):
+        assert await AuthService().validate_token(token) is False
+        assert await AuthService().validate_token(token) is False
+
+    assert http_client.post.await_count == 2
@@ -0,0 +1,131 @@
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.modules.auth.auth_service import AuthService
+from app.modules.auth.auth_token_cache import token_validation_cache
+from app.modules.auth.auth_token_verifier import LocalTokenVerifier
+
+SECRET = "local-test-secret"
+
+
+def mint(claims: dict, key=SECRET, algorithm="HS256", headers=None) -> str:
+    return jwt.encode({"exp": time.time() + 60, **claims}, key, algorithm=algorithm, headers=headers)
+
+
+@pytest.fixture
+def rsa_keys():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    ).decode()
+    return private_key, public_pem
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    token_validation_cache.clear()
+    yield
+    token_validation_cache.clear()
+
+
+def test_accepts_token_signed_with_shared_secret():
+    verifier = LocalTokenVerifier(secret=SECRET)
+    assert verifier.verify(mint({"user_id": 1})) is True
+
+
+def test_rejects_token_with_wrong_signature():
+    verifier = LocalTokenVerifier(secret=SECRET)
+    assert verifier.verify(mint({"user_id": 1}, key="another-secret")) is False
+
+
+def test_rejects_expired_and_not_yet_valid_tokens():
+    verifier = LocalTokenVerifier(secret=SECRET)
+    assert verifier.verify(mint({"exp": time.time() - 10})) is False
+    assert verifier.verify(mint({"nbf": time.time() + 60})) is False
+
+
+def test_undecided_for_opaque_token():
+    verifier = LocalTokenVerifier(secret=SECRET)
+    assert verifier.verify("not-a-jwt") is None
+
+
+def test_rejects_revoked_token():
+    verifier = LocalTokenVerifier(secret=SECRET, revoked_jtis=["revoked-jti"])
+    assert verifier.verify(mint({"jti": "revoked-jti"})) is False
+    assert verifier.verify(mint({"jti": "other-jti"})) is True
+
+
+def test_undecided_without_key_or_algorithm():
+    assert LocalTokenVerifier(secret=None).verify(mint({})) is None
+    assert LocalTokenVerifier(secret=SECRET, algorithms=["RS256"]).verify(mint({})) is None
+
+
+def test_undecided_without_exp_claim():
+    verifier = LocalTokenVerifier(secret=SECRET)
+    token = jwt.encode({"user_id": 1}, SECRET, algorithm="HS256")
+    assert verifier.verify(token) is None
+
+
+def test_accepts_token_signed_with_public_key(rsa_keys):
+    private_key, public_pem = rsa_keys
+    verifier = LocalTokenVerifier(public_key=public_pem, algorithms=["RS256"])
+
+    assert verifier.verify(mint({}, key=private_key, algorithm="RS256")) is True
+
+
+def test_resolves_public_key_from_jwks_by_kid(rsa_keys):
+    private_key, _ = rsa_keys
+    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    verifier = LocalTokenVerifier(
+        jwks={"keys": [{**jwk, "kid": "key-1", "alg": "RS256", "use": "sig"}]},
+        algorithms=["RS256"],
+    )
+
+    assert verifier.verify(mint({}, key=private_key, algorithm="RS256", headers={"kid": "key-1"})) is True
+    assert verifier.verify(mint({}, key=private_key, algorithm="RS256", headers={"kid": "key-2"})) is None
+
+
+@pytest.mark.asyncio
+async def test_local_mode_skips_legacy_server(monkeypatch):
+    monkeypatch.setenv("AUTH_TOKEN_VERIFICATION_MODE", "LOCAL")
+    http_client = MagicMock()
+    http_client.post = AsyncMock(return_value=MagicMock(status_code=200))
+
+    with patch("app.modules.auth.auth_service.local_token_verifier", LocalTokenVerifier(secret=SECRET)), \
+            patch("app.modules.auth.auth_service.HttpClient.get_client", return_value=http_client):
+        assert await AuthService().validate_token(mint({})) is True
+        assert await AuthService().validate_token(mint({}, key="another-secret")) is False
+
+    http_client.post.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_local_mode_falls_back_to_legacy_server_when_undecided(monkeypatch):
+    monkeypatch.setenv("AUTH_TOKEN_VERIFICATION_MODE", "LOCAL")
+    http_client = MagicMock()
+    http_client.post = AsyncMock(return_value=MagicMock(status_code=200))
+
+    with patch("app.modules.auth.auth_service.local_token_verifier", LocalTokenVerifier(secret=None)), \
+            patch("app.modules.auth.auth_service.HttpClient.get_client", return_value=http_client):
+        assert await AuthService().validate_token(mint({})) is True
+
+    http_client.post.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_local_mode_validates_opaque_tokens_on_legacy_server(monkeypatch):
+    monkeypatch.setenv("AUTH_TOKEN_VERIFICATION_MODE", "LOCAL")
+    http_client = MagicMock()
+    http_client.post = AsyncMock(return_value=MagicMock(status_code=200))
+
+    with patch("app.modules.auth.auth_service.local_token_verifier", LocalTokenVerifier(secret=SECRET)), \
+            patch("app.modules.auth.auth_service.HttpClient.get_client", return_value=http_client):
+        assert await AuthService().validate_token("opaque-legacy-token") is True
+
+    http_client.post.assert_awaited_once()
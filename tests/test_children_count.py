@@ -0,0 +1,85 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson import ObjectId
+
+from app.shared.database.children_count import children_total, increment_children_count, refresh_children_count
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.documents:
+            yield doc
+
+
+@pytest.mark.asyncio
+async def test_increment_only_touches_nodes_with_a_count():
+    collection = MagicMock()
+    collection.update_one = AsyncMock()
+    parent_id = ObjectId()
+
+    await increment_children_count(collection, parent_id, -1)
+    await increment_children_count(collection, None, 1)
+
+    collection.update_one.assert_awaited_once_with(
+        {"_id": parent_id, "children_count": {"$exists": True}},
+        {"$inc": {"children_count": -1}}
+    )
+
+
+@pytest.mark.asyncio
+async def test_children_total_reads_parent_counter():
+    collection = MagicMock()
+    collection.find_one = AsyncMock(return_value={"_id": ObjectId(), "children_count": 7})
+    collection.count_documents = AsyncMock()
+
+    assert await children_total(collection, ObjectId()) == 7
+    collection.count_documents.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_children_total_counts_and_backfills_older_nodes():
+    parent_id = ObjectId()
+    collection = MagicMock()
+    collection.find_one = AsyncMock(return_value={"_id": parent_id})
+    collection.count_documents = AsyncMock(return_value=3)
+    collection.update_one = AsyncMock()
+
+    assert await children_total(collection, parent_id) == 3
+    collection.update_one.assert_awaited_once_with(
+        {"_id": parent_id, "children_count": {"$exists": False}},
+        {"$set": {"children_count": 3}}
+    )
+
+
+@pytest.mark.asyncio
+async def test_children_total_counts_roots():
+    collection = MagicMock()
+    collection.count_documents = AsyncMock(return_value=2)
+    collection.update_one = AsyncMock()
+
+    assert await children_total(collection, None) == 2
+    collection.count_documents.assert_awaited_once_with({"parent_id": None})
+    collection.update_one.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_refresh_sets_exact_counts_including_zero():
+    with_children, without_children = ObjectId(), ObjectId()
+    collection = MagicMock()
+    collection.aggregate = MagicMock(return_value=FakeCursor([{"_id": with_children, "count": 4}]))
+    collection.bulk_write = AsyncMock()
+
+    await refresh_children_count(collection, [with_children, without_children, None, with_children])
+
+    operations = collection.bulk_write.await_args.args[0]
+    assert {op._filter["_id"]: op._doc["$set"]["children_count"] for op in operations} == {
+        with_children: 4,
+        without_children: 0,
+    }
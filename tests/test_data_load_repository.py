@@ -0,0 +1,330 @@
+import asyncio
+from io import BytesIO
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pandas as pd
+import pytest
+from bson import ObjectId
+from openpyxl import Workbook
+from pymongo.errors import BulkWriteError
+
+from app.modules.data_load.data_load_repository import DataLoadRepository, InventoryExcelImport
+from app.modules.task.handlers.upload.import_inventory_excel_handler import ImportInventoryExcelHandler
+from app.modules.task.task_choices import AsyncTaskResultType
+from app.services.excel_services import node_content_hash
+from app.shared.database.inventory_stats import InventoryStatsDelta
+
+
+@pytest.fixture(autouse=True)
+def refresh_children_count():
+    with patch("app.modules.data_load.data_load_repository.refresh_children_count", AsyncMock()) as refresh:
+        yield refresh
+
+
+@pytest.fixture(autouse=True)
+def bump_tree_version():
+    with patch("app.modules.data_load.data_load_repository.bump_tree_version", AsyncMock()) as bump:
+        yield bump
+
+
+@pytest.fixture(autouse=True)
+def apply_stats():
+    with patch("app.modules.data_load.data_load_repository.InventoryStatsDelta.apply", autospec=True) as apply:
+        yield apply
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.documents:
+            yield doc
+
+
+def fake_find(stored):
+    """Evaluates the `$or` of (parent_id, reference $in) clauses used by the node lookup."""
+    def find(query, projection=None):
+        return FakeCursor([
+            doc for doc in stored
+            if any(
+                doc["parent_id"] == clause["parent_id"] and doc["reference"] in clause["reference"]["$in"]
+                for clause in query["$or"]
+            )
+        ])
+    return MagicMock(side_effect=find)
+
+
+def upload_request(rows, extra_fields=""):
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    buffer = BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+
+    upload = MagicMock()
+    upload.file = buffer
+
+    db = MagicMock()
+    db.inventory_items.find = fake_find([])
+    db.inventory_items.bulk_write = AsyncMock(
+        side_effect=lambda operations: MagicMock(upserted_count=len(operations), modified_count=0)
+    )
+
+    request = MagicMock()
+    request.form = AsyncMock(return_value={"file": upload, "extra_fields": extra_fields})
+    request.state.db = db
+    return request
+
+
+@pytest.mark.asyncio
+async def test_create_many_flushes_bounded_batches(refresh_children_count, bump_tree_version):
+    rows = [["LOC 1", "ATIVO", "delimiter"]] + [["SP", f"RACK-{i:02d}", None] for i in range(9)]
+    request = upload_request(rows)
+
+    with patch("app.modules.data_load.data_load_repository.DATA_LOAD_CHUNK_ROWS", 4), \
+            patch("app.modules.data_load.data_load_repository.DATA_LOAD_BATCH_SIZE", 3):
+        response = await DataLoadRepository().create_many(request)
+
+    batch_sizes = [len(call.args[0]) for call in request.state.db.inventory_items.bulk_write.await_args_list]
+    assert batch_sizes == [3, 3, 3, 1]
+    assert response == {"message": "Itens atualizados/inseridos com sucesso!", "inserted": 10, "modified": 0, "unchanged": 0}
+    site_id = request.state.db.inventory_items.bulk_write.await_args_list[0].args[0][0]._doc["$setOnInsert"]["_id"]
+    assert refresh_children_count.await_args.args[1] == {site_id}
+    bump_tree_version.assert_awaited_once_with(request.state.db)
+
+
+@pytest.mark.asyncio
+async def test_create_many_without_items():
+    request = upload_request([["LOC 1", "ATIVO", "delimiter"]])
+
+    response = await DataLoadRepository().create_many(request)
+
+    assert response == {"message": "Nenhum item para inserir"}
+    request.state.db.inventory_items.bulk_write.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_resolve_existing_nodes_only_queries_touched_keys():
+    site_id, room_id, rack_id = ObjectId(), ObjectId(), ObjectId()
+    db = MagicMock()
+    db.inventory_items.find = fake_find([
+        {"_id": site_id, "reference": "SP", "parent_id": None},
+        {"_id": room_id, "reference": "Sala 1", "parent_id": site_id},
+        {"_id": rack_id, "reference": "RACK-01", "parent_id": room_id},
+        {"_id": ObjectId(), "reference": "RJ", "parent_id": None},
+    ])
+    df = pd.DataFrame({
+        "LOC 1": ["SP", "SP", "BH"],
+        "LOC 2": ["Sala 1", "Sala 2", "Sala 1"],
+        "ATIVO": ["RACK-01", "RACK-02", "RACK-03"],
+        "delimiter": [None, None, None],
+    })
+    nodes = {}
+
+    with patch("app.modules.data_load.data_load_repository.DATA_LOAD_RESOLVE_BATCH_SIZE", 1):
+        await DataLoadRepository().resolve_existing_nodes(db, df, "delimiter", nodes)
+
+    assert nodes == {
+        ("SP", None): site_id,
+        ("Sala 1", site_id): room_id,
+        ("RACK-01", room_id): rack_id,
+    }
+    queried_keys = {
+        (reference, clause["parent_id"])
+        for call in db.inventory_items.find.call_args_list
+        for clause in call.args[0]["$or"]
+        for reference in clause["reference"]["$in"]
+    }
+    # nothing below the unknown "BH" site or "Sala 2" room is looked up
+    assert queried_keys == {
+        ("SP", None), ("BH", None), ("Sala 1", site_id), ("Sala 2", site_id), ("RACK-01", room_id),
+    }
+    assert db.inventory_items.find.call_count == len(queried_keys)
+
+
+@pytest.mark.asyncio
+async def test_inventory_excel_import_writes_unordered_batches_and_keeps_errors():
+    rows = [["LOC 1", "ATIVO", "delimiter"]] + [["SP", f"RACK-{i:02d}", None] for i in range(11)]
+    workbook = upload_request(rows).form.return_value["file"].file.getvalue()
+
+    in_flight = 0
+    max_in_flight = 0
+    calls = []
+
+    async def bulk_write(operations, ordered=True):
+        nonlocal in_flight, max_in_flight
+        calls.append((len(operations), ordered))
+        call_number = len(calls)
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if call_number == 2:
+            raise BulkWriteError({
+                "nUpserted": 2,
+                "nModified": 0,
+                "writeErrors": [{"index": 1, "code": 11000, "errmsg": "duplicate key"}],
+            })
+        return MagicMock(upserted_count=len(operations), modified_count=0)
+
+    db = MagicMock()
+    db.inventory_items.find = fake_find([])
+    db.inventory_items.bulk_write = bulk_write
+    progress = AsyncMock()
+
+    with patch(
+        "app.modules.data_load.data_load_repository.storage_s3_download_object",
+        side_effect=lambda key, file: file.write(workbook)
+    ), patch("app.modules.data_load.data_load_repository.DATA_LOAD_CHUNK_ROWS", 5), \
+            patch("app.modules.data_load.data_load_repository.reconcile_inventory_stats", AsyncMock()) as reconcile:
+        result = await InventoryExcelImport(db, batch_size=3, concurrency=2).perform_import(
+            source_key="inputs/sheet.xlsx", extra_fields=[], on_progress=progress
+        )
+
+    assert [size for size, _ in calls] == [3, 3, 3, 3]
+    assert all(ordered is False for _, ordered in calls)
+    assert max_in_flight == 2
+    # a failed batch makes the dashboard counters be recounted instead of incremented
+    reconcile.assert_awaited_once_with(db)
+    assert result == {"rows": 11, "inserted": 11, "modified": 0, "unchanged": 0, "failed_batches": 1}
+    assert [call.args[:2] for call in progress.await_args_list] == [(5, 11), (10, 11), (11, 11), (11, 11)]
+    assert progress.await_args_list[-1].args[2] == [{
+        "batch": 2,
+        "operations": 3,
+        "failed": 1,
+        "write_errors": [{"index": 1, "code": 11000, "message": "duplicate key"}],
+    }]
+
+
+def stored_node(reference, parent_id, path, node_type, asset_data=None, content_hash=None):
+    doc = {"_id": ObjectId(), "reference": reference, "parent_id": parent_id, "path": path, "node_type": node_type}
+    if asset_data:
+        doc["asset_data"] = asset_data
+    doc["content_hash"] = content_hash or node_content_hash(doc)
+    return doc
+
+
+def reimport_stored():
+    site = stored_node("SP", None, ["SP"], "LOCATION")
+    return [
+        site,
+        stored_node("RACK-01", site["_id"], ["SP", "RACK-01"], "ASSET", {"description": "Rack 1"}),
+        stored_node("RACK-02", site["_id"], ["SP", "RACK-02"], "ASSET", {"description": "Rack antigo"}),
+        stored_node("RJ", None, ["RJ"], "LOCATION"),
+    ]
+
+
+def reimport_request(dry_run, stored=None):
+    stored = stored or reimport_stored()
+    rows = [
+        ["LOC 1", "ATIVO", "delimiter", "description"],
+        ["SP", "RACK-01", None, "Rack 1"],
+        ["SP", "RACK-02", None, "Rack 2"],
+        ["SP", "RACK-03", None, "Rack 3"],
+    ]
+    request = upload_request(rows, extra_fields="description")
+    request.form.return_value["dry_run"] = "true" if dry_run else None
+    request.state.db.inventory_items.find = fake_find(stored)
+    request.state.db.inventory_items.count_documents = AsyncMock(
+        side_effect=lambda query: sum(1 for doc in stored if not doc.get("is_app_created"))
+    )
+    return request
+
+
+@pytest.mark.asyncio
+async def test_create_many_only_writes_new_or_changed_nodes():
+    request = reimport_request(dry_run=False)
+
+    response = await DataLoadRepository().create_many(request)
+
+    operations = request.state.db.inventory_items.bulk_write.await_args.args[0]
+    assert [operation._filter["reference"] for operation in operations] == ["RACK-02", "RACK-03"]
+    assert response["unchanged"] == 2
+
+
+@pytest.mark.asyncio
+async def test_create_many_dry_run_returns_diff_without_writing():
+    request = reimport_request(dry_run=True)
+
+    response = await DataLoadRepository().create_many(request)
+
+    request.state.db.inventory_items.bulk_write.assert_not_awaited()
+    assert response == {
+        "message": "Simulação concluída, nenhum item foi gravado",
+        "new": 1,
+        "changed": 1,
+        "unchanged": 2,
+        "missing": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_items_signs_every_photo_in_one_batch():
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=[
+        {"_id": ObjectId(), "parent_id": None, "reference": "A", "photos": ["a1.jpg", "a2.jpg"]},
+        {"_id": ObjectId(), "parent_id": None, "reference": "B", "photos": []},
+        {"_id": ObjectId(), "parent_id": None, "reference": "C"},
+    ])
+    request = MagicMock()
+    request.state.db.inventory_items.find.return_value.sort.return_value = cursor
+
+    sign_many = AsyncMock(return_value={"a1.jpg": "url-a1", "a2.jpg": "url-a2"})
+    with patch("app.modules.data_load.data_load_repository.presign_service.sign_many", sign_many):
+        items = await DataLoadRepository().get_items(request, None)
+
+    sign_many.assert_awaited_once()
+    assert list(sign_many.await_args.args[0]) == ["a1.jpg", "a2.jpg"]
+    assert [item.get("photos") for item in items] == [["url-a1", "url-a2"], None, None]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("failure", [None, RuntimeError("sheet is corrupt")])
+async def test_import_handler_removes_the_staged_workbook(failure):
+    handler = ImportInventoryExcelHandler(task_id=str(ObjectId()), db=MagicMock(), result_type=AsyncTaskResultType.RAW_RESULT)
+    perform_import = AsyncMock(side_effect=failure, return_value={"rows": 1})
+
+    with patch.object(InventoryExcelImport, "perform_import", perform_import), \
+            patch("app.modules.task.handlers.upload.import_inventory_excel_handler.queue_storage_cleanup", AsyncMock()) as queue, \
+            patch("app.modules.task.handlers.upload.import_inventory_excel_handler.drain_storage_cleanup", AsyncMock(side_effect=OSError)) as drain:
+        if failure:
+            with pytest.raises(RuntimeError):
+                await handler.execute({"source_key": "tenant/tasks/inputs/sheet.xlsx"})
+        else:
+            assert await handler.execute({"source_key": "tenant/tasks/inputs/sheet.xlsx"}) == {"rows": 1}
+
+    # a failed drain leaves the key queued without failing the import
+    assert queue.await_args.args[1] == ["tenant/tasks/inputs/sheet.xlsx"]
+    drain.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_dry_run_does_not_report_app_created_nodes_as_missing():
+    stored = reimport_stored()
+    stored[1]["is_app_created"] = True
+    stored.append({**stored_node("RACK-APP", stored[0]["_id"], ["SP", "RACK-APP"], "ASSET"), "is_app_created": True})
+    request = reimport_request(dry_run=True, stored=stored)
+
+    response = await DataLoadRepository().create_many(request)
+
+    # RJ only, RACK-01 is in the sheet and RACK-APP was never imported
+    assert response["missing"] == 1
+
+
+@pytest.mark.asyncio
+async def test_node_changing_type_recounts_the_dashboard():
+    stored = reimport_stored()
+    stored[2].update(node_type="LOCATION", content_hash="stale")
+    request = reimport_request(dry_run=False, stored=stored)
+
+    with patch("app.modules.data_load.data_load_repository.reconcile_inventory_stats", AsyncMock()) as reconcile, \
+            patch.object(InventoryStatsDelta, "apply", AsyncMock()) as apply:
+        await DataLoadRepository().create_many(request)
+
+    reconcile.assert_awaited_once_with(request.state.db)
+    apply.assert_not_awaited()
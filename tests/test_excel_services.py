@@ -0,0 +1,172 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+from openpyxl import Workbook
+
+from app.services.excel_services import build_nodes_from_df, iter_excel_chunks, node_content_hash
+from benchmarks.legacy_excel_builder import build_nodes_from_df_iterrows
+
+# added after the row-by-row builder was frozen, checked by assert_derived_fields
+DERIVED_FIELDS = ("content_hash", "ancestors", "root_id")
+
+
+def canonical(documents, nodes):
+    """Replaces generated ObjectIds by their position so both builders can be compared."""
+    positions = {doc["_id"]: index for index, doc in enumerate(documents)}
+    canonical_documents = [
+        {
+            **{field: value for field, value in doc.items() if field not in DERIVED_FIELDS},
+            "_id": positions[doc["_id"]],
+            "parent_id": positions.get(doc["parent_id"], doc["parent_id"]),
+        }
+        for doc in documents
+    ]
+    canonical_nodes = {
+        (reference, positions.get(parent_id, parent_id)): positions.get(_id, _id)
+        for (reference, parent_id), _id in nodes.items()
+    }
+    return canonical_documents, canonical_nodes
+
+
+def assert_derived_fields(documents):
+    by_id = {doc["_id"]: doc for doc in documents}
+    for doc in documents:
+        assert doc["content_hash"] == node_content_hash(doc)
+        parent = by_id.get(doc["parent_id"])
+        if parent is not None:
+            assert doc["ancestors"] == parent["ancestors"] + [parent["_id"]]
+        elif doc["parent_id"] is not None:
+            assert doc["ancestors"][-1:] == [doc["parent_id"]]
+        else:
+            assert doc["ancestors"] == []
+        assert doc["root_id"] == (doc["ancestors"][0] if doc["ancestors"] else doc["_id"])
+
+
+def assert_same_documents(df, extra_fields=None, existing=None):
+    expected_nodes = dict(existing or {})
+    actual_nodes = dict(existing or {})
+
+    expected = build_nodes_from_df_iterrows(df, "delimiter", extra_fields, nodes=expected_nodes)
+    actual = build_nodes_from_df(df, "delimiter", extra_fields, nodes=actual_nodes)
+
+    assert canonical(actual, actual_nodes) == canonical(expected, expected_nodes)
+    assert_derived_fields(actual)
+    return actual
+
+
+def test_matches_iterrows_builder():
+    df = pd.DataFrame({
+        "LOC 1": ["SP", "SP", "SP ", "RJ", "RJ", None],
+        "LOC 2": ["Sala 1", "Sala 1", "Sala 2", "  ", "Sala 1", "Sala 9"],
+        "ATIVO 1": ["RACK-01", "RACK-01", "RACK-02", "RACK-03", np.nan, "RACK-09"],
+        "ATIVO 2": [None, "SW-01", None, None, None, None],
+        "delimiter": [None] * 6,
+        "description": ["Rack", "Switch", "Rack 2", None, "Sala", "Rack 9"],
+        "serial": [1, 2, 3, 4, 5, 6],
+    })
+
+    documents = assert_same_documents(df, extra_fields=["description", "serial", "missing"])
+
+    assert [doc["reference"] for doc in documents] == ["SP", "Sala 1", "RACK-01", "SW-01", "Sala 2", "RACK-02", "RJ", "Sala 1"]
+    assert documents[2]["asset_data"] == {"description": "Rack", "serial": 1}
+
+
+def test_matches_iterrows_builder_with_numeric_cells():
+    df = pd.DataFrame({
+        "LOC 1": [1.0, 1.0, 2.0],
+        "ATIVO": [10.0, 11.0, np.nan],
+        "delimiter": [0.0, 0.0, 0.0],
+    })
+
+    assert_same_documents(df)
+
+
+def test_reuses_existing_nodes():
+    root_id = ObjectId()
+    df = pd.DataFrame({
+        "LOC 1": ["SP", "SP"],
+        "ATIVO": ["RACK-01", "RACK-02"],
+        "delimiter": [None, None],
+    })
+
+    documents = assert_same_documents(df, existing={("SP", None): root_id})
+
+    assert [doc["reference"] for doc in documents] == ["RACK-01", "RACK-02"]
+    assert all(doc["parent_id"] == root_id for doc in documents)
+
+
+def test_empty_sheet():
+    df = pd.DataFrame({"LOC 1": [], "delimiter": []})
+    assert build_nodes_from_df(df, "delimiter") == []
+
+
+def workbook_bytes(rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    buffer = BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def test_iter_excel_chunks_streams_rows():
+    file = workbook_bytes([
+        ["LOC 1", "ATIVO", "delimiter", None, "serial", "serial"],
+        ["SP", "RACK-01", None, None, 1, "a"],
+        [None, None, None, None, None, None],
+        ["SP", "RACK-02", None, None, 2, "b"],
+        ["RJ", "RACK-03"],
+    ])
+
+    chunks = list(iter_excel_chunks(file, chunk_size=2))
+
+    # the blank row is kept as in read_excel and makes the whole column float
+    assert [len(chunk) for chunk in chunks] == [2, 2]
+    assert list(chunks[0].columns) == ["LOC 1", "ATIVO", "delimiter", "Unnamed: 3", "serial", "serial.1"]
+    assert chunks[0].iloc[1].isna().all()
+    assert chunks[1]["serial"].tolist()[:1] == [2.0] and chunks[1]["serial"].dtype == np.float64
+    assert chunks[1].iloc[1, :2].tolist() == ["RJ", "RACK-03"] and chunks[1].iloc[1, 2:].isna().all()
+
+
+def test_streamed_chunks_build_same_tree_as_whole_sheet():
+    rows = [["LOC 1", "LOC 2", "ATIVO", "delimiter", "description"]]
+    rows += [["SP", f"Sala {i % 3}", f"RACK-{i:02d}", None, f"Rack {i}"] for i in range(10)]
+
+    whole = build_nodes_from_df(pd.read_excel(workbook_bytes(rows)), "delimiter", ["description"], nodes={})
+
+    nodes = {}
+    streamed = []
+    for chunk in iter_excel_chunks(workbook_bytes(rows), chunk_size=3):
+        streamed += build_nodes_from_df(chunk, "delimiter", ["description"], nodes=nodes)
+
+    assert canonical(streamed, {}) == canonical(whole, {})
+
+
+def test_streamed_chunks_match_the_baseline_read_excel_import():
+    rows = [
+        ["LOC 1", "LOC 2", "ATIVO", "delimiter", "serial"],
+        ["Predio A", 101, None, None, None],
+        ["Predio A", 101, "NA", None, 7],
+        ["Predio A", None, None, None, None],
+        [None, None, None, None, None],
+        ["Predio B", "102", "null", None, 8],
+        ["Predio B", 103, "RACK-01", None, "N/A"],
+        ["Predio B", 103, 5, None, 9],
+    ]
+
+    expected = build_nodes_from_df_iterrows(pd.read_excel(workbook_bytes(rows)), "delimiter", ["serial"], nodes={})
+
+    for chunk_size in (1, 2, 100):
+        nodes = {}
+        streamed = []
+        for chunk in iter_excel_chunks(workbook_bytes(rows), chunk_size=chunk_size):
+            streamed += build_nodes_from_df(chunk, "delimiter", ["serial"], nodes=nodes)
+
+        assert canonical(streamed, {}) == canonical(expected, {})
+
+    paths = [doc["path"] for doc in expected]
+    assert ["Predio A", "101.0"] in paths and ["Predio A", "101.0", "NA"] not in paths
@@ -0,0 +1,85 @@
+from fastapi import FastAPI
+from starlette.requests import Request
+
+from app.core.decorators.auth_decorator import no_auth
+from app.core.decorators.tenant_decorator import no_tenant_required
+from app.shared.handle_decorator import RouteFlagTable, handle_decorator, route_flags
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @no_tenant_required
+    @no_auth
+    @app.post("/public")
+    async def public():
+        return {}
+
+    @app.get("/private")
+    async def private():
+        return {}
+
+    @no_auth
+    @app.get("/public/{object_id}")
+    async def public_detail(object_id: str):
+        return {}
+
+    return app
+
+
+def make_scope(app: FastAPI, path: str, method: str = "GET") -> dict:
+    return {"type": "http", "app": app, "path": path, "root_path": "", "method": method, "headers": []}
+
+
+def test_flags_are_keyed_by_template_and_method():
+    table = RouteFlagTable(build_app().routes)
+
+    assert table.flags[("/public", "POST")] == {"no_auth", "no_tenant_required"}
+    assert table.flags[("/private", "GET")] == frozenset()
+    assert table.flags[("/public/{object_id}", "GET")] == {"no_auth"}
+
+
+def test_resolves_static_and_parameterized_paths():
+    table = RouteFlagTable(build_app().routes)
+
+    assert table.resolve("/public", "POST") == {"no_auth", "no_tenant_required"}
+    assert table.resolve("/public", "GET") == frozenset()
+    assert table.resolve("/public/abc", "GET") == {"no_auth"}
+    assert table.resolve("/unknown", "GET") == frozenset()
+
+
+def test_routes_are_matched_in_declaration_order():
+    app = FastAPI()
+
+    @no_auth
+    @app.get("/items/{object_id}")
+    async def detail(object_id: str):
+        return {}
+
+    @app.get("/items/export")
+    async def export():
+        return {}
+
+    table = RouteFlagTable(app.routes)
+
+    # Starlette dispatches /items/export to the parameterized route declared first
+    assert table.resolve("/items/export", "GET") == {"no_auth"}
+
+
+def test_root_path_is_stripped_before_resolving():
+    app = build_app()
+    scope = {**make_scope(app, "/api/public/abc"), "root_path": "/api"}
+
+    assert route_flags(scope) == {"no_auth"}
+
+
+def test_handle_decorator_resolves_route_once_per_request():
+    app = build_app()
+    scope = make_scope(app, "/public/abc")
+
+    assert handle_decorator("no_auth", Request(scope)) is True
+    assert handle_decorator("no_tenant_required", Request(scope)) is False
+    assert scope["route_flags"] == {"no_auth"}
+
+    scope["route_flags"] = frozenset({"no_tenant_required"})
+    assert route_flags(scope) == {"no_tenant_required"}
@@ -0,0 +1,214 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+from pymongo import DeleteMany, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.modules.item.item_repository import ItemRepository
+from app.modules.report.report_routes import dashboard_session
+from app.modules.task.task_choices import AsyncTaskType
+from app.shared.database.inventory_stats import (
+    InventoryStatsDelta,
+    claim_first_reconciliation,
+    claim_reconciliation,
+    live_inventory_stats,
+    location_prefixes,
+    reconcile_inventory_stats,
+    stats_counts,
+)
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.documents:
+            yield doc
+
+    async def to_list(self, length=None):
+        return self.documents
+
+
+def test_location_prefixes_exclude_the_node():
+    assert location_prefixes(["SP", "Sala 1", "RACK-01"]) == [("SP",), ("SP", "Sala 1")]
+    assert location_prefixes(None) == []
+
+
+def test_delta_operations():
+    site_id, old_room_id = ObjectId(), ObjectId()
+    delta = InventoryStatsDelta()
+    delta.add_node({"_id": site_id, "node_type": "LOCATION", "reference": "SP", "path": ["SP"], "parent_id": None})
+    delta.add_node({"_id": ObjectId(), "node_type": "ASSET", "path": ["SP", "RACK-01"], "checked": False})
+    delta.add_node({"_id": ObjectId(), "node_type": "ASSET", "path": ["SP", "RACK-02"], "checked": True})
+    delta.add_node({"_id": old_room_id, "node_type": "LOCATION", "path": ["RJ", "Sala 1"]}, sign=-1)
+
+    operations = delta.operations()
+
+    assert isinstance(operations[0], UpdateOne) and operations[0]._filter == {"_id": site_id}
+    assert operations[0]._doc["$setOnInsert"]["total_assets"] == 0
+    assert isinstance(operations[1], UpdateMany)
+    assert operations[1]._filter == {"scope": "location", "path": ["SP"]}
+    assert operations[1]._doc == {"$inc": {"total_assets": 2, "checked_assets": 1}}
+    assert operations[2]._doc == {"$inc": {"total_assets": 2, "checked_assets": 1}}
+    assert isinstance(operations[3], DeleteMany) and operations[3]._filter == {"_id": {"$in": [old_room_id]}}
+
+
+def test_checking_an_asset_only_moves_the_checked_counter():
+    delta = InventoryStatsDelta()
+    delta.add_asset(["SP", "RACK-01"], checked=False, sign=-1)
+    delta.add_asset(["SP", "RACK-01"], checked=True, sign=1)
+
+    assert [operation._doc for operation in delta.operations()] == [
+        {"$inc": {"total_assets": 0, "checked_assets": 1}},
+        {"$inc": {"total_assets": 0, "checked_assets": 1}},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_delta_is_not_applied_before_the_first_reconciliation():
+    collection = MagicMock()
+    collection.find_one = AsyncMock(return_value=None)
+    collection.bulk_write = AsyncMock()
+    db = MagicMock()
+    db.__getitem__.return_value = collection
+
+    delta = InventoryStatsDelta()
+    delta.add_asset(["SP", "RACK-01"], checked=True)
+    await delta.apply(db)
+
+    collection.bulk_write.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_reconcile_recomputes_tenant_and_location_counters():
+    site_id, room_id = ObjectId(), ObjectId()
+    items = MagicMock()
+    items.aggregate = MagicMock(side_effect=[
+        FakeCursor([{"_id": None, "total": 3, "checked": 1}]),
+        FakeCursor([
+            {"_id": ["SP"], "total": 3, "checked": 1},
+            {"_id": ["SP", "Sala 1"], "total": 2, "checked": 1},
+        ]),
+    ])
+    items.find = MagicMock(return_value=FakeCursor([
+        {"_id": site_id, "reference": "SP", "parent_id": None, "path": ["SP"], "level": 0},
+        {"_id": room_id, "reference": "Sala 9", "parent_id": site_id, "path": ["SP", "Sala 9"], "level": 1},
+    ]))
+    stats = MagicMock()
+    stats.bulk_write = AsyncMock()
+    stats.delete_many = AsyncMock()
+    stats.replace_one = AsyncMock()
+    db = MagicMock()
+    db.inventory_items = items
+    db.__getitem__.return_value = stats
+
+    result = await reconcile_inventory_stats(db)
+
+    assert result == {"total_assets": 3, "checked_assets": 1, "locations": 2}
+    replaced = {op._filter["_id"]: op._doc for op in stats.bulk_write.await_args.args[0]}
+    assert (replaced[site_id]["total_assets"], replaced[site_id]["checked_assets"]) == (3, 1)
+    assert (replaced[room_id]["total_assets"], replaced[room_id]["checked_assets"]) == (0, 0)
+    tenant = stats.replace_one.await_args.args[1]
+    assert (tenant["total_assets"], tenant["checked_assets"]) == (3, 1)
+    assert stats.delete_many.await_args.args[0]["reconciled_at"]["$lt"] == tenant["reconciled_at"]
+
+
+@pytest.mark.asyncio
+async def test_claim_reconciliation_once_per_interval():
+    stats_collection = MagicMock()
+    stats_collection.update_one = AsyncMock(return_value=MagicMock(modified_count=1))
+    db = MagicMock()
+    db.__getitem__.return_value = stats_collection
+    now = datetime.now(timezone.utc)
+
+    with patch("app.shared.database.inventory_stats.INVENTORY_STATS_RECONCILE_INTERVAL", 60):
+        recent = {"reconciled_at": (now - timedelta(seconds=10)).replace(tzinfo=None)}
+        assert await claim_reconciliation(db, recent) is False
+
+        stale = {"reconciled_at": (now - timedelta(seconds=120)).replace(tzinfo=None)}
+        assert await claim_reconciliation(db, stale) is True
+
+    stats_collection.update_one.assert_awaited_once()
+    assert stats_collection.update_one.await_args.args[0] == {"_id": "tenant", "reconcile_requested_at": None}
+
+
+def test_stats_counts_matches_dashboard_payload():
+    assert stats_counts({"total_assets": 4, "checked_assets": 1}) == {
+        "total_items": 4, "inventoried": 1, "pending": 3, "percent": 25.0,
+    }
+    assert stats_counts(None) == {"total_items": 0, "inventoried": 0, "pending": 0, "percent": 0}
+
+
+@pytest.mark.asyncio
+async def test_inventoried_counts_checked_assets_only():
+    items = MagicMock()
+    items.aggregate = MagicMock(return_value=FakeCursor([{"_id": None, "total": 4, "checked": 1}]))
+    db = MagicMock()
+    db.inventory_items = items
+
+    assert await live_inventory_stats(db, ["SP", "Sala 1"]) == {"total_assets": 4, "checked_assets": 1}
+
+    # the baseline counted every node with `checked` true, checked locations included
+    match, group = items.aggregate.call_args.args[0]
+    assert match["$match"] == {"node_type": "ASSET", "path.0": "SP", "path.1": "Sala 1", "path.2": {"$exists": True}}
+    assert group["$group"]["checked"] == {"$sum": {"$cond": [{"$eq": ["$checked", True]}, 1, 0]}}
+
+
+@pytest.mark.asyncio
+async def test_first_reconciliation_is_claimed_once():
+    collection = MagicMock()
+    collection.update_one = AsyncMock(side_effect=[MagicMock(upserted_id="tenant"), DuplicateKeyError("E11000")])
+    db = MagicMock()
+    db.__getitem__.return_value = collection
+
+    assert await claim_first_reconciliation(db) is True
+    assert await claim_first_reconciliation(db) is False
+
+
+@pytest.mark.asyncio
+async def test_first_dashboard_read_schedules_the_reconciliation_and_counts_live():
+    request = MagicMock()
+    request.state.db.__getitem__.return_value.find_one = AsyncMock(return_value=None)
+
+    with patch("app.modules.report.report_routes.claim_first_reconciliation", AsyncMock(return_value=True)), \
+            patch("app.modules.report.report_routes.AsyncTaskRepository") as tasks, \
+            patch("app.modules.report.report_routes.live_inventory_stats", AsyncMock(
+                return_value={"total_assets": 4, "checked_assets": 1}
+            )):
+        tasks.return_value.create = AsyncMock()
+        response = await dashboard_session(request, location_id=None)
+
+    assert tasks.return_value.create.await_args.kwargs["task_type"] == AsyncTaskType.RECONCILE_INVENTORY_STATS
+    assert response == {"total_items": 4, "inventoried": 1, "pending": 3, "percent": 25.0}
+
+
+@pytest.mark.asyncio
+async def test_check_is_counted_at_the_path_before_the_move():
+    item_id, new_parent_id = ObjectId(), ObjectId()
+    item = {"_id": item_id, "reference": "R1", "node_type": "ASSET", "checked": False, "path": ["SP", "Sala 1", "R1"]}
+    db = MagicMock()
+    db.inventory_items.find_one = AsyncMock(return_value=item)
+    db.inventory_items.update_one = AsyncMock()
+    applied = []
+
+    async def apply(self, db):
+        applied.append(dict(self.by_location))
+
+    async def move(self, moved_id, parent_id):
+        # the check is already counted when the move measures the subtree
+        assert applied
+        return {**item, "parent_id": parent_id, "path": ["SP", "Sala 2", "R1"]}
+
+    with patch.object(InventoryStatsDelta, "apply", apply), \
+            patch("app.modules.item.item_repository.ItemSubtreeMove.move", move), \
+            patch("app.modules.item.item_repository.ItemSubtreeMove.commit", AsyncMock()), \
+            patch("app.modules.item.item_repository.presign_service.resolve", AsyncMock(return_value=[])):
+        await ItemRepository().update_checked_item(db, {"parent_id": str(new_parent_id)}, item_id, [])
+
+    assert applied == [{("SP",): [0, 1], ("SP", "Sala 1"): [0, 1]}]
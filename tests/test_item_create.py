@@ -0,0 +1,90 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+
+from app.modules.item.item_repository import ItemRepository
+
+
+def fake_request(parent, root_ids_ready=True, existing=None):
+    items = MagicMock()
+    items.find_one = AsyncMock(side_effect=[parent, existing])
+    items.insert_one = AsyncMock()
+    tree_state = MagicMock()
+    tree_state.find_one = AsyncMock(return_value={"ready": True} if root_ids_ready else None)
+    db = MagicMock()
+    db.inventory_items = items
+    db.__getitem__.return_value = tree_state
+    request = MagicMock()
+    request.state.db = db
+    return request, items
+
+
+@pytest.fixture(autouse=True)
+def tree_writes():
+    with patch("app.modules.item.item_repository.bump_tree_version", AsyncMock()), \
+            patch("app.modules.item.item_repository.increment_children_count", AsyncMock()), \
+            patch("app.modules.item.item_repository.apply_stats_delta", AsyncMock()):
+        yield
+
+
+def room():
+    site_id = ObjectId()
+    return site_id, {
+        "_id": ObjectId(), "parent_id": site_id, "reference": "Sala 1", "path": ["SP", "Sala 1"],
+        "level": 1, "ancestors": [site_id], "root_id": site_id,
+    }
+
+
+@pytest.mark.asyncio
+async def test_duplicate_check_is_one_query_on_the_root_id():
+    site_id, parent = room()
+    request, items = fake_request(parent)
+    item_id = ObjectId()
+
+    await ItemRepository().create_item(request, {"reference": "R1", "parent_id": str(parent["_id"])}, item_id, [])
+
+    # the parent and the duplicate check, no walk up to the root
+    assert items.find_one.await_count == 2
+    assert items.find_one.await_args.args[0] == {"reference": "R1", "root_id": site_id}
+    doc = items.insert_one.await_args.args[0]
+    assert doc["root_id"] == site_id and doc["is_app_created"] is True
+
+
+@pytest.mark.asyncio
+async def test_existing_reference_in_the_tree_is_rejected():
+    _, parent = room()
+    request, items = fake_request(parent, existing={"_id": ObjectId()})
+
+    with pytest.raises(HTTPException) as error:
+        await ItemRepository().create_item(request, {"reference": "R1", "parent_id": str(parent["_id"])}, ObjectId(), [])
+
+    assert error.value.status_code == 400
+    items.insert_one.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_create_losing_the_unique_index_is_rejected():
+    _, parent = room()
+    request, items = fake_request(parent)
+    items.insert_one.side_effect = DuplicateKeyError("E11000 duplicate key")
+
+    with pytest.raises(HTTPException) as error:
+        await ItemRepository().create_item(request, {"reference": "R1", "parent_id": str(parent["_id"])}, ObjectId(), [])
+
+    assert error.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_tenant_without_root_ids_resolves_the_root_by_reference():
+    site = {"_id": ObjectId(), "parent_id": None, "reference": "SP", "path": ["SP"]}
+    parent = {"_id": ObjectId(), "parent_id": site["_id"], "reference": "Sala 1", "path": ["SP", "Sala 1"], "level": 1}
+    request, items = fake_request(parent, root_ids_ready=False)
+    items.find_one.side_effect = [parent, site, None]
+
+    await ItemRepository().create_item(request, {"reference": "R1", "parent_id": str(parent["_id"])}, ObjectId(), [])
+
+    assert items.find_one.await_args.args[0] == {"reference": "R1", "path.0": "SP"}
+    assert items.insert_one.await_args.args[0]["root_id"] == site["_id"]
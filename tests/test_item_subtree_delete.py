@@ -0,0 +1,211 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+
+from app.modules.item.item_subtree_delete import ItemSubtreeDelete
+from app.modules.task.handlers.maintenance.delete_item_subtree_handler import DeleteItemSubtreeHandler
+from app.shared.storage.s3.cleanup import drain_storage_cleanup
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def batch_size(self, size):
+        return self
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, size):
+        self.documents = self.documents[:size]
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in list(self.documents):
+            yield doc
+
+    async def to_list(self, length=None):
+        return list(self.documents)
+
+
+class FakeItems:
+    def __init__(self, documents):
+        self.documents = {doc["_id"]: doc for doc in documents}
+        self.delete_batches = []
+        self.deleted = []
+
+    async def find_one(self, query, projection=None):
+        return self.documents.get(query["_id"])
+
+    def find(self, query, projection=None):
+        if "_id" in query:
+            return FakeCursor([self.documents[object_id] for object_id in query["_id"]["$in"] if object_id in self.documents])
+        if "ancestors" in query:
+            roots = set(query["ancestors"]["$in"])
+            return FakeCursor([doc for doc in self.documents.values() if roots & set(doc.get("ancestors", []))])
+        parents = set(query["parent_id"]["$in"])
+        return FakeCursor([doc for doc in self.documents.values() if doc.get("parent_id") in parents])
+
+    async def update_one(self, query, update, upsert=False):
+        # the tree version bump, `db[...]` hands this collection out for every name
+        return MagicMock(modified_count=0)
+
+    async def delete_many(self, query):
+        ids = [object_id for object_id in query["_id"]["$in"] if object_id in self.documents]
+        self.delete_batches.append(len(query["_id"]["$in"]))
+        self.deleted.extend(ids)
+        for object_id in ids:
+            del self.documents[object_id]
+        return MagicMock(deleted_count=len(ids))
+
+
+def build_tree():
+    site = {"_id": ObjectId(), "parent_id": None, "node_type": "LOCATION", "path": ["SP"]}
+    keep = {"_id": ObjectId(), "parent_id": site["_id"], "node_type": "LOCATION", "path": ["SP", "Sala 2"]}
+    room = {"_id": ObjectId(), "parent_id": site["_id"], "node_type": "LOCATION", "path": ["SP", "Sala 1"]}
+    racks = [
+        {
+            "_id": ObjectId(), "parent_id": room["_id"], "node_type": "ASSET", "path": ["SP", "Sala 1", f"R{index}"],
+            "photos": [f"r{index}.png"], "photo_derivatives": [{"ORIGINAL": f"r{index}.png", "THUMBNAIL": f"t/r{index}.jpg"}],
+        }
+        for index in range(3)
+    ]
+    devices = [
+        {"_id": ObjectId(), "parent_id": rack["_id"], "node_type": "ASSET", "path": rack["path"] + ["D"]}
+        for rack in racks
+    ]
+    return site, keep, room, racks, devices
+
+
+def subtree_delete(items, batch_size=2):
+    db = MagicMock()
+    db.__getitem__.return_value = items
+    return ItemSubtreeDelete(db, batch_size=batch_size)
+
+
+@pytest.mark.asyncio
+async def test_delete_removes_the_subtree_in_batches_and_queues_photos():
+    site, keep, room, racks, devices = build_tree()
+    items = FakeItems([site, keep, room, *racks, *devices])
+    service = subtree_delete(items)
+
+    with patch("app.modules.item.item_subtree_delete.queue_storage_cleanup", AsyncMock(side_effect=lambda db, keys: len(keys))) as queue, \
+            patch("app.modules.item.item_subtree_delete.apply_stats_delta", AsyncMock()) as stats, \
+            patch("app.modules.item.item_subtree_delete.increment_children_count", AsyncMock()) as increment, \
+            patch("app.modules.item.item_subtree_delete.bump_tree_version", AsyncMock()) as bump:
+        deleted, pending = await service.delete(room["_id"])
+
+    assert (deleted, pending) == (7, [])
+    assert set(items.documents) == {site["_id"], keep["_id"]}
+    # the deepest level first and the item itself last
+    assert set(items.deleted[:3]) == {device["_id"] for device in devices}
+    assert set(items.deleted[3:6]) == {rack["_id"] for rack in racks}
+    assert items.deleted[6] == room["_id"]
+    bump.assert_awaited_once()
+    assert max(items.delete_batches) <= 2
+    increment.assert_awaited_once_with(items, site["_id"], -1)
+    assert sum(len(call.args[1]) for call in stats.await_args_list) == 7
+    assert all(call.args[2] == -1 for call in stats.await_args_list)
+    queued = [key for call in queue.await_args_list for key in call.args[1]]
+    assert sorted(queued) == ["r0.png", "r1.png", "r2.png", "t/r0.jpg", "t/r1.jpg", "t/r2.jpg"]
+    assert service.photos_queued == 6
+
+
+@pytest.mark.asyncio
+async def test_large_subtree_stops_the_walk_at_the_limit_and_keeps_the_item():
+    site, keep, room, racks, devices = build_tree()
+    items = FakeItems([site, keep, room, *racks, *devices])
+    service = subtree_delete(items)
+    read = []
+    find = items.find
+    items.find = lambda query, projection=None: read.append(query) or find(query, projection)
+
+    with patch("app.modules.item.item_subtree_delete.queue_storage_cleanup", AsyncMock(return_value=0)), \
+            patch("app.modules.item.item_subtree_delete.apply_stats_delta", AsyncMock()), \
+            patch("app.modules.item.item_subtree_delete.increment_children_count", AsyncMock()) as increment:
+        deleted, pending = await service.delete(room["_id"], limit=2)
+        # the walk stopped at the racks, the devices were never read
+        assert (deleted, pending) == (0, [room["_id"]])
+        assert len(read) == 1
+        assert len(items.documents) == 9
+        increment.assert_not_awaited()
+
+        resumed, remaining = await service.delete(room["_id"], limit=None)
+
+    assert (resumed, remaining) == (7, [])
+    assert set(items.documents) == {site["_id"], keep["_id"]}
+    assert items.deleted[-1] == room["_id"]
+    increment.assert_awaited_once_with(items, site["_id"], -1)
+
+
+@pytest.mark.asyncio
+async def test_materialized_ancestors_keep_the_item_until_the_subtree_is_gone():
+    site, keep, room, racks, devices = build_tree()
+    for doc in [room, *racks]:
+        doc["ancestors"] = [site["_id"], room["_id"]] if doc is not room else [site["_id"]]
+    for device in devices:
+        device["ancestors"] = [site["_id"], room["_id"], device["parent_id"]]
+    items = FakeItems([site, keep, room, *racks, *devices])
+    service = subtree_delete(items)
+
+    with patch("app.modules.item.item_subtree_delete.ancestors_ready", AsyncMock(return_value=True)), \
+            patch("app.modules.item.item_subtree_delete.queue_storage_cleanup", AsyncMock(return_value=0)), \
+            patch("app.modules.item.item_subtree_delete.apply_stats_delta", AsyncMock()), \
+            patch("app.modules.item.item_subtree_delete.increment_children_count", AsyncMock()):
+        deleted, pending = await service.delete(room["_id"], limit=2)
+        assert (deleted, pending) == (2, [room["_id"]])
+        assert room["_id"] in items.documents
+
+        resumed, remaining = await service.delete(room["_id"], limit=None)
+
+    assert (resumed, remaining) == (5, [])
+    assert set(items.documents) == {site["_id"], keep["_id"]}
+
+
+@pytest.mark.asyncio
+async def test_task_deletes_pending_items_and_legacy_parent_ids():
+    site, keep, room, racks, devices = build_tree()
+    items = FakeItems([site, keep, room, *racks, *devices])
+    handler = DeleteItemSubtreeHandler.__new__(DeleteItemSubtreeHandler)
+    handler.db = MagicMock()
+    handler.db.__getitem__.return_value = items
+
+    with patch("app.modules.item.item_subtree_delete.queue_storage_cleanup", AsyncMock(return_value=0)), \
+            patch("app.modules.item.item_subtree_delete.apply_stats_delta", AsyncMock()), \
+            patch("app.modules.item.item_subtree_delete.increment_children_count", AsyncMock()), \
+            patch("app.modules.task.handlers.maintenance.delete_item_subtree_handler.drain_storage_cleanup", AsyncMock(return_value=0)):
+        result = await handler.execute({"item_ids": [str(room["_id"])], "parent_ids": [str(keep["_id"])]})
+
+    assert result == {"deleted_count": 7, "deleted_objects": 0}
+    assert set(items.documents) == {site["_id"], keep["_id"]}
+
+
+@pytest.mark.asyncio
+async def test_missing_item_deletes_nothing():
+    items = FakeItems([])
+
+    assert await subtree_delete(items).delete(ObjectId()) == (0, [])
+
+
+@pytest.mark.asyncio
+async def test_drain_deletes_queued_objects_in_batches():
+    entries = [{"_id": ObjectId(), "key": f"photos/{index}.png"} for index in range(5)]
+    collection = MagicMock()
+    collection.find = MagicMock(side_effect=lambda *args: FakeCursor(list(entries)))
+
+    async def delete_many(query):
+        entries[:] = [entry for entry in entries if entry["_id"] not in query["_id"]["$in"]]
+
+    collection.delete_many = AsyncMock(side_effect=delete_many)
+    db = MagicMock()
+    db.__getitem__.return_value = collection
+
+    with patch("app.shared.storage.s3.cleanup.storage_s3_delete_objects", return_value=0) as delete_objects:
+        assert await drain_storage_cleanup(db, batch_size=2) == 5
+
+    assert [len(call.args[0]) for call in delete_objects.call_args_list] == [2, 2, 1]
@@ -0,0 +1,275 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.modules.item.item_subtree_move import ItemSubtreeMove, rewrite_path_pipeline, subtree_path_query
+from app.shared.database.ancestors import subtree_query
+from app.shared.database.inventory_stats import InventoryStatsDelta
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.documents:
+            yield doc
+
+    async def to_list(self, length=None):
+        return self.documents
+
+
+def matches(doc, query):
+    for field, expected in query.items():
+        if field == "_id" and isinstance(expected, dict):
+            if doc["_id"] == expected.get("$ne") or doc["_id"] not in expected.get("$in", [doc["_id"]]):
+                return False
+            continue
+        if field == "path":
+            if expected not in doc.get("path", []):
+                return False
+            continue
+        if field.startswith("path."):
+            index = int(field.split(".")[1])
+            path = doc.get("path", [])
+            if isinstance(expected, dict):
+                if (index < len(path)) != expected["$exists"]:
+                    return False
+            elif index >= len(path) or path[index] != expected:
+                return False
+            continue
+        if isinstance(expected, dict) and "$in" in expected:
+            if doc.get(field) not in expected["$in"]:
+                return False
+            continue
+        if doc.get(field) != expected:
+            return False
+    return True
+
+
+class FakeItems:
+    def __init__(self, documents):
+        self.documents = documents
+        self.update_many = AsyncMock()
+        self.update_one = AsyncMock()
+        self.matched = []
+
+    async def find_one(self, query, projection=None):
+        return next((doc for doc in self.documents if matches(doc, query)), None)
+
+    async def distinct(self, field, query):
+        subtree = query["$or"][0]["_id"]["$in"]
+        return [
+            doc[field] for doc in self.documents
+            if (doc["_id"] in subtree or set(subtree) & set(doc.get("ancestors", []))) and doc.get("is_app_created")
+        ]
+
+    def find(self, query, projection=None):
+        return FakeCursor([doc for doc in self.documents if matches(doc, {k: v for k, v in query.items() if k != "node_type"})])
+
+    def aggregate(self, pipeline):
+        self.matched.append(pipeline[0]["$match"])
+        return FakeCursor([{"_id": None, "total": 3, "checked": 1}])
+
+
+def build_mover(items, ancestors_ready=False):
+    stats = MagicMock()
+    stats.bulk_write = AsyncMock()
+    tree_state = MagicMock()
+    tree_state.find_one = AsyncMock(return_value={"ready": True} if ancestors_ready else None)
+    tree_state.update_one = AsyncMock()
+    collections = {"inventory_items": items, "tree_state": tree_state}
+    db = MagicMock()
+    db.__getitem__.side_effect = lambda name: collections.get(name, stats)
+    return ItemSubtreeMove(db)
+
+
+def tree():
+    site = {"_id": ObjectId(), "parent_id": None, "reference": "SP", "path": ["SP"], "level": 0, "ancestors": []}
+    site["root_id"] = site["_id"]
+    old_room = {"_id": ObjectId(), "parent_id": site["_id"], "reference": "Sala 1", "path": ["SP", "Sala 1"], "level": 1, "ancestors": [site["_id"]]}
+    new_room = {"_id": ObjectId(), "parent_id": site["_id"], "reference": "Sala 2", "path": ["SP", "Sala 2"], "level": 1, "ancestors": [site["_id"]]}
+    rack = {"_id": ObjectId(), "parent_id": old_room["_id"], "reference": "RACK", "path": ["SP", "Sala 1", "RACK"], "level": 2, "ancestors": [site["_id"], old_room["_id"]]}
+    device = {"_id": ObjectId(), "parent_id": rack["_id"], "reference": "D1", "path": ["SP", "Sala 1", "RACK", "D1"], "level": 3, "ancestors": [site["_id"], old_room["_id"], rack["_id"]]}
+    for node in (old_room, new_room, rack, device):
+        node["root_id"] = site["_id"]
+    return site, old_room, new_room, rack, device
+
+
+def test_subtree_query_and_rewrite_pipeline():
+    assert subtree_path_query(["SP", "Sala 1"]) == {
+        "path": "Sala 1", "path.0": "SP", "path.1": "Sala 1", "path.2": {"$exists": True},
+    }
+    assert "path.2" not in subtree_path_query(["SP", "Sala 1"], include_root=True)
+
+    stage = rewrite_path_pipeline(3, ["SP", "$Sala 2", "RACK"], -1)[0]["$set"]
+    # references are literals, "$Sala 2" is not a field path
+    assert stage["path"]["$concatArrays"][0] == [{"$literal": "SP"}, {"$literal": "$Sala 2"}, {"$literal": "RACK"}]
+    assert stage["path"]["$concatArrays"][1]["$slice"][:2] == ["$path", 3]
+    assert stage["level"] == {"$add": ["$level", -1]}
+
+
+@pytest.mark.asyncio
+async def test_move_rewrites_descendants_with_one_update():
+    site, old_room, new_room, rack, device = tree()
+    items = FakeItems([site, old_room, new_room, rack, device])
+    mover = build_mover(items)
+    # the item is updated last, an interrupted move is repeated from the descendants
+    items.update_many.side_effect = lambda *args: items.update_one.assert_not_awaited()
+
+    moved = await mover.move(rack["_id"], new_room["_id"])
+
+    assert moved["path"] == ["SP", "Sala 2", "RACK"] and moved["level"] == 2
+    items.update_many.assert_awaited_once_with(
+        subtree_path_query(["SP", "Sala 1", "RACK"]),
+        rewrite_path_pipeline(3, ["SP", "Sala 2", "RACK"], 0, rack["_id"], [site["_id"], new_room["_id"]], site["_id"])
+    )
+    items.update_one.assert_awaited_once_with(
+        {"_id": rack["_id"]},
+        {"$set": {
+            "parent_id": new_room["_id"], "path": ["SP", "Sala 2", "RACK"], "level": 2,
+            "ancestors": [site["_id"], new_room["_id"]], "root_id": site["_id"],
+        }}
+    )
+
+    with patch("app.modules.item.item_subtree_move.refresh_children_count", AsyncMock()) as refresh, \
+            patch.object(InventoryStatsDelta, "apply", AsyncMock()):
+        operations = mover._stats.operations()
+        await mover.commit()
+
+    assert set(refresh.await_args.args[1]) == {old_room["_id"], new_room["_id"]}
+    # the site holds the rack before and after, only the rooms change
+    assert {tuple(op._filter["path"]): op._doc["$inc"] for op in operations} == {
+        ("SP", "Sala 1"): {"total_assets": -3, "checked_assets": -1},
+        ("SP", "Sala 2"): {"total_assets": 3, "checked_assets": 1},
+    }
+
+
+@pytest.mark.asyncio
+async def test_move_into_own_subtree_is_rejected():
+    site, old_room, new_room, rack, device = tree()
+    items = FakeItems([site, old_room, new_room, rack, device])
+
+    with pytest.raises(HTTPException) as error:
+        await build_mover(items).move(old_room["_id"], device["_id"])
+
+    assert error.value.status_code == 400
+    items.update_many.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_move_next_to_a_namesake_is_rejected():
+    site, old_room, new_room, rack, device = tree()
+    other_rack = {"_id": ObjectId(), "parent_id": new_room["_id"], "reference": "RACK", "path": ["SP", "Sala 2", "RACK"], "level": 2}
+    items = FakeItems([site, old_room, new_room, rack, device, other_rack])
+
+    with pytest.raises(HTTPException):
+        await build_mover(items).move(rack["_id"], new_room["_id"])
+
+
+@pytest.mark.asyncio
+async def test_namesake_with_the_same_path_falls_back_to_the_parent_walk():
+    site, old_room, new_room, rack, device = tree()
+    twin = {"_id": ObjectId(), "parent_id": old_room["_id"], "reference": "RACK", "path": ["SP", "Sala 1", "RACK"], "level": 2}
+    items = FakeItems([site, old_room, new_room, rack, device, twin])
+
+    await build_mover(items).move(rack["_id"], new_room["_id"])
+
+    items.update_many.assert_awaited_once_with(
+        {"_id": {"$in": [device["_id"]]}, "path.0": "SP", "path.1": "Sala 1", "path.2": "RACK"},
+        rewrite_path_pipeline(3, ["SP", "Sala 2", "RACK"], 0, rack["_id"], [site["_id"], new_room["_id"]], site["_id"])
+    )
+    # the counters are taken from the walked ids, not from the twin's path
+    assert items.matched == [{"_id": {"$in": [rack["_id"], device["_id"]]}, "node_type": "ASSET"}]
+
+
+@pytest.mark.asyncio
+async def test_namesake_on_the_new_path_is_left_out_of_the_moved_subtree():
+    site, old_room, new_room, rack, device = tree()
+    twin_room = {"_id": ObjectId(), "parent_id": site["_id"], "reference": "Sala 2", "path": ["SP", "Sala 2"], "level": 1}
+    twin_rack = {"_id": ObjectId(), "parent_id": twin_room["_id"], "reference": "RACK", "path": ["SP", "Sala 2", "RACK"], "level": 2}
+    items = FakeItems([site, old_room, new_room, rack, device, twin_room, twin_rack])
+    mover = build_mover(items)
+
+    await mover.move(rack["_id"], new_room["_id"])
+
+    assert items.matched == [{"_id": {"$in": [rack["_id"], device["_id"]]}, "node_type": "ASSET"}]
+    with patch("app.modules.item.item_subtree_move.refresh_children_count", AsyncMock()), \
+            patch.object(InventoryStatsDelta, "apply", AsyncMock()):
+        await mover.commit()
+
+    operations = mover.db["inventory_stats"].bulk_write.await_args.args[0]
+    assert {op._filter["_id"] for op in operations} == {rack["_id"], device["_id"]}
+
+
+@pytest.mark.asyncio
+async def test_materialized_ancestors_select_the_subtree_by_id():
+    site, old_room, new_room, rack, device = tree()
+    twin = {"_id": ObjectId(), "parent_id": old_room["_id"], "reference": "RACK", "path": ["SP", "Sala 1", "RACK"], "level": 2}
+    items = FakeItems([site, old_room, new_room, rack, device, twin])
+    mover = build_mover(items, ancestors_ready=True)
+
+    await mover.move(rack["_id"], new_room["_id"])
+
+    # the twin shares the path, not the ids
+    items.update_many.assert_awaited_once_with(
+        {"ancestors": rack["_id"]},
+        rewrite_path_pipeline(3, ["SP", "Sala 2", "RACK"], 0, rack["_id"], [site["_id"], new_room["_id"]], site["_id"])
+    )
+    assert items.matched == [{**subtree_query([rack["_id"]]), "node_type": "ASSET"}]
+
+    with pytest.raises(HTTPException):
+        await mover.move(old_room["_id"], device["_id"])
+
+
+def test_rewrite_pipeline_keeps_the_ancestors_below_the_moved_item():
+    item_id = ObjectId()
+    new_ancestors = [ObjectId(), ObjectId()]
+
+    ancestors = rewrite_path_pipeline(3, ["SP", "Sala 2", "RACK"], 0, item_id, new_ancestors)[0]["$set"]["ancestors"]
+    condition, rewritten, unchanged = ancestors["$cond"]
+
+    assert condition == {"$gte": [{"$indexOfArray": [{"$ifNull": ["$ancestors", []]}, item_id]}, 0]}
+    assert rewritten["$concatArrays"][0] == new_ancestors
+    assert unchanged == "$ancestors"
+    # nodes holding the item are rewritten from its position, a second run changes nothing
+    position = condition["$gte"][0]
+    path_condition, path_rewritten, path_unchanged = rewrite_path_pipeline(3, ["SP"], 0, item_id, new_ancestors)[0]["$set"]["path"]["$cond"]
+    assert path_condition == condition
+    assert path_rewritten["$concatArrays"][1]["$slice"][1] == {"$add": [position, 1]}
+    assert path_unchanged["$concatArrays"][1]["$slice"][1] == 3
+    level = rewrite_path_pipeline(3, ["SP"], 0, item_id, new_ancestors)[0]["$set"]["level"]["$cond"]
+    assert level[1] == {"$add": ["$level", {"$subtract": [2, position]}]}
+    assert "ancestors" not in rewrite_path_pipeline(3, ["SP"], 0)[0]["$set"]
+    # a root unknown to the new parent is dropped until the backfill restores it
+    assert rewrite_path_pipeline(3, ["SP"], 0, item_id, new_ancestors)[0]["$set"]["root_id"] == "$$REMOVE"
+
+
+@pytest.mark.asyncio
+async def test_move_to_another_tree_takes_its_root_and_checks_app_created_references():
+    site, old_room, new_room, rack, device = tree()
+    device["is_app_created"] = True
+    other_site = {"_id": ObjectId(), "parent_id": None, "reference": "RJ", "path": ["RJ"], "level": 0, "ancestors": []}
+    other_site["root_id"] = other_site["_id"]
+    namesake = {
+        "_id": ObjectId(), "parent_id": other_site["_id"], "reference": "D1", "path": ["RJ", "D1"], "level": 1,
+        "ancestors": [other_site["_id"]], "root_id": other_site["_id"], "is_app_created": True,
+    }
+    items = FakeItems([site, old_room, new_room, rack, device, other_site, namesake])
+
+    with pytest.raises(HTTPException) as error:
+        await build_mover(items, ancestors_ready=True).move(rack["_id"], other_site["_id"])
+
+    assert error.value.status_code == 400
+    items.update_many.assert_not_awaited()
+
+    namesake["is_app_created"] = False
+    moved = await build_mover(items, ancestors_ready=True).move(rack["_id"], other_site["_id"])
+
+    assert moved["root_id"] == other_site["_id"]
+    assert items.update_many.await_args.args[1][0]["$set"]["root_id"] == other_site["_id"]
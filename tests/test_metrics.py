@@ -0,0 +1,43 @@
+from unittest.mock import MagicMock
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.shared.observability import metrics
+from app.shared.observability.metrics import MongoMetricsListener
+
+
+def sample(name: str, labels: dict) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_metrics_endpoint_is_public(client: TestClient):
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert "http_request_duration_seconds" in response.text
+
+
+def test_mongo_listener_records_commands_and_pool_waits():
+    listener = MongoMetricsListener()
+    commands = sample("mongo_command_duration_seconds_count", {"command": "find", "outcome": "success"})
+    checkouts = sample("mongo_pool_checkout_wait_seconds_count", {"outcome": "success"})
+
+    listener.succeeded(MagicMock(command_name="find", duration_micros=1500))
+    listener.connection_checked_out(MagicMock(duration=0.002))
+    listener.connection_checked_in(MagicMock())
+
+    assert sample("mongo_command_duration_seconds_count", {"command": "find", "outcome": "success"}) == commands + 1
+    assert sample("mongo_pool_checkout_wait_seconds_count", {"outcome": "success"}) == checkouts + 1
+
+
+def test_clear_multiprocess_dir_removes_previous_value_files(tmp_path, monkeypatch):
+    (tmp_path / "counter_1.db").write_bytes(b"")
+    (tmp_path / "histogram_2.db").write_bytes(b"")
+    (tmp_path / "keep.txt").write_text("")
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "MULTIPROCESS_MODE", True)
+
+    metrics.clear_multiprocess_dir()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["keep.txt"]
@@ -0,0 +1,112 @@
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from app.shared import mongo_indexes
+from app.shared.mongo_indexes import INDEX_MANIFEST, INDEXES_VERSION, ensure_indexes
+
+
+def fake_lock(acquired: bool):
+    @asynccontextmanager
+    async def lock(name, **kwargs):
+        yield acquired
+    return lock
+
+
+def make_db(applied_version):
+    db = MagicMock()
+    db.name = "tenant_test"
+    manifest = {"version": applied_version} if applied_version is not None else None
+
+    collections = {}
+
+    def get_collection(name):
+        if name not in collections:
+            collection = MagicMock()
+            collection.create_index = AsyncMock()
+            collection.drop_index = AsyncMock()
+            collection.find_one = AsyncMock(return_value=manifest)
+            collection.update_one = AsyncMock()
+            collections[name] = collection
+        return collections[name]
+
+    db.__getitem__.side_effect = get_collection
+    return db, get_collection
+
+
+@pytest.mark.asyncio
+async def test_applies_manifest_and_records_version():
+    db, collection = make_db(applied_version=None)
+
+    with patch.object(mongo_indexes, "distributed_lock", fake_lock(True)):
+        assert await ensure_indexes(db) is True
+
+    created = sum(
+        collection(name).create_index.await_count
+        for name in {name for name, _, _ in INDEX_MANIFEST}
+    )
+    assert created == len(INDEX_MANIFEST)
+    update = collection("index_manifest").update_one.await_args
+    assert update.args[1]["$set"]["version"] == INDEXES_VERSION
+
+
+@pytest.mark.asyncio
+async def test_skips_when_version_is_current():
+    db, collection = make_db(applied_version=INDEXES_VERSION)
+
+    with patch.object(mongo_indexes, "distributed_lock", fake_lock(True)):
+        assert await ensure_indexes(db) is False
+
+    collection("inventory_items").create_index.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_skips_when_another_process_holds_the_lock():
+    db, collection = make_db(applied_version=0)
+
+    with patch.object(mongo_indexes, "distributed_lock", fake_lock(False)):
+        assert await ensure_indexes(db) is False
+
+    collection("inventory_items").create_index.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_failing_index_does_not_stop_the_others():
+    db, collection = make_db(applied_version=None)
+    unique_keys = next(keys for name, keys, options in INDEX_MANIFEST if options.get("unique"))
+
+    async def create_index(keys, **options):
+        if keys == unique_keys:
+            raise DuplicateKeyError("E11000 duplicate key")
+
+    collection("inventory_items").create_index.side_effect = create_index
+
+    with patch.object(mongo_indexes, "distributed_lock", fake_lock(True)):
+        assert await ensure_indexes(db) is False
+
+    created = sum(
+        collection(name).create_index.await_count
+        for name in {name for name, _, _ in INDEX_MANIFEST}
+    )
+    assert created == len(INDEX_MANIFEST)
+    # the version stays behind, the next start retries the failed index
+    update = collection("index_manifest").update_one.await_args
+    assert "version" not in update.args[1]["$set"]
+    assert len(update.args[1]["$set"]["failed_indexes"]) == 1
+    assert update.args[1]["$set"]["failed_version"] == INDEXES_VERSION
+
+
+@pytest.mark.asyncio
+async def test_drops_obsolete_indexes_already_gone_or_not():
+    db, collection = make_db(applied_version=6)
+    collection("inventory_items").drop_index.side_effect = OperationFailure("index not found", code=27)
+
+    with patch.object(mongo_indexes, "distributed_lock", fake_lock(True)):
+        assert await ensure_indexes(db) is True
+
+    collection("inventory_items").drop_index.assert_awaited_once_with("reference_1_root_id_1")
+    update = collection("index_manifest").update_one.await_args
+    assert update.args[1]["$set"]["version"] == INDEXES_VERSION
+    assert "failed_indexes" in update.args[1]["$unset"]
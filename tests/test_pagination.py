@@ -0,0 +1,70 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson import ObjectId
+
+from app.shared.database.pagination import KEYSET_SORT, decode_cursor, encode_cursor, keyset_page, keyset_query
+
+
+def test_cursor_round_trip():
+    object_id = ObjectId()
+    token = encode_cursor("Sala 1/á", object_id)
+
+    assert "=" not in token
+    assert decode_cursor(token) == ("Sala 1/á", object_id)
+
+
+@pytest.mark.parametrize("token", ["", "not-a-cursor", encode_cursor("a", ObjectId())[:-4]])
+def test_decode_rejects_foreign_tokens(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+def test_keyset_query_starts_after_cursor():
+    object_id = ObjectId()
+    query = {"parent_id": None}
+
+    assert keyset_query(query, None) is query
+    assert keyset_query(query, encode_cursor("B", object_id)) == {
+        "$and": [
+            query,
+            {"$or": [{"reference": {"$gt": "B"}}, {"reference": "B", "_id": {"$gt": object_id}}]},
+        ]
+    }
+
+
+def fake_collection(docs):
+    find = MagicMock()
+    find.sort.return_value = find
+    find.skip.return_value = find
+    find.limit.side_effect = lambda n: MagicMock(to_list=AsyncMock(return_value=docs[:n]))
+    collection = MagicMock()
+    collection.find.return_value = find
+    return collection, find
+
+
+@pytest.mark.asyncio
+async def test_keyset_page_returns_next_token_only_when_more_documents_exist():
+    docs = [{"_id": ObjectId(), "reference": reference} for reference in ["A", "B", "C"]]
+    collection, find = fake_collection(docs)
+
+    page, next_cursor = await keyset_page(collection, {"parent_id": None}, limit=2)
+
+    assert page == docs[:2]
+    assert decode_cursor(next_cursor) == ("B", docs[1]["_id"])
+    find.sort.assert_called_with(KEYSET_SORT)
+    find.limit.assert_called_with(3)
+
+    page, next_cursor = await keyset_page(collection, {"parent_id": None}, limit=3)
+    assert page == docs and next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_keyset_page_ignores_skip_with_cursor():
+    collection, find = fake_collection([])
+
+    await keyset_page(collection, {}, limit=10, skip=20)
+    find.skip.assert_called_once_with(20)
+
+    await keyset_page(collection, {}, limit=10, cursor=encode_cursor("A", ObjectId()), skip=20)
+    find.skip.assert_called_once_with(20)
@@ -0,0 +1,111 @@
+import io
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+from PIL import Image
+
+from app.modules.item.item_photo_derivatives import ItemPhotoDerivatives
+from app.shared.files.images import photo_derivative_key, photo_keys_for_size, render_photo_derivatives
+from app.shared.files.photo_size_choices import PhotoSizeChoice
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.documents:
+            yield doc
+
+
+def photo_bytes(width=2000, height=1500, format="PNG"):
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(output, format=format)
+    return output.getvalue()
+
+
+def test_render_keeps_aspect_ratio_within_each_size():
+    derivatives = render_photo_derivatives(photo_bytes())
+
+    sizes = {size: Image.open(io.BytesIO(data)) for size, data in derivatives.items()}
+    assert {size: image.size for size, image in sizes.items()} == {"THUMBNAIL": (256, 192), "PREVIEW": (1024, 768)}
+    assert all(image.format == "JPEG" for image in sizes.values())
+
+
+def test_small_photos_are_not_upscaled():
+    derivatives = render_photo_derivatives(photo_bytes(300, 200))
+
+    assert Image.open(io.BytesIO(derivatives["PREVIEW"])).size == (300, 200)
+
+
+def test_photo_keys_fall_back_to_originals():
+    key = "multi-tenant/client/t/inventory-checks/1/images/front__1.png"
+    doc = {
+        "photos": [key, "other.png"],
+        "photo_derivatives": [{"ORIGINAL": key, "THUMBNAIL": photo_derivative_key(key, PhotoSizeChoice.THUMBNAIL)}],
+    }
+
+    assert photo_keys_for_size(doc, PhotoSizeChoice.THUMBNAIL) == [
+        "multi-tenant/client/t/inventory-checks/1/images/derivatives/thumbnail/front__1.jpg",
+        "other.png",
+    ]
+    assert photo_keys_for_size(doc, PhotoSizeChoice.PREVIEW) == [key, "other.png"]
+    assert photo_keys_for_size(doc, PhotoSizeChoice.ORIGINAL) == [key, "other.png"]
+    assert photo_keys_for_size({"photos": "single.png"}, PhotoSizeChoice.THUMBNAIL) == ["single.png"]
+
+
+def derivatives_service():
+    collection = MagicMock()
+    collection.update_one = AsyncMock()
+    db = MagicMock()
+    db.__getitem__.return_value = collection
+    return ItemPhotoDerivatives(db), collection
+
+
+@pytest.mark.asyncio
+async def test_build_for_item_stores_and_records_derivatives():
+    service, collection = derivatives_service()
+    item_id = ObjectId()
+
+    with patch("app.modules.item.item_photo_derivatives.derivatives_executor", return_value=None), \
+            patch("app.modules.item.item_photo_derivatives.storage_s3_save_bytes") as save, \
+            patch("app.modules.item.item_photo_derivatives.storage_s3_download_object") as download:
+        built = await service.build_for_item(item_id, ["a/images/one.png", "a/images/broken.png"], [photo_bytes(), b"not an image"])
+
+    assert built == 1
+    download.assert_not_called()
+    assert sorted(call.args[1] for call in save.call_args_list) == [
+        "a/images/derivatives/preview/one.jpg",
+        "a/images/derivatives/thumbnail/one.jpg",
+    ]
+    collection.update_one.assert_awaited_once_with(
+        {"_id": item_id},
+        {"$push": {"photo_derivatives": {"$each": [{
+            "ORIGINAL": "a/images/one.png",
+            "THUMBNAIL": "a/images/derivatives/thumbnail/one.jpg",
+            "PREVIEW": "a/images/derivatives/preview/one.jpg",
+        }]}}}
+    )
+
+
+@pytest.mark.asyncio
+async def test_backfill_only_renders_missing_photos():
+    service, collection = derivatives_service()
+    done_id, pending_id = ObjectId(), ObjectId()
+    collection.count_documents = AsyncMock(return_value=2)
+    collection.find = MagicMock(return_value=FakeCursor([
+        {"_id": done_id, "photos": ["done.png"], "photo_derivatives": [{"ORIGINAL": "done.png"}]},
+        {"_id": pending_id, "photos": ["done.png", "new.png"], "photo_derivatives": [{"ORIGINAL": "done.png"}]},
+    ]))
+    progress = AsyncMock()
+
+    with patch.object(service, "build_for_item", AsyncMock(return_value=1)) as build_for_item:
+        result = await service.backfill(on_progress=progress)
+
+    build_for_item.assert_awaited_once_with(pending_id, ["new.png"])
+    assert result == {"items": 2, "photos": 1}
+    progress.assert_awaited_with(2, 2)
@@ -0,0 +1,51 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.shared.exceptions.storage import StorageError
+from app.shared.storage.s3.presign import PresignService
+
+
+def fake_presign(key, expires_in=3600):
+    return f"https://bucket/{key}?expires={expires_in}"
+
+
+@pytest.mark.asyncio
+async def test_sign_many_signs_missing_keys_once_in_a_batch():
+    service = PresignService(expires_in=600)
+
+    with patch("app.shared.storage.s3.presign.generate_s3_presigned_url", side_effect=fake_presign) as presign, \
+            patch.object(service, "_sign_keys", wraps=service._sign_keys) as sign_keys:
+        first = await service.sign_many(["a.jpg", "b.jpg", "a.jpg", None])
+        second = await service.sign_many(["a.jpg", "c.jpg"])
+
+    assert first == {"a.jpg": fake_presign("a.jpg", 600), "b.jpg": fake_presign("b.jpg", 600)}
+    assert second["a.jpg"] == first["a.jpg"]
+    assert [call.args[0] for call in sign_keys.call_args_list] == [["a.jpg", "b.jpg"], ["c.jpg"]]
+    assert presign.call_count == 3
+
+
+def test_urls_are_cached_for_a_fraction_of_their_lifetime():
+    service = PresignService(expires_in=3600, cache_ttl_ratio=0.5, max_size=10)
+    assert service._cache.default_ttl == 1800
+    assert service._cache.max_size == 10
+
+
+@pytest.mark.asyncio
+async def test_resolve_keeps_input_shape():
+    service = PresignService()
+
+    with patch("app.shared.storage.s3.presign.generate_s3_presigned_url", side_effect=fake_presign):
+        assert await service.resolve(None) is None
+        assert await service.resolve([]) is None
+        assert await service.resolve("a.jpg") == fake_presign("a.jpg")
+        assert await service.resolve(["a.jpg", "b.jpg"]) == [fake_presign("a.jpg"), fake_presign("b.jpg")]
+
+
+@pytest.mark.asyncio
+async def test_signing_errors_are_storage_errors():
+    service = PresignService()
+
+    with patch("app.shared.storage.s3.presign.generate_s3_presigned_url", side_effect=RuntimeError("boom")):
+        with pytest.raises(StorageError):
+            await service.sign_many(["a.jpg"])
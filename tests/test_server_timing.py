@@ -0,0 +1,47 @@
+import time
+from unittest.mock import MagicMock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.shared.observability.server_timing import (
+    MongoTimingListener,
+    ServerTimingMiddleware,
+    TimedJSONResponse,
+    current_timings,
+    timed,
+)
+
+
+def build_app() -> FastAPI:
+    app = FastAPI(default_response_class=TimedJSONResponse)
+    app.add_middleware(ServerTimingMiddleware)
+
+    @app.get("/ping")
+    async def ping():
+        with timed("auth"):
+            time.sleep(0.001)
+        MongoTimingListener().succeeded(MagicMock(duration_micros=2500))
+        MongoTimingListener().succeeded(MagicMock(duration_micros=500))
+        return {"ok": True}
+
+    return app
+
+
+def test_server_timing_header_lists_phases():
+    response = TestClient(build_app()).get("/ping")
+    header = response.headers["Server-Timing"]
+
+    assert response.status_code == 200
+    assert 'auth;dur=' in header
+    assert 'mongo;dur=3.00;desc="2 calls"' in header
+    assert 'serialize;dur=' in header
+    assert "total;dur=" in header
+
+
+def test_timed_is_a_noop_outside_requests():
+    with timed("mongo"):
+        pass
+
+    MongoTimingListener().succeeded(MagicMock(duration_micros=100))
+    assert current_timings() is None
@@ -0,0 +1,124 @@
+import logging
+from unittest.mock import MagicMock
+
+from bson import ObjectId
+
+from app.shared.observability.slow_queries import (
+    SlowQueryListener,
+    explain_command,
+    redact_shape,
+    summarize_explain,
+)
+
+
+def test_redact_shape_keeps_structure_and_hides_values():
+    pipeline = [
+        {"$match": {"parent_id": {"$in": [ObjectId(), ObjectId()]}, "node_type": {"$ne": "LOCATION"}}},
+        {"$graphLookup": {
+            "from": "inventory_items",
+            "startWith": "$_id",
+            "connectFromField": "_id",
+            "connectToField": "parent_id",
+            "as": "descendants",
+        }},
+    ]
+
+    assert redact_shape(pipeline) == [
+        {"$match": {"parent_id": {"$in": ["?"]}, "node_type": {"$ne": "?"}}},
+        {"$graphLookup": {
+            "from": "inventory_items",
+            "startWith": "$_id",
+            "connectFromField": "_id",
+            "connectToField": "parent_id",
+            "as": "descendants",
+        }},
+    ]
+
+
+def test_summarize_explain_reports_collection_scans():
+    explain = {
+        "queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "COLLSCAN"}}},
+        "executionStats": {"totalDocsExamined": 1200, "totalKeysExamined": 0, "nReturned": 3},
+    }
+
+    assert summarize_explain(explain) == {
+        "stages": ["FETCH", "COLLSCAN"],
+        "collection_scan": True,
+        "docs_examined": 1200,
+        "keys_examined": 0,
+        "returned": 3,
+    }
+
+
+def command_events(command: dict, duration_micros: int):
+    started = MagicMock(
+        command_name="find", command=command, database_name="tenant_test", connection_id=("host", 1), request_id=7
+    )
+    succeeded = MagicMock(
+        command_name="find", connection_id=("host", 1), request_id=7, duration_micros=duration_micros
+    )
+    return started, succeeded
+
+
+def test_listener_logs_only_slow_commands(caplog):
+    explainer = MagicMock()
+    listener = SlowQueryListener(threshold_ms=100, explainer=explainer)
+    command = {"find": "inventory_items", "filter": {"reference": "RACK-01"}, "lsid": {"id": 1}, "$db": "tenant_test"}
+
+    with caplog.at_level(logging.WARNING, logger="app.slow_queries"):
+        started, succeeded = command_events(command, duration_micros=50_000)
+        listener.started(started)
+        listener.succeeded(succeeded)
+        assert not caplog.records
+
+        started, succeeded = command_events(command, duration_micros=250_000)
+        listener.started(started)
+        listener.succeeded(succeeded)
+
+    assert '"reference": "?"' in caplog.records[0].message
+    assert "RACK-01" not in caplog.records[0].message
+
+    db_name, explained_command, record = explainer.submit.call_args.args
+    assert explained_command == {"find": "inventory_items", "filter": {"reference": "RACK-01"}}
+    assert record["duration_ms"] == 250
+
+
+def test_listener_explains_each_shape_once():
+    explainer = MagicMock()
+    listener = SlowQueryListener(threshold_ms=1, explainer=explainer)
+
+    for reference in ("RACK-01", "RACK-02"):
+        started, succeeded = command_events({"find": "inventory_items", "filter": {"reference": reference}}, 5_000)
+        listener.started(started)
+        listener.succeeded(succeeded)
+
+    assert explainer.submit.call_count == 1
+
+
+def test_bulk_writes_are_explained_by_their_first_statement():
+    command = {
+        "update": "inventory_items",
+        "updates": [{"q": {"_id": index}, "u": {"$set": {"checked": True}}} for index in range(3)],
+        "ordered": False,
+        "lsid": {"id": 1},
+    }
+
+    assert explain_command("update", command) == {
+        "update": "inventory_items",
+        "updates": [{"q": {"_id": 0}, "u": {"$set": {"checked": True}}}],
+        "ordered": False,
+    }
+
+
+def test_listener_without_explainer_keeps_no_command(caplog):
+    listener = SlowQueryListener(threshold_ms=1)
+    started, succeeded = command_events({"find": "inventory_items", "filter": {"reference": "RACK-01"}}, 5_000)
+
+    listener.started(started)
+    assert list(listener._started.values()) == [("tenant_test", "inventory_items", None)]
+
+    with caplog.at_level(logging.WARNING, logger="app.slow_queries"):
+        listener.succeeded(succeeded)
+
+    assert '"collection": "inventory_items"' in caplog.records[0].message
+    assert "RACK-01" not in caplog.records[0].message
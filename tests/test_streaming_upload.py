@@ -0,0 +1,200 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.modules.item.item_repository import ItemRepository
+from app.shared.exceptions.storage import StorageError
+from app.shared.storage.s3.streaming_upload import StreamingFormUpload
+
+BOUNDARY = "----inventory-check"
+
+
+def multipart_body(parts):
+    body = b""
+    for name, value in parts:
+        body += f"--{BOUNDARY}\r\n".encode()
+        if isinstance(value, tuple):
+            filename, content = value
+            body += (
+                f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                "Content-Type: image/jpeg\r\n\r\n"
+            ).encode() + content + b"\r\n"
+        else:
+            body += f'Content-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+class FakeRequest:
+    def __init__(self, parts, chunk_size=1024):
+        self.headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+        self.body = multipart_body(parts)
+        self.chunk_size = chunk_size
+
+    async def stream(self):
+        for start in range(0, len(self.body), self.chunk_size):
+            yield self.body[start:start + self.chunk_size]
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    monkeypatch.setenv("AWS_S3_BUCKET", "bucket")
+    client = MagicMock()
+    client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    client.upload_part.side_effect = lambda **kwargs: {"ETag": f"etag-{kwargs['PartNumber']}"}
+    client.delete_objects.return_value = {}
+    with patch("app.shared.storage.s3.streaming_upload.get_s3_client", return_value=client), \
+            patch("app.shared.storage.s3.objects.get_s3_client", return_value=client):
+        yield client
+
+
+def item_prefix(item_id):
+    return f"multi-tenant/client/tenant/inventory-checks/{item_id}/images/"
+
+
+@pytest.mark.asyncio
+async def test_photos_after_item_id_are_streamed_with_one_put_each(s3_client):
+    item_id = ObjectId()
+    request = FakeRequest([
+        ("item_id", str(item_id)),
+        ("asset_data", '{"serial": "SN1"}'),
+        ("photos", ("Front.jpg", b"a" * 3000)),
+        ("photos", ("back.jpg", b"b" * 10)),
+        ("photos", ("", b"")),
+    ])
+    upload = StreamingFormUpload("photos", ItemRepository.photos_prefix_for("tenant", ObjectId()))
+
+    form, keys = await upload.parse(request)
+
+    assert form["item_id"] == str(item_id)
+    assert form["asset_data"] == '{"serial": "SN1"}'
+    assert len(keys) == 2
+    assert all(key.startswith(item_prefix(item_id)) for key in keys)
+    assert keys[0].split("/")[-1].startswith("front__")
+    bodies = {call.kwargs["Key"]: call.kwargs["Body"] for call in s3_client.put_object.call_args_list}
+    assert bodies == {keys[0]: b"a" * 3000, keys[1]: b"b" * 10}
+    assert s3_client.put_object.call_args.kwargs["ContentType"] == "image/jpeg"
+    s3_client.generate_presigned_url.assert_not_called()
+    s3_client.create_multipart_upload.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_photos_before_the_item_fields_are_spooled_and_keep_form_order(s3_client):
+    new_item_id = ObjectId()
+    request = FakeRequest([
+        ("photos", ("first.jpg", b"1" * 100)),
+        ("photos", ("second.jpg", b"2" * 100)),
+        ("parent_id", str(ObjectId())),
+    ])
+    upload = StreamingFormUpload("photos", ItemRepository.photos_prefix_for("tenant", new_item_id))
+
+    form, keys = await upload.parse(request)
+
+    assert "item_id" not in form
+    assert [key.split("/")[-1].split("__")[0] for key in keys] == ["first", "second"]
+    assert all(key.startswith(item_prefix(new_item_id)) for key in keys)
+    assert s3_client.put_object.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_large_photo_becomes_a_multipart_upload(s3_client):
+    request = FakeRequest([("reference", "RACK-01"), ("photos", ("big.jpg", b"x" * 2500))], chunk_size=300)
+    upload = StreamingFormUpload("photos", ItemRepository.photos_prefix_for("tenant", ObjectId()), part_size=1000)
+
+    _, keys = await upload.parse(request)
+
+    assert [call.kwargs["Body"] for call in s3_client.upload_part.call_args_list] == [b"x" * 1000, b"x" * 1000, b"x" * 500]
+    s3_client.complete_multipart_upload.assert_called_once_with(
+        Bucket="bucket", Key=keys[0], UploadId="upload-1",
+        MultipartUpload={"Parts": [{"PartNumber": number, "ETag": f"etag-{number}"} for number in (1, 2, 3)]}
+    )
+    s3_client.put_object.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_uploads_in_flight_are_bounded(s3_client):
+    lock = threading.Lock()
+    running = {"now": 0, "max": 0}
+
+    def slow_put(**kwargs):
+        with lock:
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+        time.sleep(0.02)
+        with lock:
+            running["now"] -= 1
+
+    s3_client.put_object.side_effect = slow_put
+    request = FakeRequest([("reference", "RACK-01")] + [("photos", (f"{index}.jpg", b"p" * 50)) for index in range(8)])
+    upload = StreamingFormUpload("photos", ItemRepository.photos_prefix_for("tenant", ObjectId()), concurrency=2)
+
+    _, keys = await upload.parse(request)
+
+    assert len(keys) == 8
+    assert running["max"] == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_upload_removes_the_photos_already_stored(s3_client):
+    def put(**kwargs):
+        if "broken" in kwargs["Key"]:
+            raise RuntimeError("connection reset")
+
+    s3_client.put_object.side_effect = put
+    request = FakeRequest([
+        ("reference", "RACK-01"),
+        ("photos", ("ok.jpg", b"o" * 10)),
+        ("photos", ("broken.jpg", b"b" * 10)),
+    ])
+    upload = StreamingFormUpload("photos", ItemRepository.photos_prefix_for("tenant", ObjectId()))
+
+    with pytest.raises(StorageError):
+        await upload.parse(request)
+
+    deleted = s3_client.delete_objects.call_args.kwargs["Delete"]["Objects"]
+    assert len(deleted) == 1 and "/ok__" in deleted[0]["Key"]
+    assert upload.keys == []
+
+
+@pytest.mark.asyncio
+async def test_photo_over_the_size_limit_is_rejected(s3_client):
+    request = FakeRequest([
+        ("item_id", str(ObjectId())),
+        ("photos", ("ok.jpg", b"o" * 10)),
+        ("photos", ("huge.jpg", b"h" * 3000)),
+    ], chunk_size=500)
+    upload = StreamingFormUpload("photos", ItemRepository.photos_prefix_for("tenant", ObjectId()), max_file_size=1000)
+
+    with pytest.raises(HTTPException) as error:
+        await upload.parse(request)
+
+    assert error.value.status_code == 413
+    # nothing of the form is kept: the first photo is cancelled or deleted, the second never sent
+    assert upload.keys == []
+    assert all("huge" not in call.kwargs["Key"] for call in s3_client.put_object.call_args_list)
+
+
+@pytest.mark.asyncio
+async def test_photos_over_the_count_limit_are_rejected(s3_client):
+    request = FakeRequest([("item_id", str(ObjectId()))] + [("photos", (f"{index}.jpg", b"p")) for index in range(3)])
+    upload = StreamingFormUpload("photos", ItemRepository.photos_prefix_for("tenant", ObjectId()), max_files=2)
+
+    with pytest.raises(HTTPException) as error:
+        await upload.parse(request)
+
+    assert error.value.status_code == 422
+    assert upload.keys == []
+
+
+@pytest.mark.asyncio
+async def test_too_many_text_fields_are_rejected(s3_client, monkeypatch):
+    monkeypatch.setattr("app.shared.storage.s3.streaming_upload.MAX_FORM_FIELDS", 2)
+    request = FakeRequest([("a", "1"), ("b", "2"), ("c", "3")])
+
+    with pytest.raises(HTTPException) as error:
+        await StreamingFormUpload("photos", ItemRepository.photos_prefix_for("tenant", ObjectId())).parse(request)
+
+    assert error.value.status_code == 400
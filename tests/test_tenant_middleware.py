@@ -1,18 +1,24 @@
 from unittest.mock import AsyncMock, MagicMock, patch
-from fastapi import HTTPException
 from fastapi.testclient import TestClient
-import pytest
 from app.main import create_test_app
 
 def test_missing_tenant_header():
     app = create_test_app()
     client = TestClient(app)
 
-    with pytest.raises(HTTPException) as exc:
-        client.get("/load")
+    response = client.get("/load")
 
-    assert exc.value.status_code == 400
-    assert exc.value.detail == "Header 'tenant' é obrigatório"
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Header 'tenant' é obrigatório"
+
+def test_invalid_tenant_name():
+    app = create_test_app()
+    client = TestClient(app)
+
+    response = client.get("/load", headers={"tenant": "tenant$invalido"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Nome do tenant inválido"
 
 def test_tenant_not_found():
     with patch("app.core.database.MongoConnection.get_client") as mock:
@@ -23,7 +29,7 @@ def test_tenant_not_found():
         app = create_test_app()
         client_http = TestClient(app)
 
-        with pytest.raises(HTTPException) as exc:
-            client_http.get("/load", headers={"tenant": "invalido"})
+        response = client_http.get("/load", headers={"tenant": "invalido"})
 
-        assert exc.value.status_code == 404
+        assert response.status_code == 404
+        assert response.json()["error_code"] == "HTTP_ERROR"
@@ -0,0 +1,96 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.modules.tenant.tenant_registry import TenantRegistry
+from app.modules.tenant.tenant_routes import update_tenant
+from app.modules.tenant.tenant_schema import TenantCreateUpdateDTO
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def mongo_client():
+    with patch("app.core.database.MongoConnection.get_client") as mock:
+        client = MagicMock()
+        client.list_database_names = AsyncMock(return_value=["tenant_a", "tenant_b"])
+
+        db = MagicMock()
+        db.dummy.find_one = AsyncMock(return_value={"is_active": False})
+        client.get_database.return_value = db
+
+        mock.return_value = client
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_known_tenant_is_served_from_memory(mongo_client):
+    registry = TenantRegistry(ttl=60, miss_refresh_interval=5, clock=FakeClock())
+
+    first = await registry.get("tenant_a")
+    second = await registry.get("tenant_a")
+
+    assert first == second
+    assert first.is_active is False
+    assert mongo_client.list_database_names.await_count == 1
+    assert mongo_client.get_database.return_value.dummy.find_one.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_registry_refreshes_after_ttl(mongo_client):
+    clock = FakeClock()
+    registry = TenantRegistry(ttl=60, miss_refresh_interval=5, clock=clock)
+
+    await registry.get("tenant_a")
+    clock.now = 61
+    await registry.get("tenant_a")
+
+    assert mongo_client.list_database_names.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_unknown_tenant_refresh_is_rate_limited(mongo_client):
+    clock = FakeClock()
+    registry = TenantRegistry(ttl=60, miss_refresh_interval=5, clock=clock)
+
+    assert await registry.get("unknown") is None
+    assert await registry.get("unknown") is None
+    assert mongo_client.list_database_names.await_count == 1
+
+    clock.now = 6
+    mongo_client.list_database_names.return_value = ["tenant_a", "unknown"]
+    assert await registry.get("unknown") is not None
+    assert mongo_client.list_database_names.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate_reloads_tenant(mongo_client):
+    registry = TenantRegistry(ttl=60, miss_refresh_interval=5, clock=FakeClock())
+    await registry.get("tenant_a")
+
+    registry.invalidate("tenant_a")
+    await registry.get("tenant_a")
+    assert mongo_client.list_database_names.await_count == 1
+    assert mongo_client.get_database.return_value.dummy.find_one.await_count == 2
+
+    registry.invalidate()
+    await registry.get("tenant_a")
+    assert mongo_client.list_database_names.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_tenant_update_invalidates_its_entry(mongo_client):
+    request = MagicMock()
+    request.state.db.name = "tenant_a"
+    request.state.db.dummy.find_one_and_update = AsyncMock(return_value={"is_active": False})
+
+    with patch("app.modules.tenant.tenant_routes.tenant_registry") as registry:
+        await update_tenant(TenantCreateUpdateDTO(name="A", database="tenant_a"), request)
+
+    registry.invalidate.assert_called_once_with("tenant_a")
@@ -0,0 +1,147 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pandas as pd
+import pytest
+from bson import ObjectId
+
+from app.services.excel_services import build_nodes_from_df
+from app.shared.database.ancestors import (
+    ancestor_nodes_stages,
+    backfill_ancestors,
+    child_ancestors,
+    child_root_id,
+    descendant_nodes_stages,
+    subtree_query,
+)
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.documents:
+            yield doc
+
+
+class FakeItems:
+    def __init__(self, documents):
+        self.documents = {doc["_id"]: doc for doc in documents}
+        self.updated = []
+
+    async def count_documents(self, query):
+        return len(self.documents)
+
+    def find(self, query, projection=None):
+        parent_id = query["parent_id"]
+        parents = set(parent_id["$in"]) if isinstance(parent_id, dict) else {parent_id}
+        return FakeCursor([dict(doc) for doc in self.documents.values() if doc.get("parent_id") in parents])
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            self.documents[operation._filter["_id"]].update(operation._doc["$set"])
+            self.updated.append(operation._filter["_id"])
+        return MagicMock(modified_count=len(operations))
+
+
+def fake_db(items):
+    db = MagicMock()
+    db.inventory_items = items
+    tree_state = MagicMock()
+    tree_state.update_one = AsyncMock()
+    db.__getitem__.return_value = tree_state
+    return db, tree_state
+
+
+@pytest.mark.asyncio
+async def test_backfill_walks_the_tree_from_the_roots():
+    site = {"_id": ObjectId(), "parent_id": None}
+    room = {"_id": ObjectId(), "parent_id": site["_id"]}
+    rack = {"_id": ObjectId(), "parent_id": room["_id"], "ancestors": [site["_id"], room["_id"]], "root_id": site["_id"]}
+    device = {"_id": ObjectId(), "parent_id": rack["_id"], "ancestors": [room["_id"]]}
+    items = FakeItems([site, room, rack, device])
+    db, tree_state = fake_db(items)
+    progress = AsyncMock()
+
+    result = await backfill_ancestors(db, batch_size=1, on_progress=progress)
+
+    assert items.documents[site["_id"]]["ancestors"] == []
+    assert items.documents[device["_id"]]["ancestors"] == [site["_id"], room["_id"], rack["_id"]]
+    assert items.documents[site["_id"]]["root_id"] == site["_id"]
+    assert items.documents[device["_id"]]["root_id"] == site["_id"]
+    # the rack was already right
+    assert rack["_id"] not in items.updated
+    assert result == {"processed_nodes": 4, "updated_nodes": 3}
+    assert progress.await_args.args == (4, 4)
+    # ancestors and root ids are marked ready together
+    ready = {call.args[0]["_id"]: call.args[1]["$set"]["ready"] for call in tree_state.update_one.await_args_list[-2:]}
+    assert ready == {"ancestors": True, "root_id": True}
+
+
+def test_child_ancestors_extend_the_parent_chain():
+    root = {"_id": ObjectId(), "ancestors": []}
+    child = {"_id": ObjectId(), "ancestors": [root["_id"]]}
+
+    assert child_ancestors(None) == []
+    assert child_ancestors(child) == [root["_id"], child["_id"]]
+
+
+def test_child_root_id_is_the_root_or_its_stored_root():
+    root = {"_id": ObjectId(), "parent_id": None}
+    room = {"_id": ObjectId(), "parent_id": root["_id"], "root_id": root["_id"]}
+
+    assert child_root_id(root) == root["_id"]
+    assert child_root_id(room) == root["_id"]
+    # not backfilled yet
+    assert child_root_id({"_id": ObjectId(), "parent_id": root["_id"]}) is None
+
+
+def test_stages_fall_back_to_graph_lookup():
+    assert ancestor_nodes_stages("ancestors", "depth", materialized=False) == [{
+        "$graphLookup": {
+            "from": "inventory_items", "startWith": "$parent_id", "connectFromField": "parent_id",
+            "connectToField": "_id", "as": "ancestors", "depthField": "depth",
+        }
+    }]
+    restrict = {"node_type": {"$ne": "LOCATION"}}
+    assert descendant_nodes_stages("descendants", restrict, materialized=False)[0]["$graphLookup"]["restrictSearchWithMatch"] == restrict
+
+
+def test_materialized_stages_read_the_ancestors_index():
+    lookup, add_fields, unset = ancestor_nodes_stages("parent_locations", "depth")
+    assert lookup["$lookup"]["localField"] == "ancestors"
+    assert lookup["$lookup"]["foreignField"] == "_id"
+    assert "parent_locations" in add_fields["$addFields"]
+    assert unset == {"$unset": lookup["$lookup"]["as"]}
+
+    restrict = {"node_type": {"$ne": "LOCATION"}}
+    assert descendant_nodes_stages("descendants", restrict) == [{
+        "$lookup": {
+            "from": "inventory_items", "localField": "_id", "foreignField": "ancestors",
+            "as": "descendants", "pipeline": [{"$match": restrict}],
+        }
+    }]
+
+    roots = [ObjectId()]
+    assert subtree_query(roots) == {"$or": [{"_id": {"$in": roots}}, {"ancestors": {"$in": roots}}]}
+    assert subtree_query(roots, include_roots=False) == {"ancestors": {"$in": roots}}
+
+
+def test_excel_nodes_carry_their_ancestors():
+    root_id = ObjectId()
+    df = pd.DataFrame({"LOC 1": ["SP", "SP"], "LOC 2": ["Sala 1", "Sala 1"], "ATIVO": ["R1", "R2"], "delimiter": [None, None]})
+
+    documents = build_nodes_from_df(df, "delimiter", nodes={("SP", None): root_id})
+    by_reference = {doc["reference"]: doc for doc in documents}
+
+    assert "SP" not in by_reference
+    assert by_reference["Sala 1"]["ancestors"] == [root_id]
+    assert by_reference["R1"]["ancestors"] == [root_id, by_reference["Sala 1"]["_id"]]
+    assert by_reference["R2"]["ancestors"] == by_reference["R1"]["ancestors"]
+    assert {doc["root_id"] for doc in documents} == {root_id}
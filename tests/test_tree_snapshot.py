@@ -0,0 +1,91 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson import ObjectId
+
+from app.shared.database.tree_snapshot import NO_NODE, TreeSnapshot, TreeSnapshotCache
+
+
+def build_snapshot(version=1):
+    site, room, other_room, rack, device, loose = (ObjectId() for _ in range(6))
+    nodes = [
+        (device, rack, "ASSET", "D1"),
+        (site, None, "LOCATION", "SP"),
+        (rack, room, "ASSET", "RACK"),
+        (room, site, "LOCATION", "Sala 1"),
+        (other_room, site, "LOCATION", "Sala 2"),
+        (loose, other_room, "ASSET", "RACK"),
+    ]
+    snapshot = TreeSnapshot(version, *map(list, zip(*nodes)))
+    return snapshot, site, room, other_room, rack, device, loose
+
+
+def test_ancestors_and_location_path():
+    snapshot, site, room, other_room, rack, device, loose = build_snapshot()
+
+    assert snapshot.ancestors(device) == [site, room, rack]
+    assert snapshot.ancestors(site) == []
+    assert snapshot.location_path(device) == ["SP", "Sala 1"]
+    assert snapshot.ancestor_references(device, "ASSET") == ["RACK"]
+    assert snapshot.location_path(ObjectId()) == []
+
+
+def test_descendants_filtered_by_node_type():
+    snapshot, site, room, other_room, rack, device, loose = build_snapshot()
+
+    assert snapshot.descendants([site]) == [room, other_room, rack, loose, device]
+    assert snapshot.descendants([site], "ASSET") == [rack, loose, device]
+    # overlapping roots are listed once
+    assert snapshot.descendants([room, rack], include_self=True) == [rack, room, device]
+    assert snapshot.descendants([ObjectId()]) == []
+
+
+def test_namesakes_and_positions():
+    snapshot, site, room, other_room, rack, device, loose = build_snapshot()
+
+    assert set(snapshot.with_reference("RACK", "ASSET")) == {rack, loose}
+    assert snapshot.with_reference("Sala 1", "ASSET") == []
+    assert snapshot.with_reference("missing") == []
+    assert snapshot.position(ObjectId()) == NO_NODE
+    # ids ending in zero bytes survive the fixed width storage
+    padded = ObjectId(b"abcdefghij\x00\x00")
+    assert TreeSnapshot(1, [padded], [None], ["LOCATION"], ["SP"]).descendants([padded], include_self=True) == [padded]
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.documents:
+            yield doc
+
+
+@pytest.mark.asyncio
+async def test_cache_reloads_when_the_tree_version_changes():
+    site = ObjectId()
+    state = {"version": 3}
+    db = MagicMock()
+    db.name = "tenant"
+    db.inventory_items.find = MagicMock(side_effect=lambda *args: FakeCursor([
+        {"_id": site, "parent_id": None, "node_type": "LOCATION", "reference": "SP"}
+    ]))
+    tree_state = MagicMock()
+    tree_state.find_one = AsyncMock(side_effect=lambda *args: dict(state))
+    db.__getitem__.return_value = tree_state
+    cache = TreeSnapshotCache(max_size=1)
+
+    first = await cache.get(db)
+    assert await cache.get(db) is first
+    assert db.inventory_items.find.call_count == 1
+
+    state["version"] = 4
+    second = await cache.get(db)
+    assert second is not first and second.version == 4
+    assert second.descendants([site], include_self=True) == [site]